@@ -0,0 +1,63 @@
+import time
+from constants import *
+
+TIER_ACTIVE = 0
+TIER_MID = 1
+TIER_DORMANT = 2
+
+class AIScheduler:
+    # Decides which enemies run their AI this tick. Alerted or close enemies update
+    # every tick, enemies that are on screen or moderately close every
+    # AI_MID_INTERVAL ticks and the rest every AI_DORMANT_INTERVAL ticks. A skipped
+    # enemy catches up on its next update by moving for the ticks it missed. Once the
+    # frame budget is spent, the remaining non-active enemies are deferred and get
+    # served first on the next tick. budget_ms=None turns the budget off.
+    def __init__(self, mid_interval=AI_MID_INTERVAL, dormant_interval=AI_DORMANT_INTERVAL, budget_ms=AI_FRAME_BUDGET_MS):
+        self.intervals = {TIER_ACTIVE: 1, TIER_MID: mid_interval, TIER_DORMANT: dormant_interval}
+        self.budget_ms = budget_ms
+        self.cursor = 0
+        self.last_stats = {'updated': 0, 'skipped': 0, 'deferred': 0}
+
+    def classify(self, enemy, player_center, view_rect, detection_range):
+        center = enemy.get_center_pos()
+        dx = center[0] - player_center[0]
+        dy = center[1] - player_center[1]
+        dist_sq = dx * dx + dy * dy
+        # 1.5x is the alert hysteresis range, so anything that could change alert state is active
+        if enemy.is_alerted or dist_sq <= (detection_range * 1.5) ** 2:
+            return TIER_ACTIVE
+        if view_rect.collidepoint(center) or dist_sq <= (detection_range * 2) ** 2:
+            return TIER_MID
+        return TIER_DORMANT
+
+    def run(self, enemies, player_center, view_rect, detection_range, update):
+        # update(enemy, ticks) runs one enemy's AI covering `ticks` simulation ticks
+        updated = skipped = deferred = 0
+        count = len(enemies)
+        start_time = time.perf_counter()
+        budget = self.budget_ms / 1000 if self.budget_ms is not None else None
+        next_cursor = None
+
+        for k in range(count):
+            i = (self.cursor + k) % count
+            enemy = enemies[i]
+            enemy.ai_pending_ticks += 1
+            tier = self.classify(enemy, player_center, view_rect, detection_range)
+
+            if enemy.ai_pending_ticks < self.intervals[tier]:
+                skipped += 1
+                continue
+
+            if tier != TIER_ACTIVE and budget is not None and time.perf_counter() - start_time > budget:
+                deferred += 1
+                if next_cursor is None:
+                    next_cursor = i
+                continue
+
+            update(enemy, min(enemy.ai_pending_ticks, AI_MAX_CATCH_UP_TICKS))
+            enemy.ai_pending_ticks = 0
+            updated += 1
+
+        self.cursor = next_cursor or 0
+        self.last_stats = {'updated': updated, 'skipped': skipped, 'deferred': deferred}
+        return self.last_stats
@@ -0,0 +1,93 @@
+import pygame
+from constants import *
+
+class AssetRegistry:
+    # Loads, converts and scales every image or sound once and hands out the shared
+    # object afterwards. Keys include the processing parameters, so e.g. two sizes of
+    # the same PNG are two entries that still share a single decode of the file.
+    def __init__(self):
+        self.images = {}
+        self.sounds = {}
+        self._decoded_images = {}
+        self._decoded_sounds = {}
+        self._failed = {}
+
+    def _check_failed(self, path):
+        # A missing file is only looked for once; later requests fail straight away
+        if path in self._failed:
+            raise pygame.error(self._failed[path])
+
+    def _decode_image(self, path, alpha):
+        key = (path, alpha)
+        surface = self._decoded_images.get(key)
+        if surface is None:
+            self._check_failed(path)
+            try:
+                surface = pygame.image.load(path)
+            except (pygame.error, FileNotFoundError) as e:
+                self._failed[path] = str(e)
+                raise pygame.error(str(e))
+            surface = surface.convert_alpha() if alpha else surface.convert()
+            self._decoded_images[key] = surface
+        return surface
+
+    def load_image(self, path, size=None, alpha=True, flip_x=False, flip_y=False):
+        if size is not None:
+            size = (int(size[0]), int(size[1]))
+        key = (path, size, alpha, flip_x, flip_y)
+        surface = self.images.get(key)
+        if surface is None:
+            surface = self._decode_image(path, alpha)
+            if flip_x or flip_y:
+                surface = pygame.transform.flip(surface, flip_x, flip_y)
+            if size is not None and surface.get_size() != size:
+                surface = pygame.transform.scale(surface, size)
+            self.images[key] = surface
+        return surface
+
+    def load_sound(self, path, volume=None):
+        key = (path, volume)
+        sound = self.sounds.get(key)
+        if sound is None:
+            decoded = self._decoded_sounds.get(path)
+            if decoded is None:
+                self._check_failed(path)
+                try:
+                    decoded = pygame.mixer.Sound(path)
+                except (pygame.error, FileNotFoundError) as e:
+                    self._failed[path] = str(e)
+                    raise pygame.error(str(e))
+                self._decoded_sounds[path] = decoded
+                sound = decoded
+            else:
+                # Volume is per Sound object, so a second volume gets its own object
+                # built from the already decoded samples instead of decoding again
+                sound = pygame.mixer.Sound(buffer=decoded.get_raw())
+            if volume is not None:
+                sound.set_volume(volume)
+            self.sounds[key] = sound
+        return sound
+
+    def memory_footprint(self):
+        image_surfaces = {id(surface): surface for surface in list(self._decoded_images.values()) + list(self.images.values())}
+        image_bytes = sum(surface.get_bytesize() * surface.get_width() * surface.get_height() for surface in image_surfaces.values())
+
+        sound_bytes = 0
+        mixer_settings = pygame.mixer.get_init()
+        if mixer_settings:
+            frequency, size, channels = mixer_settings
+            bytes_per_second = frequency * (abs(size) // 8) * channels
+            sounds = {id(sound): sound for sound in self.sounds.values()}
+            sound_bytes = int(sum(sound.get_length() * bytes_per_second for sound in sounds.values()))
+
+        return {'images': image_bytes, 'image_count': len(image_surfaces),
+                'sounds': sound_bytes, 'sound_count': len(self.sounds)}
+
+    def clear(self):
+        self.images.clear()
+        self.sounds.clear()
+        self._decoded_images.clear()
+        self._decoded_sounds.clear()
+        self._failed.clear()
+
+ASSETS = AssetRegistry()
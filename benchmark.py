@@ -0,0 +1,333 @@
+import os
+import io
+import sys
+import json
+import math
+import time
+import random
+import platform
+import argparse
+import contextlib
+
+# Offscreen like headless.py; must be set before pygame initialises
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+from main import *
+from flow_field import FlowField
+from enemy_manager import EnemyManager
+from spawner import SpawnRings
+from topology import MazeTopology
+from maze_gen import generate_maze, MAZE_ALGORITHMS
+from maze_file import load_maze
+import raycast
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# Maze the cases run on when --level is given; otherwise each case generates one
+LEVEL = None
+
+class SilentSound:
+    # Stands in for the sounds the timed calls play
+    def play(self, *args):
+        pass
+
+SILENT = SilentSound()
+
+def time_case(run, min_round_seconds, rounds):
+    # Calibrates how many calls make up a round of at least min_round_seconds, then
+    # reports per-call times over `rounds` rounds. Prints from the game are swallowed.
+    with contextlib.redirect_stdout(io.StringIO()):
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_round_seconds or number >= 1 << 20:
+                break
+            number *= 2
+
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            samples.append((time.perf_counter() - start) * 1000 / number)
+    samples.sort()
+    return {
+        'ms': samples[len(samples) // 2],
+        'min_ms': samples[0],
+        'mean_ms': sum(samples) / len(samples),
+        'calls_per_round': number,
+        'rounds': rounds,
+    }
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+def cell_center(col, row, size):
+    return [col * CELL_SIZE + (CELL_SIZE - size) / 2, row * CELL_SIZE + (CELL_SIZE - size) / 2]
+
+def bench_grid(rng):
+    return LEVEL if LEVEL is not None else quiet(gen_maze, rng)
+
+# --- Cases: each builder does its setup untimed and returns the call to time ---
+
+def bench_gen_maze(size):
+    rng = random.Random(1)
+    return lambda: gen_maze(rng, size, size)
+
+def bench_generate_maze(algorithm, size):
+    rng = random.Random(1)
+    return lambda: generate_maze(size, size, rng=rng, algorithm=algorithm)
+
+def bench_topology_build(size):
+    grid = generate_maze(size, size, 1)
+    return lambda: MazeTopology(grid).start_distance
+
+def bench_topology_query(query):
+    # Cold queries from random cells: every call searches, none hit the caches
+    rng = random.Random(1)
+    grid = bench_grid(rng)
+    topology = MazeTopology(grid, max_sources=0, max_reaches=0)
+    def run():
+        cell = (rng.randrange(grid.cols), rng.randrange(grid.rows))
+        if query == "within":
+            topology.within(cell, ENEMY_SPAWN_MAX_CELLS)
+        else:
+            topology.distance(cell, (rng.randrange(grid.cols), rng.randrange(grid.rows)))
+    return run
+
+def bench_cast_rays(ray_count):
+    grid = bench_grid(random.Random(1))
+    player = Player(cell_center(grid.cols // 2, grid.rows // 2, PLAYER_SIZE), PLAYER_SIZE)
+    return lambda: cast_rays(player, grid, player.fov_angle, [0, 0], 1, 0.3, ray_count=ray_count)
+
+def bench_shoot():
+    grid = bench_grid(random.Random(1))
+    player = Player(cell_center(grid.cols // 2, grid.rows // 2, PLAYER_SIZE), PLAYER_SIZE)
+    player.equipped_item = "shotgun"
+    player.shotgun_pellet_count = MAX_UPGRADABLE_PELLET_COUNT
+    rng = random.Random(1)
+    def run():
+        player.shotgun_ammo = player.shotgun_ammo_capacity
+        player.shoot(0.3, grid, SILENT, SILENT, False, rng)
+    return run
+
+def bench_player_move():
+    grid = bench_grid(random.Random(1))
+    player = Player(cell_center(grid.cols // 2, grid.rows // 2, PLAYER_SIZE), PLAYER_SIZE)
+    direction = [1]
+    def run():
+        # Back and forth across the cell so some moves are blocked by walls
+        player.move_player(grid, direction[0], direction[0])
+        if not PLAYER_SIZE < player.pos[0] % CELL_SIZE < CELL_SIZE - PLAYER_SIZE:
+            direction[0] = -direction[0]
+    return run
+
+def bench_enemy_move():
+    grid = bench_grid(random.Random(1))
+    enemy = Enemy(cell_center(grid.cols // 2, grid.rows // 2, ENEMY_SIZE), [ENEMY_SIZE, ENEMY_SIZE])
+    direction = [ENEMY_SPEED]
+    def run():
+        enemy.move(grid, direction[0], direction[0])
+        if not ENEMY_SIZE < enemy.pos[0] % CELL_SIZE < CELL_SIZE - ENEMY_SIZE:
+            direction[0] = -direction[0]
+    return run
+
+def bench_enemy_update(count):
+    rng = random.Random(1)
+    grid = bench_grid(rng)
+    player = Player(cell_center(grid.cols // 2, grid.rows // 2, PLAYER_SIZE), PLAYER_SIZE)
+    player.take_damage = lambda amount: None
+    flow_field = FlowField(grid)
+    flow_field.update(grid.cols // 2, grid.rows // 2)
+    enemies = [Enemy(cell_center(rng.randrange(grid.cols), rng.randrange(grid.rows), ENEMY_SIZE), [ENEMY_SIZE, ENEMY_SIZE]) for _ in range(count)]
+    # Everything inside the detection range, so every enemy runs its full chase
+    detection_range = math.hypot(grid.cols * CELL_SIZE, grid.rows * CELL_SIZE)
+    def run():
+        for enemy in enemies:
+            enemy.update(player, grid, detection_range, SILENT, SILENT, flow_field)
+    return run
+
+def bench_enemy_manager(count, packed, topology=False):
+    # A crowd spread over the whole maze at the normal detection range, so most of it
+    # is only tested for detection and despawn and a few enemies chase. With a
+    # topology the despawn test counts steps along the maze.
+    rng = random.Random(1)
+    grid = bench_grid(rng)
+    player = Player(cell_center(grid.cols // 2, grid.rows // 2, PLAYER_SIZE), PLAYER_SIZE)
+    player.take_damage = lambda amount: None
+    flow_field = FlowField(grid)
+    flow_field.update(grid.cols // 2, grid.rows // 2)
+    enemies = EnemyManager(SpatialHash(), packed, topology=MazeTopology(grid) if topology else None, budget_ms=None)
+    for _ in range(count):
+        enemies.spawn(cell_center(rng.randrange(grid.cols), rng.randrange(grid.rows), ENEMY_SIZE), [ENEMY_SIZE, ENEMY_SIZE])
+    view_rect = pygame.Rect(player.pos[0] - WIN_WIDTH / 2, player.pos[1] - WIN_HEIGHT / 2, WIN_WIDTH, WIN_HEIGHT)
+    return lambda: enemies.update(player, grid, ENEMY_DETECTION_RANGE, SILENT, SILENT, flow_field, view_rect)
+
+def bench_spawn_churn(count, packed):
+    # Despawn a random enemy from a crowd and spawn one in the player's spawn ring
+    rng = random.Random(1)
+    grid = bench_grid(rng)
+    rings = SpawnRings(grid)
+    enemies = EnemyManager(SpatialHash(), packed)
+    for _ in range(count):
+        enemies.spawn(cell_center(rng.randrange(grid.cols), rng.randrange(grid.rows), ENEMY_SIZE), [ENEMY_SIZE, ENEMY_SIZE])
+    def run():
+        enemies.remove(enemies.entities[rng.randrange(len(enemies))])
+        col, row = rings.pick(rng, grid.cols // 2, grid.rows // 2)
+        enemies.spawn(cell_center(col, row, ENEMY_SIZE), [ENEMY_SIZE, ENEMY_SIZE])
+    return run
+
+def bench_lighting(game, mode):
+    game.lighting_mode = mode
+    grid = game.grid
+    game.player.pos = cell_center(grid.cols // 2, grid.rows // 2, PLAYER_SIZE)
+    game.player.prev_pos = list(game.player.pos)
+    game.player.equipped_item = "flashlight"
+    game.input.aim_axis = [1, 0.3]
+    game.update_camera(grid.cols * CELL_SIZE, grid.rows * CELL_SIZE)
+    view_offset = list(game.camera_offset)
+    return lambda: game.render_lighting(view_offset, 1.0)
+
+def bench_flashlight(game, mode):
+    # Just the flashlight's fills into the light map, for a polygon cast once
+    bench_lighting(game, mode)
+    player = game.player
+    light_map = game.light_map
+    view_offset = list(game.camera_offset)
+    aim_angle = get_aim_angle(player, view_offset, *game.input.aim_axis, game.input.mouse_pos)
+    polygon = game.visibility.compute(player.get_render_center(1.0), aim_angle, player.fov_angle)
+    polygon = [light_map.to_light((x - view_offset[0], y - view_offset[1])) for x, y in polygon]
+    center = light_map.to_light(player.get_aura_center(view_offset, 1.0))
+    base_c, max_c = player.flashlight_base_brightness, player.flashlight_brightness
+    if mode == "texture":
+        radius = light_map.scaled_radius(RAY_LENGTH + WALL_THICKNESS)
+        return lambda: game.flashlight_texture.draw(light_map.surface, polygon, center, base_c, max_c, radius)
+    return lambda: draw_flashlight_steps(light_map.surface, polygon, center, base_c, max_c)
+
+def bench_light_map(scale, smooth):
+    # One frame of the light map without the flashlight: clear, boss aura, composite
+    light_map = LightMap(scale, smooth)
+    aura = create_light_aura(light_map.scaled_radius(BOSS_LIGHT_AURA_RADIUS))
+    aura_rect = aura.get_rect(center=light_map.to_light((WIN_WIDTH / 2, WIN_HEIGHT / 2)))
+    screen = pygame.display.get_surface()
+    def run():
+        light_map.clear()
+        light_map.surface.blit(aura, aura_rect, special_flags=pygame.BLEND_RGB_ADD)
+        light_map.composite(screen)
+    return run
+
+def bench_light_aura(radius):
+    return lambda: create_light_aura(radius)
+
+def build_cases(game):
+    cases = {}
+    for size in (10, 50, 200):
+        cases[f"gen_maze[{size}x{size}]"] = lambda size=size: bench_gen_maze(size)
+    for algorithm in MAZE_ALGORITHMS:
+        cases[f"generate_maze[{algorithm} 500x500]"] = lambda algorithm=algorithm: bench_generate_maze(algorithm, 500)
+    for size in (50, 500):
+        cases[f"topology.build[{size}x{size}]"] = lambda size=size: bench_topology_build(size)
+    for query in ("within", "distance"):
+        cases[f"topology.{query}"] = lambda query=query: bench_topology_query(query)
+    for ray_count in (60, 240, 960):
+        cases[f"cast_rays[{ray_count}]"] = lambda ray_count=ray_count: bench_cast_rays(ray_count)
+    cases[f"player.shoot[{MAX_UPGRADABLE_PELLET_COUNT} pellets]"] = bench_shoot
+    cases["player.move_player"] = bench_player_move
+    cases["enemy.move"] = bench_enemy_move
+    for count in (100, 1000):
+        cases[f"enemy.update[{count}]"] = lambda count=count: bench_enemy_update(count)
+    for count in (1000, 5000):
+        cases[f"enemies.update[{count} objects]"] = lambda count=count: bench_enemy_manager(count, False)
+        cases[f"enemies.update[{count} objects topology]"] = lambda count=count: bench_enemy_manager(count, False, True)
+        if raycast.np is not None:
+            cases[f"enemies.update[{count} packed]"] = lambda count=count: bench_enemy_manager(count, True)
+            cases[f"enemies.update[{count} packed topology]"] = lambda count=count: bench_enemy_manager(count, True, True)
+        cases[f"enemies.respawn[{count} objects]"] = lambda count=count: bench_spawn_churn(count, False)
+        if raycast.np is not None:
+            cases[f"enemies.respawn[{count} packed]"] = lambda count=count: bench_spawn_churn(count, True)
+    for mode in ("texture", "steps"):
+        cases[f"lighting[{mode}]"] = lambda mode=mode: bench_lighting(game, mode)
+        cases[f"flashlight[{mode}]"] = lambda mode=mode: bench_flashlight(game, mode)
+    cases["light_map.frame[1]"] = lambda: bench_light_map(1, False)
+    for scale, smooth in ((0.5, False), (0.25, False), (0.25, True)):
+        cases[f"light_map.frame[{scale} {'smooth' if smooth else 'nearest'}]"] = lambda scale=scale, smooth=smooth: bench_light_map(scale, smooth)
+    light_map = game.light_map
+    for name, radius in (("normal", LIGHT_AURA_RADIUS), ("boss", BOSS_LIGHT_AURA_RADIUS)):
+        cases[f"create_light_aura[{name}]"] = lambda radius=radius: bench_light_aura(light_map.scaled_radius(radius))
+    return cases
+
+def run_benchmarks(selected=None, min_round_seconds=0.05, rounds=5):
+    screen = init_pygame()
+    game = quiet(Game, screen, start_playing=True, seed=1, grid=LEVEL)
+    results = {}
+    for name, build in build_cases(game).items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        run = build()
+        results[name] = time_case(run, min_round_seconds, rounds)
+        print(f"{name:<36} {results[name]['ms']:10.4f} ms")
+    pygame.quit()
+    return {
+        'version': BENCHMARK_FORMAT_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'numpy': raycast.np.__version__ if raycast.np is not None else None,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+def compare(report, baseline, threshold):
+    # Prints each case against the baseline; returns the names that got slower than threshold percent
+    regressions = []
+    print(f"\n{'case':<36} {'baseline':>10} {'current':>10} {'change':>9}")
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<36} {'-':>10} {result['ms']:10.4f} {'new':>9}")
+            continue
+        change = (result['ms'] - before['ms']) / before['ms'] * 100 if before['ms'] else 0
+        marker = ""
+        if change > threshold:
+            marker = "  SLOWER"
+            regressions.append(name)
+        elif change < -threshold:
+            marker = "  faster"
+        print(f"{name:<36} {before['ms']:10.4f} {result['ms']:10.4f} {change:+8.1f}%{marker}")
+    return regressions
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description="Time VisionCurse's hot paths offscreen")
+    parser.add_argument("--output", metavar="PATH", help="write the results as JSON to PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a JSON file written by --output")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change reported as slower/faster (default 10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if any case is slower than the threshold")
+    parser.add_argument("--filter", action="append", metavar="TEXT", help="only run cases whose name contains TEXT (repeatable)")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per case; the median is reported")
+    parser.add_argument("--level", metavar="PATH", help="run the maze-dependent cases on a maze file instead of a generated 10x10 maze")
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="seconds each timed round lasts at least")
+    args = parser.parse_args(argv)
+
+    global LEVEL
+    if args.level:
+        LEVEL = load_maze(args.level)
+    report = run_benchmarks(args.filter, args.min_round_time, args.rounds)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main_benchmark()
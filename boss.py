@@ -1,10 +1,14 @@
 import pygame
 import math
+from assets import ASSETS
+from rotation_cache import ROTATION_CACHE
+from timestep import SIM_CLOCK, interpolate
 from constants import *
 
 class Boss:
     def __init__(self, pos, size, health):
         self.pos = [pos[0], pos[1]]
+        self.prev_pos = [pos[0], pos[1]]
         self.size = size
         self.max_health = health
         self.health = health
@@ -12,8 +16,7 @@ class Boss:
         self.last_attack_time = 0
 
         try:
-            self.original_image = pygame.image.load(BOSS_SPRITE_PATH).convert_alpha()
-            self.original_image = pygame.transform.scale(self.original_image, (self.size[0], self.size[1]))
+            self.original_image = ASSETS.load_image(BOSS_SPRITE_PATH, self.size)
         except pygame.error as e:
             print(f"Error loading boss image: {e}")
             # Fallback to a simple surface if images are missing
@@ -21,6 +24,7 @@ class Boss:
             self.original_image.fill(BOSS_COLOR)
 
         self.image = self.original_image
+        self.sprite_key = (BOSS_SPRITE_PATH, tuple(self.size))
         self.rect = self.image.get_rect(center=self.get_center_pos())
 
     def get_rect(self):
@@ -30,6 +34,10 @@ class Boss:
     def get_center_pos(self):
         return [self.pos[0] + self.size[0] / 2, self.pos[1] + self.size[1] / 2]
 
+    def get_render_center(self, alpha=1.0):
+        pos = interpolate(self.prev_pos, self.pos, alpha)
+        return [pos[0] + self.size[0] / 2, pos[1] + self.size[1] / 2]
+
     def take_damage(self, amount, hit_sound):
         self.health -= amount
         hit_sound.play()
@@ -52,7 +60,7 @@ class Boss:
             self.pos[1] += dy_norm * self.speed
 
             angle = math.degrees(math.atan2(-dy_norm, dx_norm)) # -dy because pygame's y is inverted
-            self.image = pygame.transform.rotate(self.original_image, angle)
+            self.image = ROTATION_CACHE.get(self.sprite_key, self.original_image, angle, BOSS_ROTATION_STEP_DEGREES)
             self.rect = self.image.get_rect(center=self_center)
 
 
@@ -61,14 +69,14 @@ class Boss:
 
         player_rect = player.get_rect()
         if self.get_rect().colliderect(player_rect):
-            current_time = pygame.time.get_ticks()
+            current_time = SIM_CLOCK.get_ticks()
             if current_time - self.last_attack_time > BOSS_ATTACK_COOLDOWN:
                 player.take_damage(BOSS_MELEE_DAMAGE)
                 self.last_attack_time = current_time
                 attack_sound.play()
 
-    def render(self, screen, camera_offset):
-        world_center = self.get_center_pos()
+    def render(self, screen, camera_offset, alpha=1.0):
+        world_center = self.get_render_center(alpha)
         screen_center_x = world_center[0] - camera_offset[0]
         screen_center_y = world_center[1] - camera_offset[1]
         screen_rect = self.image.get_rect(center=(screen_center_x, screen_center_y))
@@ -0,0 +1,140 @@
+import random
+from collections import OrderedDict
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from walls import MASK_BOXES, MASK_SEGMENTS, make_cell_rects, boxes_from_masks
+from maze_gen import generate_masks
+from constants import *
+
+class WorldChunk:
+    def __init__(self, masks):
+        self.masks = masks
+        self.rects = [None] * len(masks)
+
+class ChunkedWallGrid:
+    # Drop-in for WallGrid over a world of WORLD_CHUNKS x WORLD_CHUNKS chunks that is
+    # never held in memory as a whole. A chunk is generated the first time any cell
+    # in it is read, from the world seed and its coordinates alone, so an evicted
+    # chunk comes back identical. Each chunk is a perfect maze of its own; neighbours
+    # are joined through doors whose positions are also derived from the seed, so
+    # both sides agree without either being loaded. With perfect=True each chunk
+    # opens a single door west or north (a binary tree over the chunks), which keeps
+    # the whole world a perfect maze; otherwise every chunk border gets a door.
+    def __init__(self, seed, chunk_cells=WORLD_CHUNK_CELLS, chunks=WORLD_CHUNKS, max_chunks=WORLD_MAX_CHUNKS,
+                 algorithm=MAZE_ALGORITHM, perfect=WORLD_PERFECT, exit_chunks=WORLD_EXIT_CHUNKS):
+        self.seed = seed
+        self.chunk_cells = chunk_cells
+        self.chunks_per_side = chunks
+        self.cols = self.rows = chunks * chunk_cells
+        self.max_chunks = max_chunks
+        self.algorithm = algorithm
+        self.perfect = perfect
+        self.start_cell = (0, 0)
+        exit_index = min(exit_chunks, chunks) * chunk_cells - 1
+        self.exit_cell = (exit_index, exit_index)
+        self.chunks = OrderedDict()
+        self.chunks_generated = 0
+        self._last_key = None
+        self._last_chunk = None
+
+    # --- Generation ---
+    def _doors(self, chunk_x, chunk_y):
+        # (row of the west door, column of the north door), None where there is none
+        rng = random.Random(f"{self.seed}:doors:{chunk_x}:{chunk_y}")
+        west = rng.randrange(self.chunk_cells) if chunk_x > 0 else None
+        north = rng.randrange(self.chunk_cells) if chunk_y > 0 else None
+        if self.perfect and west is not None and north is not None:
+            if rng.random() < 0.5:
+                west = None
+            else:
+                north = None
+        return west, north
+
+    def _generate(self, chunk_x, chunk_y):
+        size = self.chunk_cells
+        masks = generate_masks(random.Random(f"{self.seed}:{chunk_x}:{chunk_y}"), size, size, self.algorithm)
+        last = size - 1
+        west, north = self._doors(chunk_x, chunk_y)
+        if west is not None:
+            masks[west] &= ~WALL_LEFT & WALL_ALL
+        if north is not None:
+            masks[north * size] &= ~WALL_TOP & WALL_ALL
+        if chunk_x + 1 < self.chunks_per_side:
+            east = self._doors(chunk_x + 1, chunk_y)[0]
+            if east is not None:
+                masks[last * size + east] &= ~WALL_RIGHT & WALL_ALL
+        if chunk_y + 1 < self.chunks_per_side:
+            south = self._doors(chunk_x, chunk_y + 1)[1]
+            if south is not None:
+                masks[south * size + last] &= ~WALL_BOTTOM & WALL_ALL
+        if chunk_x == 0 and chunk_y == 0:
+            masks[0] &= ~WALL_TOP & WALL_ALL # entrance, like WallGrid's
+        self.chunks_generated += 1
+        return WorldChunk(masks)
+
+    def _chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        if key == self._last_key:
+            return self._last_chunk
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = self._generate(chunk_x, chunk_y)
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        self._last_key = key
+        self._last_chunk = chunk
+        return chunk
+
+    # --- WallGrid interface ---
+    def in_bounds(self, col, row):
+        return 0 <= col < self.cols and 0 <= row < self.rows
+
+    def get_mask(self, col, row):
+        size = self.chunk_cells
+        return self._chunk(col // size, row // size).masks[(col % size) * size + row % size]
+
+    def has_wall(self, col, row, bit):
+        return bool(self.get_mask(col, row) & bit)
+
+    def cell_boxes(self, col, row):
+        return MASK_BOXES[self.get_mask(col, row)]
+
+    def cell_segments(self, col, row):
+        return MASK_SEGMENTS[self.get_mask(col, row)]
+
+    def cell_rects(self, col, row):
+        size = self.chunk_cells
+        chunk = self._chunk(col // size, row // size)
+        i = (col % size) * size + row % size
+        rects = chunk.rects[i]
+        if rects is None:
+            rects = chunk.rects[i] = make_cell_rects(col, row, chunk.masks[i])
+        return rects
+
+    def boxes_in_region(self, col0, row0, col1, row1):
+        col0 = max(0, col0)
+        row0 = max(0, row0)
+        col1 = min(self.cols - 1, col1)
+        row1 = min(self.rows - 1, row1)
+        if col0 > col1 or row0 > row1:
+            return np.empty((0, 4))
+
+        size = self.chunk_cells
+        boxes = []
+        for chunk_x in range(col0 // size, col1 // size + 1):
+            for chunk_y in range(row0 // size, row1 // size + 1):
+                c0 = max(col0, chunk_x * size)
+                r0 = max(row0, chunk_y * size)
+                c1 = min(col1, chunk_x * size + size - 1)
+                r1 = min(row1, chunk_y * size + size - 1)
+                masks = np.frombuffer(self._chunk(chunk_x, chunk_y).masks, dtype=np.uint8).reshape(size, size)
+                boxes.append(boxes_from_masks(masks[c0 - chunk_x * size:c1 - chunk_x * size + 1, r0 - chunk_y * size:r1 - chunk_y * size + 1], c0, r0))
+        return np.concatenate(boxes)
+
+    def memory_usage(self):
+        # Wall masks of the chunks currently held; bounded by max_chunks
+        return sum(chunk.masks.itemsize * len(chunk.masks) for chunk in self.chunks.values())
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from profiler import PROFILER
+from constants import *
+
+# Entities already touching a face within this distance count as in contact with it
+CONTACT_EPSILON = 1e-6
+
+class ColliderBlock:
+    def __init__(self, col0, row0, cells):
+        self.col0 = col0
+        self.row0 = row0
+        self.cells = cells
+
+class StaticColliders:
+    # The maze walls as merged boxes (x0, y0, x1, y1). The wall on a cell edge and
+    # the one on the neighbour's side of it become a single slab, and slabs of the
+    # same thickness running along a grid line are joined across cells. Boxes are
+    # built for a block of cells the first time anything moves there, filed under
+    # every cell they overlap, and kept in an LRU (streamed worlds never finish).
+    # sweep() serves anything that moves through the maze: player, enemies and
+    # projectiles all go through the same code.
+    def __init__(self, grid, block_cells=COLLISION_BLOCK_CELLS, max_blocks=COLLISION_MAX_BLOCKS):
+        self.grid = grid
+        self.block_cells = block_cells
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+
+    # --- Building ---
+    def _horizontal_extent(self, col, row):
+        # y range of the wall on the top edge of (col, row), or None
+        grid = self.grid
+        line = row * CELL_SIZE
+        low = high = None
+        if row < grid.rows and grid.get_mask(col, row) & WALL_TOP:
+            low, high = line, line + WALL_THICKNESS
+        if row > 0 and grid.get_mask(col, row - 1) & WALL_BOTTOM:
+            low, high = line - WALL_THICKNESS, high if high is not None else line
+        return (low, high) if low is not None else None
+
+    def _vertical_extent(self, col, row):
+        # x range of the wall on the left edge of (col, row), or None
+        grid = self.grid
+        line = col * CELL_SIZE
+        low = high = None
+        if col < grid.cols and grid.get_mask(col, row) & WALL_LEFT:
+            low, high = line, line + WALL_THICKNESS
+        if col > 0 and grid.get_mask(col - 1, row) & WALL_RIGHT:
+            low, high = line - WALL_THICKNESS, high if high is not None else line
+        return (low, high) if low is not None else None
+
+    def _build_block(self, block_x, block_y):
+        grid = self.grid
+        size = self.block_cells
+        col0 = block_x * size
+        row0 = block_y * size
+        col1 = min(grid.cols, col0 + size)
+        row1 = min(grid.rows, row0 + size)
+
+        boxes = []
+        # Every grid line touching the block, including its bottom and right edges
+        for row in range(row0, row1 + 1):
+            run_start = col0
+            run = None
+            for col in range(col0, col1 + 1):
+                extent = self._horizontal_extent(col, row) if col < col1 else None
+                if extent != run:
+                    if run is not None:
+                        boxes.append((run_start * CELL_SIZE, run[0], col * CELL_SIZE, run[1]))
+                    run_start = col
+                    run = extent
+        for col in range(col0, col1 + 1):
+            run_start = row0
+            run = None
+            for row in range(row0, row1 + 1):
+                extent = self._vertical_extent(col, row) if row < row1 else None
+                if extent != run:
+                    if run is not None:
+                        boxes.append((run[0], run_start * CELL_SIZE, run[1], row * CELL_SIZE))
+                    run_start = row
+                    run = extent
+
+        cells = [[] for _ in range((col1 - col0) * (row1 - row0))]
+        height = row1 - row0
+        for box in boxes:
+            x0, y0, x1, y1 = box
+            for col in range(max(col0, int(x0 // CELL_SIZE)), min(col1, int(-(-x1 // CELL_SIZE)))):
+                for row in range(max(row0, int(y0 // CELL_SIZE)), min(row1, int(-(-y1 // CELL_SIZE)))):
+                    cells[(col - col0) * height + row - row0].append(box)
+        return ColliderBlock(col0, row0, [tuple(cell) for cell in cells])
+
+    def _block(self, block_x, block_y):
+        key = (block_x, block_y)
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = self._build_block(block_x, block_y)
+            while len(self.blocks) > self.max_blocks:
+                self.blocks.popitem(last=False)
+        else:
+            self.blocks.move_to_end(key)
+        return block
+
+    # --- Queries ---
+    def boxes_near(self, x0, y0, x1, y1):
+        # Every wall box overlapping the area, possibly a few more
+        grid = self.grid
+        size = self.block_cells
+        col0 = max(0, int(x0 // CELL_SIZE))
+        row0 = max(0, int(y0 // CELL_SIZE))
+        col1 = min(grid.cols - 1, int(x1 // CELL_SIZE))
+        row1 = min(grid.rows - 1, int(y1 // CELL_SIZE))
+        if col0 == col1 and row0 == row1:
+            block = self._block(col0 // size, row0 // size)
+            return block.cells[(col0 - block.col0) * min(size, grid.rows - block.row0) + row0 - block.row0]
+        found = {}
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                block = self._block(col // size, row // size)
+                found.update(dict.fromkeys(block.cells[(col - block.col0) * min(size, grid.rows - block.row0) + row - block.row0]))
+        return found
+
+    def sweep(self, x, y, w, h, dx, dy):
+        # Moves the box (x, y, w, h) by dx along x and then by dy along y, each time
+        # stopping flush against the first wall in the way, so nothing can skip
+        # through a wall however fast it goes. Returns the allowed (dx, dy) and the
+        # normals of the walls it ended up against.
+        boxes = self.boxes_near(min(x, x + dx), min(y, y + dy), max(x, x + dx) + w, max(y, y + dy) + h)
+        PROFILER.count("collision_boxes", len(boxes))
+        normals = []
+        if dx:
+            allowed = dx
+            for x0, y0, x1, y1 in boxes:
+                if y1 <= y or y0 >= y + h:
+                    continue
+                if dx > 0:
+                    if x0 >= x + w - CONTACT_EPSILON and x0 - (x + w) < allowed:
+                        allowed = max(0, x0 - (x + w))
+                elif x1 <= x + CONTACT_EPSILON and x1 - x > allowed:
+                    allowed = min(0, x1 - x)
+            if allowed != dx:
+                normals.append((-1 if dx > 0 else 1, 0))
+            dx = allowed
+            x += dx
+        if dy:
+            allowed = dy
+            for x0, y0, x1, y1 in boxes:
+                if x1 <= x or x0 >= x + w:
+                    continue
+                if dy > 0:
+                    if y0 >= y + h - CONTACT_EPSILON and y0 - (y + h) < allowed:
+                        allowed = max(0, y0 - (y + h))
+                elif y1 <= y + CONTACT_EPSILON and y1 - y > allowed:
+                    allowed = min(0, y1 - y)
+            if allowed != dy:
+                normals.append((0, -1 if dy > 0 else 1))
+            dy = allowed
+        return dx, dy, normals
+
+def colliders_for(grid):
+    # The grid's StaticColliders, created on first use
+    colliders = getattr(grid, 'colliders', None)
+    if colliders is None:
+        colliders = grid.colliders = StaticColliders(grid)
+    return colliders
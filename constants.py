@@ -3,6 +3,17 @@ import pygame
 WIN_WIDTH = 1920
 WIN_HEIGHT = 1080
 
+SIM_HZ = 60 # fixed simulation steps per second; speeds and fade steps are per step
+RENDER_FPS = 60 # frame cap for drawing, independent of SIM_HZ (0 = uncapped)
+MAX_FRAME_TIME_MS = 250 # longest frame the simulation catches up on before dropping time
+HEADLESS_DEFAULT_SECONDS = 60 # simulated time for a headless run when no tick count is given
+HEADLESS_BOT_TURN_TICKS = 90 # steps the headless bot keeps walking in one direction
+
+PROFILER_TOGGLE_KEY = pygame.K_F3
+PROFILER_HISTORY_FRAMES = 240 # frames behind the overlay's averages, p99 and graph
+PROFILER_OVERLAY_WIDTH = 420
+PROFILER_GRAPH_HEIGHT = 80 # pixels; the middle line is the frame time RENDER_FPS allows
+
 PLAYER_SIZE = 60
 PLAYER_SPEED = 6
 PLAYER_MAX_HEALTH = 100
@@ -11,13 +22,43 @@ CELL_SIZE = PLAYER_SIZE * 2.5
 WALL_THICKNESS = 8
 COLS = 10
 ROWS = 10
+MAZE_ALGORITHM = 'backtracker' # see maze_gen.MAZE_ALGORITHMS
+MAZE_BRAID_FRACTION = 0.5 # share of dead ends the braid generator opens up
+MAZE_LEVEL_PATH = None # maze file (see maze_file.py) to play instead of generating a maze
+
+# Wall bitmask stored per cell in walls.WallGrid
+WALL_TOP = 1
+WALL_RIGHT = 2
+WALL_BOTTOM = 4
+WALL_LEFT = 8
+WALL_ALL = WALL_TOP | WALL_RIGHT | WALL_BOTTOM | WALL_LEFT
+WALL_SIDES = (('top', WALL_TOP), ('right', WALL_RIGHT), ('bottom', WALL_BOTTOM), ('left', WALL_LEFT))
 
 WORLD_WIDTH = COLS * CELL_SIZE
 WORLD_HEIGHT = ROWS * CELL_SIZE
 
+CHUNKED_WORLD = False # stream an effectively unbounded maze in chunks instead of the COLS x ROWS grid
+WORLD_CHUNK_CELLS = 32 # cells per side of a streamed chunk
+WORLD_CHUNKS = 4096 # chunks per side of the streamed world
+WORLD_MAX_CHUNKS = 64 # generated chunks kept before the least recently used is dropped
+WORLD_EXIT_CHUNKS = 3 # the exit is in the last cell of this chunk along the diagonal
+WORLD_PERFECT = False # True: one door per chunk, keeping the maze perfect; False: a door on every chunk border
+
+COLLISION_BLOCK_CELLS = 8 # cells per side of a block of merged wall colliders
+COLLISION_MAX_BLOCKS = 256 # collider blocks kept before the least recently used is dropped
+
+TOPOLOGY_MAX_SOURCES = 8 # full distance maps (besides start and exit) kept before the least recently used is dropped
+TOPOLOGY_MAX_REACHES = 256 # bounded "within k steps" searches kept
+
+MAZE_LAYER_CHUNK_SIZE = 512 # pixels per side of a pre-rendered maze chunk
+MAZE_LAYER_MAX_CHUNKS = 32 # chunks kept before the least recently used is dropped
+
 FOV_ANGLE_DEGREES = 60
-RAY_COUNT = 60
+RAY_COUNT = 240
 RAY_LENGTH = 300
+FLASHLIGHT_ENGINE = "visibility" # "visibility" (exact polygon) or "rays" (RAY_COUNT fixed rays)
+VISIBILITY_ARC_STEP_DEGREES = 2 # spacing of the samples that round off the end of the cone
+VISIBILITY_CORNER_EPSILON = 0.0001 # radians either side of a wall corner
 # AURA_RADIUS = 50
 
 LIGHT_AURA_RADIUS = PLAYER_SIZE * 2
@@ -25,8 +66,12 @@ BOSS_LIGHT_AURA_RADIUS = LIGHT_AURA_RADIUS * 20
 
 FLASHLIGHT_BASE_BRIGHTNESS = (40, 40, 40)
 FLASHLIGHT_GRADIENT_STEPS = 8
+FLASHLIGHT_LIGHTING_MODE = "steps" # "steps" (one fill per gradient step) or "texture" (one masked fill, radial bands: walls up close light brighter)
 FLASHLIGHT_MAX_BRIGHTNESS = (120, 120, 120)
 
+LIGHT_MAP_SCALE = 0.5 # light map resolution relative to the window (1, 0.5 or 0.25)
+LIGHT_MAP_SMOOTH = False # below 0.5 scale, smoothscale up to half the window before stretching (softer edges, ~0.8 ms more)
+
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -43,13 +88,21 @@ SHOTGUN_PELLET_COLOR = (255, 200, 0)
 SHOTGUN_PELLET_THICKNESS = 5
 SHOTGUN_PELLET_LIFETIME = 100 # ms
 SHOTGUN_PELLET_DAMAGE = 25
+SHOTGUN_PELLET_PENETRATION = 0 # extra targets a pellet passes through after the first
 
 SWAP_KEY = pygame.K_q
 RELOAD_KEY = pygame.K_r
 
+SWAP_COOLDOWN = 500 # ms between controller item swaps
+SHOOT_COOLDOWN = 500 # ms between shots
+SKILL_UPGRADE_COOLDOWN = 67 # ms between controller upgrade inputs
+
 IMPACT_SHAKE_DURATION = 100 # ms
 IMPACT_SHAKE_STRENGTH = 8
 
+ROTATION_CACHE_STEP_DEGREES = 2
+ROTATION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
 ENEMY_COLOR = (0, 255, 0)
 ENEMY_SIZE = PLAYER_SIZE
 ENEMY_SPEED = 2.5
@@ -60,6 +113,19 @@ ENEMY_DETECTION_RANGE = 250 # pixels
 ENEMY_SPAWN_INTERVAL = 100 # 100 ms
 ENEMY_MAX_COUNT = 20
 ENEMY_KILL_REWARD = 1
+ENEMY_ARRAY_CAPACITY = 64 # starting rows of the enemy arrays; doubled when full
+ENEMY_POOL_SIZE = 64 # removed enemies kept for reuse by later spawns
+ENEMY_SPAWN_MIN_CELLS = 5 # spawn distance band around the player, in cells
+ENEMY_SPAWN_MAX_CELLS = 7
+ENEMY_SPAWN_CLEARANCE_CELLS = 4 # fixed mazes: least straight-line distance of a spawn, which the band there counts in steps
+ENEMY_DESPAWN_MARGIN_STEPS = 3 # despawn radius, in cells, beyond the far edge of the spawn band
+SPAWN_RING_CACHE_CELLS = 1024 # player cells whose spawn candidates are kept
+FLOW_FIELD_RADIUS = 32 # cells around the player covered by the pursuit flow field
+
+AI_MID_INTERVAL = 3 # ticks between updates for on-screen or mid-range enemies
+AI_DORMANT_INTERVAL = 15 # ticks between updates for distant enemies
+AI_MAX_CATCH_UP_TICKS = 4 # most ticks of movement an enemy makes up in one update
+AI_FRAME_BUDGET_MS = 2.0 # after this much enemy AI in a tick, non-active enemies wait
 
 
 SKILL_POINT_COST = 1
@@ -88,6 +154,7 @@ BOSS_SPEED = 2.0
 BOSS_COLOR = (255, 0, 255)
 BOSS_MELEE_DAMAGE = 25
 BOSS_ATTACK_COOLDOWN = 1500 # 1.5 seconds
+BOSS_ROTATION_STEP_DEGREES = 5 # the boss sprite is large, so it gets coarser cached rotations
 
 ARENA_WIDTH = WIN_WIDTH * 2
 ARENA_HEIGHT = WIN_HEIGHT * 2
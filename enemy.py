@@ -1,30 +1,46 @@
 import pygame
 import math
 import random
+from assets import ASSETS
+from rotation_cache import ROTATION_CACHE
+from timestep import SIM_CLOCK, interpolate
+from profiler import PROFILER
+from collision import colliders_for
+from spawner import despawn_cells
 from constants import *
 
 class Enemy:
     def __init__(self, pos, size):
         self.pos = [pos[0], pos[1]]
+        self.prev_pos = [pos[0], pos[1]]
         self.size = size
-        self.health = ENEMY_HEALTH
-        self.speed = ENEMY_SPEED
-        self.last_attack_time = 0
-        self.is_alerted = False
-        self.is_far = False
+        self.spatial_index = None
 
         try:
-            self.original_image = pygame.image.load(ENEMY_SPRITE_PATH).convert_alpha()
-            self.original_image = pygame.transform.scale(self.original_image, (self.size[0], self.size[1]))
+            self.original_image = ASSETS.load_image(ENEMY_SPRITE_PATH, self.size)
         except pygame.error as e:
             print(f"Error loading enemy image: {e}")
             self.original_image = pygame.Surface(self.size)
             self.original_image.fill(ENEMY_COLOR)
         
+        # Every enemy of the same size shares one set of cached rotations
+        self.sprite_key = (ENEMY_SPRITE_PATH, tuple(self.size))
+        self.reset(pos)
+
+    def reset(self, pos):
+        # Back to a freshly spawned enemy at pos; pooled enemies go through this on reuse
+        self.pos[0], self.pos[1] = pos[0], pos[1]
+        self.prev_pos[0], self.prev_pos[1] = pos[0], pos[1]
+        self.health = ENEMY_HEALTH
+        self.speed = ENEMY_SPEED
+        self.last_attack_time = 0
+        self.is_alerted = False
+        self.is_far = False
+        self.ai_pending_ticks = 0
         self.image = self.original_image
 
-    def render(self, screen, camera_offset):
-        world_center = self.get_center_pos()
+    def render(self, screen, camera_offset, alpha=1.0):
+        world_center = self.get_render_center(alpha)
         screen_center_x = world_center[0] - camera_offset[0]
         screen_center_y = world_center[1] - camera_offset[1]
         
@@ -38,11 +54,16 @@ class Enemy:
         # pygame.draw.rect(screen, ENEMY_COLOR, (screen_x, screen_y, self.size[0], self.size[1]))
 
     def get_rect(self):
+        PROFILER.count("rects_allocated")
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
     
     def get_center_pos(self):
         return [self.pos[0] + self.size[0] / 2, self.pos[1] + self.size[1] / 2]
 
+    def get_render_center(self, alpha=1.0):
+        pos = interpolate(self.prev_pos, self.pos, alpha)
+        return [pos[0] + self.size[0] / 2, pos[1] + self.size[1] / 2]
+
     def take_damage(self, amount):
         self.health -= amount
         if self.health <= 0:
@@ -50,7 +71,7 @@ class Enemy:
             return True # Return True if dead
         return False
 
-    def update(self, player, grid , current_detection_range , attack_sound , alert_sound):
+    def update(self, player, grid , current_detection_range , attack_sound , alert_sound , flow_field=None , ticks=1):
         player_center = player.get_center_pos()
         self_center = self.get_center_pos()
 
@@ -64,18 +85,26 @@ class Enemy:
             dy = player_center[1] - self_center[1]
 
             angle = math.degrees(math.atan2(-dy, dx))
-            self.image = pygame.transform.rotate(self.original_image, angle)
+            self.image = ROTATION_CACHE.get(self.sprite_key, self.original_image, angle)
+
+            # Outside the player's cell, follow the maze towards them instead of walking into walls
+            if flow_field is not None:
+                waypoint = flow_field.next_waypoint(int(self_center[0] // CELL_SIZE), int(self_center[1] // CELL_SIZE))
+                if waypoint is not None:
+                    dx = waypoint[0] - self_center[0]
+                    dy = waypoint[1] - self_center[1]
 
             # Normalize vector
             norm = math.sqrt(dx * dx + dy * dy)
             if norm > 0:
-                dx = (dx / norm) * self.speed
-                dy = (dy / norm) * self.speed
+                # An enemy the AI scheduler skipped makes up the ticks it missed
+                dx = (dx / norm) * self.speed * ticks
+                dy = (dy / norm) * self.speed * ticks
                 self.move(grid, dx, dy) # Call move method
 
             player_rect = player.get_rect()
             if self.get_rect().colliderect(player_rect):
-                current_time = pygame.time.get_ticks()
+                current_time = SIM_CLOCK.get_ticks()
                 if current_time - self.last_attack_time > ENEMY_ATTACK_COOLDOWN:
                     player.take_damage(ENEMY_MELEE_DAMAGE)
                     attack_sound.play()
@@ -84,38 +113,18 @@ class Enemy:
             self.is_alerted = False
             self.image = self.original_image
         
-        if dist > current_detection_range * 3:
+        if dist > despawn_cells(current_detection_range) * CELL_SIZE:
             self.is_far = True
         else:
             self.is_far = False 
 
     def move(self, grid, dx, dy):
-        new_x = self.pos[0] + dx
-        new_y = self.pos[1] + dy
-
-        new_x = max(0 , new_x)
-        new_y = max(0 , new_y)
-
-        new_rect_x = pygame.Rect(new_x, self.pos[1], self.size[0], self.size[1])
-        new_rect_y = pygame.Rect(self.pos[0], new_y, self.size[0], self.size[1])
-
-        can_move_x = True
-        can_move_y = True
-
-        current_col = int((self.pos[0] + self.size[0] / 2) // CELL_SIZE)
-        current_row = int((self.pos[1] + self.size[1] / 2) // CELL_SIZE)
-
-        for c in range(max(0, current_col - 1), min(COLS, current_col + 2)):
-            for r in range(max(0, current_row - 1), min(ROWS, current_row + 2)):
-                cell = grid[c][r]
-                
-                for wall in cell.get_wall_rects():
-                    if new_rect_x.colliderect(wall):
-                        can_move_x = False
-                    if new_rect_y.colliderect(wall):
-                        can_move_y = False
-
-        if can_move_x:
-            self.pos[0] = new_x
-        if can_move_y:
-            self.pos[1] = new_y
\ No newline at end of file
+        new_x = max(0 , self.pos[0] + dx)
+        new_y = max(0 , self.pos[1] + dy)
+
+        dx, dy, _ = colliders_for(grid).sweep(self.pos[0], self.pos[1], self.size[0], self.size[1], new_x - self.pos[0], new_y - self.pos[1])
+        self.pos[0] += dx
+        self.pos[1] += dy
+
+        if self.spatial_index is not None:
+            self.spatial_index.update(self)
\ No newline at end of file
@@ -0,0 +1,314 @@
+import pygame
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from enemy import Enemy
+from spawner import despawn_cells
+from ai_scheduler import AIScheduler
+from rotation_cache import ROTATION_CACHE
+from timestep import SIM_CLOCK
+from profiler import PROFILER
+from constants import *
+
+class ArrayField:
+    # An enemy attribute stored in its manager's array of the same name while the
+    # enemy is alive; a removed enemy keeps its last values in `detached`
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, enemy, owner=None):
+        if enemy is None:
+            return self
+        if enemy.slot is None:
+            return enemy.detached[self.name]
+        return self.kind(getattr(enemy.manager, self.name)[enemy.slot])
+
+    def __set__(self, enemy, value):
+        if enemy.slot is None:
+            enemy.detached[self.name] = value
+        else:
+            getattr(enemy.manager, self.name)[enemy.slot] = value
+
+class PackedEnemy(Enemy):
+    # An Enemy whose position and hot state live in an EnemyManager's arrays. pos and
+    # prev_pos are views of its rows, so Enemy.move, rendering and the spatial hash
+    # work on it unchanged.
+    health = ArrayField(int)
+    speed = ArrayField(float)
+    last_attack_time = ArrayField(int)
+    is_alerted = ArrayField(bool)
+    is_far = ArrayField(bool)
+
+    def __init__(self, manager, slot, pos, size):
+        self.manager = manager
+        self.slot = slot
+        self.detached = {}
+        Enemy.__init__(self, pos, size)
+        manager.pos[slot] = self.pos
+        manager.prev_pos[slot] = self.prev_pos
+        manager.size[slot] = self.size
+        self.bind()
+
+    def bind(self):
+        self.pos = self.manager.pos[self.slot]
+        self.prev_pos = self.manager.prev_pos[self.slot]
+
+    def detach(self):
+        manager = self.manager
+        slot = self.slot
+        self.detached = {name: getattr(self, name) for name in ('health', 'speed', 'last_attack_time', 'is_alerted', 'is_far')}
+        self.pos = [float(manager.pos[slot, 0]), float(manager.pos[slot, 1])]
+        self.prev_pos = [float(manager.prev_pos[slot, 0]), float(manager.prev_pos[slot, 1])]
+        self.slot = None
+
+class EnemyManager:
+    # Owns the maze enemies and keeps the spatial index in step with them. With
+    # NumPy, positions, sizes, health, speeds, alert/despawn flags and attack timers
+    # are kept as arrays (one row per live enemy, removal swaps the last row in), and
+    # detection, hysteresis, the despawn test and steering run for every enemy in one
+    # vectorized pass per tick. Only enemies chasing the player go on to the
+    # per-object part: sprite rotation, the wall collision in Enemy.move and the
+    # melee check. Without NumPy (or with packed=False) the enemies are plain Enemy
+    # objects updated one at a time through the AI scheduler. Either way every
+    # enemy knows its slot in `entities`, and removed enemies go to a free list that
+    # spawn() takes from before building a new one. Given a MazeTopology, the
+    # despawn radius is counted in steps along the maze (see despawn_cells) instead
+    # of straight across the walls, so an enemy just behind a wall but with a long
+    # way round to the player is dropped.
+    def __init__(self, spatial_index, packed=None, capacity=ENEMY_ARRAY_CAPACITY, pool_size=ENEMY_POOL_SIZE, topology=None,
+                 budget_ms=AI_FRAME_BUDGET_MS):
+        self.spatial_index = spatial_index
+        self.topology = topology
+        self.packed = np is not None if packed is None else packed
+        # Only the per-object fallback needs tiers and a frame budget; the packed pass
+        # runs detection for everyone every tick for less than classifying them costs
+        self.scheduler = None if self.packed else AIScheduler(budget_ms=budget_ms)
+        # Enemies whose AI ran, waited for their tier's interval, or waited for the
+        # next tick's budget: on the last update and summed over all of them
+        self.ai_stats = {'updated': 0, 'skipped': 0, 'deferred': 0}
+        self.ai_totals = dict(self.ai_stats)
+        self.entities = []
+        # Removed enemies by size, waiting to be reset and spawned again
+        self.free = {}
+        self.pool_size = pool_size
+        if self.packed:
+            self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = None
+        if hasattr(self, 'pos'):
+            old = (self.pos, self.prev_pos, self.size, self.health, self.speed, self.last_attack_time, self.is_alerted, self.is_far)
+        self.capacity = capacity
+        self.pos = np.zeros((capacity, 2))
+        self.prev_pos = np.zeros((capacity, 2))
+        self.size = np.zeros((capacity, 2))
+        self.health = np.zeros(capacity, dtype=np.int64)
+        self.speed = np.zeros(capacity)
+        self.last_attack_time = np.zeros(capacity, dtype=np.int64)
+        self.is_alerted = np.zeros(capacity, dtype=bool)
+        self.is_far = np.zeros(capacity, dtype=bool)
+        if old is not None:
+            n = len(self.entities)
+            for new_array, old_array in zip((self.pos, self.prev_pos, self.size, self.health, self.speed, self.last_attack_time, self.is_alerted, self.is_far), old):
+                new_array[:n] = old_array[:n]
+            # The enemies' pos/prev_pos views still point at the old arrays
+            for enemy in self.entities:
+                enemy.bind()
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def spawn(self, pos, size):
+        # Reuses a removed enemy of the same size when there is one
+        free = self.free.get(tuple(size))
+        slot = len(self.entities)
+        if self.packed and slot == self.capacity:
+            self._allocate(self.capacity * 2)
+        if free:
+            enemy = free.pop()
+            enemy.slot = slot
+            if self.packed:
+                enemy.bind()
+                self.size[slot] = enemy.size
+            enemy.reset(pos)
+        elif self.packed:
+            enemy = PackedEnemy(self, slot, pos, size)
+        else:
+            enemy = Enemy(pos, size)
+            enemy.slot = slot
+        self.entities.append(enemy)
+        self.spatial_index.insert(enemy)
+        enemy.spatial_index = self.spatial_index
+        return enemy
+
+    def remove(self, enemy):
+        # Swaps the last enemy into the freed slot, so removal costs the same at any count
+        self.spatial_index.remove(enemy)
+        enemy.spatial_index = None
+        slot = enemy.slot
+        last = len(self.entities) - 1
+        if self.packed:
+            enemy.detach()
+        else:
+            enemy.slot = None
+        if slot != last:
+            moved = self.entities[last]
+            if self.packed:
+                for array in (self.pos, self.prev_pos, self.size, self.health, self.speed, self.last_attack_time, self.is_alerted, self.is_far):
+                    array[slot] = array[last]
+            moved.slot = slot
+            if self.packed:
+                moved.bind()
+            self.entities[slot] = moved
+        self.entities.pop()
+        self._release(enemy)
+
+    def _release(self, enemy):
+        free = self.free.setdefault(tuple(enemy.size), [])
+        if len(free) < self.pool_size:
+            free.append(enemy)
+
+    def clear(self):
+        for enemy in self.entities:
+            enemy.spatial_index = None
+            if self.packed:
+                enemy.detach()
+            else:
+                enemy.slot = None
+            self._release(enemy)
+        self.entities.clear()
+        self.spatial_index.clear()
+
+    def snapshot_positions(self):
+        # Start of a step: remember where everything was for render interpolation
+        if self.packed:
+            n = len(self.entities)
+            self.prev_pos[:n] = self.pos[:n]
+        else:
+            for enemy in self.entities:
+                enemy.prev_pos[:] = enemy.pos
+
+    def far_enemies(self):
+        # Enemies the last update found beyond the despawn radius
+        if self.packed:
+            return [self.entities[i] for i in np.flatnonzero(self.is_far[:len(self.entities)])]
+        return [enemy for enemy in self.entities if enemy.is_far]
+
+    def _reach(self, player_center, detection_range):
+        # Cells within the despawn radius of the player's, from the topology's cache
+        topology = self.topology
+        return topology.within(topology.cell(topology.cell_at(*player_center)), despawn_cells(detection_range))
+
+    def _reach_mask(self, player_center, detection_range):
+        # The same cells as a boolean array over every cell index
+        topology = self.topology
+        return topology.within_mask(topology.cell(topology.cell_at(*player_center)), despawn_cells(detection_range))
+
+    def _cell_of(self, center):
+        # Cell index under an enemy's center, None off the grid
+        col = int(center[0] // CELL_SIZE)
+        row = int(center[1] // CELL_SIZE)
+        if 0 <= col < self.topology.cols and 0 <= row < self.topology.rows:
+            return col * self.topology.rows + row
+        return None
+
+    def update(self, player, grid, detection_range, attack_sound, alert_sound, flow_field, view_rect=None):
+        # view_rect (the camera's world rect) only feeds the fallback's scheduler tiers
+        if self.packed:
+            self._update_packed(player, grid, detection_range, attack_sound, alert_sound, flow_field)
+            # The packed pass has no tiers: every enemy's AI runs every tick
+            self.ai_stats = {'updated': len(self.entities), 'skipped': 0, 'deferred': 0}
+        else:
+            self.ai_stats = self._update_objects(player, grid, detection_range, attack_sound, alert_sound, flow_field, view_rect)
+        for name, amount in self.ai_stats.items():
+            self.ai_totals[name] += amount
+            PROFILER.count("ai_" + name, amount)
+
+    def _update_objects(self, player, grid, detection_range, attack_sound, alert_sound, flow_field, view_rect):
+        # Anything outside the despawn radius is dropped without running its AI
+        player_center = player.get_center_pos()
+        if self.topology is None:
+            near_enemies = set(self.spatial_index.query_radius(player_center, despawn_cells(detection_range) * CELL_SIZE))
+        else:
+            reach = self._reach(player_center, detection_range)
+            near_enemies = {enemy for enemy in self.entities if self._cell_of(enemy.get_center_pos()) in reach}
+        for enemy in self.entities:
+            if enemy not in near_enemies:
+                enemy.is_far = True
+        return self.scheduler.run([enemy for enemy in self.entities if enemy in near_enemies], player_center, view_rect, detection_range,
+                           lambda enemy, ticks: enemy.update(player, grid, detection_range, attack_sound, alert_sound, flow_field, ticks))
+
+    def _update_packed(self, player, grid, detection_range, attack_sound, alert_sound, flow_field):
+        # Same rules as Enemy.update, for all enemies at once, every tick
+        n = len(self.entities)
+        if n == 0:
+            return
+        pos = self.pos[:n]
+        centers = pos + self.size[:n] / 2
+        delta = np.asarray(player.get_center_pos(), dtype=float) - centers
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+
+        alerted = self.is_alerted[:n]
+        chasing = dist < detection_range
+        if (chasing & ~alerted).any():
+            alert_sound.play()
+        calmed = alerted & (dist > detection_range * 1.5)
+        for i in np.flatnonzero(calmed):
+            enemy = self.entities[i]
+            enemy.image = enemy.original_image
+        alerted |= chasing
+        alerted &= ~calmed
+        if self.topology is None:
+            self.is_far[:n] = dist > despawn_cells(detection_range) * CELL_SIZE
+        else:
+            topology = self.topology
+            reach = self._reach_mask(player.get_center_pos(), detection_range)
+            cols = (centers[:, 0] // CELL_SIZE).astype(np.intp)
+            rows = (centers[:, 1] // CELL_SIZE).astype(np.intp)
+            on_grid = (cols >= 0) & (cols < topology.cols) & (rows >= 0) & (rows < topology.rows)
+            cells = np.clip(cols, 0, topology.cols - 1) * topology.rows + np.clip(rows, 0, topology.rows - 1)
+            self.is_far[:n] = ~(on_grid & reach[cells])
+
+        chasers = np.flatnonzero(chasing)
+        if len(chasers) == 0:
+            return
+        to_player = delta[chasers]
+        angles = np.degrees(np.arctan2(-to_player[:, 1], to_player[:, 0]))
+
+        # Outside the player's cell, follow the maze towards them instead of walking into walls
+        steer = to_player.copy()
+        if flow_field is not None:
+            chaser_centers = centers[chasers]
+            waypoints, found = flow_field.next_waypoints(chaser_centers[:, 0] // CELL_SIZE, chaser_centers[:, 1] // CELL_SIZE)
+            steer[found] = waypoints[found] - chaser_centers[found]
+        norm = np.hypot(steer[:, 0], steer[:, 1])
+        moving = norm > 0
+        scale = np.zeros(len(chasers))
+        np.divide(self.speed[chasers], norm, out=scale, where=moving)
+        steer *= scale[:, None]
+
+        for k, i in enumerate(chasers.tolist()):
+            enemy = self.entities[i]
+            enemy.image = ROTATION_CACHE.get(enemy.sprite_key, enemy.original_image, float(angles[k]))
+            if moving[k]:
+                enemy.move(grid, float(steer[k, 0]), float(steer[k, 1]))
+
+        # Only chasers that ended up next to the player need the exact Rect test
+        player_rect = player.get_rect()
+        reach = (self.size[chasers] + (player.size[0], player.size[1])) + 1
+        gap = np.abs(pos[chasers] - (player.pos[0], player.pos[1]))
+        close = chasers[(gap < reach).all(axis=1)]
+        current_time = SIM_CLOCK.get_ticks()
+        for i in close.tolist():
+            enemy = self.entities[i]
+            if enemy.get_rect().colliderect(player_rect) and current_time - self.last_attack_time[i] > ENEMY_ATTACK_COOLDOWN:
+                player.take_damage(ENEMY_MELEE_DAMAGE)
+                attack_sound.play()
+                self.last_attack_time[i] = current_time
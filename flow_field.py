@@ -0,0 +1,119 @@
+from array import array
+from collections import deque
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from walls import NEIGHBOR_OFFSETS
+from constants import *
+
+NO_DIRECTION = 255
+
+class FlowField:
+    # Breadth-first search over the open walls outward from the player's cell. Every
+    # reached cell stores which neighbour is one step closer to the player, so an
+    # enemy anywhere in the window steers with a single lookup. The search covers a
+    # window of `radius` cells around the player and is only redone when the player
+    # enters another cell.
+    def __init__(self, grid, radius=FLOW_FIELD_RADIUS):
+        self.grid = grid
+        self.radius = radius
+        self.target = None
+        self.col0 = self.row0 = 0
+        self.width = self.height = 0
+        # One byte per cell: index into NEIGHBOR_OFFSETS, or NO_DIRECTION
+        self.directions = bytearray()
+        self.distances = array('i')
+
+    def update(self, col, row):
+        if self.target == (col, row):
+            return False
+        self.target = (col, row)
+
+        grid = self.grid
+        self.col0 = max(0, col - self.radius)
+        self.row0 = max(0, row - self.radius)
+        col1 = min(grid.cols - 1, col + self.radius)
+        row1 = min(grid.rows - 1, row + self.radius)
+        self.width = col1 - self.col0 + 1
+        self.height = row1 - self.row0 + 1
+
+        size = self.width * self.height
+        directions = bytearray([NO_DIRECTION]) * size
+        distances = array('i', [-1]) * size
+        if not grid.in_bounds(col, row):
+            self.directions = directions
+            self.distances = distances
+            return True
+
+        start = (col - self.col0) * self.height + (row - self.row0)
+        distances[start] = 0
+        queue = deque([(col, row)])
+        while queue:
+            c, r = queue.popleft()
+            here = (c - self.col0) * self.height + (r - self.row0)
+            mask = grid.get_mask(c, r)
+            for i, (bit, _, dc, dr) in enumerate(NEIGHBOR_OFFSETS):
+                if mask & bit:
+                    continue
+                nc = c + dc
+                nr = r + dr
+                if not (self.col0 <= nc <= col1 and self.row0 <= nr <= row1):
+                    continue
+                there = (nc - self.col0) * self.height + (nr - self.row0)
+                if distances[there] != -1:
+                    continue
+                distances[there] = distances[here] + 1
+                # The neighbour steps back the way the search came, i.e. the opposite offset
+                directions[there] = (i + 2) % 4
+                queue.append((nc, nr))
+
+        self.directions = directions
+        self.distances = distances
+        return True
+
+    def _index(self, col, row):
+        c = col - self.col0
+        r = row - self.row0
+        if 0 <= c < self.width and 0 <= r < self.height:
+            return c * self.height + r
+        return None
+
+    def direction(self, col, row):
+        i = self._index(col, row)
+        if i is None or self.directions[i] == NO_DIRECTION:
+            return None
+        _, _, dc, dr = NEIGHBOR_OFFSETS[self.directions[i]]
+        return (dc, dr)
+
+    def distance(self, col, row):
+        i = self._index(col, row)
+        if i is None or self.distances[i] < 0:
+            return None
+        return self.distances[i]
+
+    def next_waypoint(self, col, row):
+        # World position of the center of the next cell towards the player
+        step = self.direction(col, row)
+        if step is None:
+            return None
+        return ((col + step[0] + 0.5) * CELL_SIZE, (row + step[1] + 0.5) * CELL_SIZE)
+
+    def next_waypoints(self, cols, rows):
+        # next_waypoint for arrays of cells at once (NumPy only). Returns the waypoints
+        # as an (n, 2) array and a mask of the cells that have one.
+        cols = np.asarray(cols, dtype=np.intp)
+        rows = np.asarray(rows, dtype=np.intp)
+        c = cols - self.col0
+        r = rows - self.row0
+        inside = (c >= 0) & (c < self.width) & (r >= 0) & (r < self.height)
+        directions = np.frombuffer(self.directions, dtype=np.uint8)
+        index = np.where(inside, c * self.height + r, 0)
+        direction = np.where(inside, directions[index] if len(directions) else NO_DIRECTION, NO_DIRECTION)
+        found = direction != NO_DIRECTION
+        steps = np.array([(dc, dr) for _, _, dc, dr in NEIGHBOR_OFFSETS] + [(0, 0)])
+        step = steps[np.where(found, direction, len(NEIGHBOR_OFFSETS))]
+        waypoints = np.empty((len(cols), 2))
+        waypoints[:, 0] = (cols + step[:, 0] + 0.5) * CELL_SIZE
+        waypoints[:, 1] = (rows + step[:, 1] + 0.5) * CELL_SIZE
+        return waypoints, found
@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import math
+import random
+import argparse
+
+# No window and no audio device; must be set before pygame initialises
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+from main import *
+from raycast import cast_ray
+
+STATE_NAMES = {
+    GAME_STATE_MENU: "menu",
+    GAME_STATE_PLAYING: "playing",
+    GAME_STATE_GAME_OVER: "game_over",
+    GAME_STATE_FADING: "fading",
+    GAME_STATE_BOSS_FIGHT: "boss_fight",
+    GAME_STATE_WIN: "win",
+}
+
+UPGRADE_TYPES = ['health', 'ammo', 'reload', 'fov', 'brightness', 'pellet_count']
+
+class WanderBot:
+    # Stand-in player for unattended runs. Walks in a random direction for a while,
+    # keeps the shotgun out, fires at the nearest enemy in range that no wall hides
+    # and spends skill points as soon as it has them, so spawning, AI, hits and the
+    # difficulty trade-offs all get exercised.
+    def __init__(self, rng=None, turn_ticks=HEADLESS_BOT_TURN_TICKS):
+        self.rng = rng
+        self.turn_ticks = turn_ticks
+        self.tick = 0
+
+    def __call__(self, game):
+        if self.rng is None:
+            self.rng = game.rng.bot
+        inp = game.input
+        player = game.player
+
+        if self.tick % self.turn_ticks == 0:
+            horizontal = self.rng.choice(("Left", "Right", None))
+            vertical = self.rng.choice(("Up", "Down", None))
+            for key in ("Up", "Down", "Left", "Right"):
+                inp.move[key] = key in (horizontal, vertical)
+        self.tick += 1
+
+        if player.equipped_item != "shotgun":
+            inp.press("swap")
+        if player.skill_points > 0 and game.game_state == GAME_STATE_PLAYING:
+            inp.press(("upgrade", self.rng.choice(UPGRADE_TYPES)))
+
+        center = player.get_center_pos()
+        if game.game_state == GAME_STATE_PLAYING:
+            target = self.visible_target(game, center)
+        else:
+            target = game.boss
+        if target is None:
+            inp.aim_axis = [0, 0]
+            return
+        target_center = target.get_center_pos()
+        aim_x = target_center[0] - center[0]
+        aim_y = target_center[1] - center[1]
+        norm = math.hypot(aim_x, aim_y) or 1
+        inp.aim_axis = [aim_x / norm, aim_y / norm]
+        if player.shotgun_ammo > 0:
+            inp.press("shoot")
+        else:
+            inp.press("reload")
+
+    def visible_target(self, game, center):
+        # Nearest enemy in range whose center a ray from the player reaches before a
+        # wall does; the pellets stop at the same walls
+        targets = game.enemy_index.query_radius(center, SHOTGUN_RANGE)
+        for enemy in sorted(targets, key=lambda enemy: math.dist(center, enemy.get_center_pos())):
+            enemy_center = enemy.get_center_pos()
+            distance = math.dist(center, enemy_center)
+            angle = math.atan2(enemy_center[1] - center[1], enemy_center[0] - center[0])
+            if cast_ray(game.grid, center, angle, distance)[2] >= distance - enemy.size[0] / 2:
+                return enemy
+        return None
+
+def run_headless(ticks=None, seconds=None, render=False, bot=None, stop_on_end=True, seed=None, record_path=None, replay_path=None, profile_path=None, chunked=CHUNKED_WORLD, level_path=MAZE_LEVEL_PATH):
+    # Runs the game at full speed with no frame cap; `ticks` or `seconds` is simulated
+    # time. A replay drives the input itself and runs until its log ends.
+    if ticks is None:
+        ticks = int((seconds if seconds is not None else HEADLESS_DEFAULT_SECONDS) * SIM_HZ)
+    screen = init_pygame()
+    if profile_path:
+        PROFILER.start_export(profile_path)
+    level = load_maze(level_path) if level_path else None
+    game = Game(screen, start_playing=True, seed=seed, record_path=record_path, replay_path=replay_path, chunked=chunked, grid=level)
+    if replay_path:
+        bot = lambda game: None
+        ticks = sys.maxsize
+    elif bot is None:
+        bot = WanderBot()
+
+    step_times = []
+    render_time = 0
+    start_time = time.perf_counter()
+    for _ in range(ticks):
+        bot(game)
+        step_start = time.perf_counter()
+        game.timestep.add_frame_time(game.timestep.step_ms)
+        for _ in game.timestep.steps():
+            game.step()
+        step_times.append(time.perf_counter() - step_start)
+        if not game.running:
+            break
+
+        if render:
+            render_start = time.perf_counter()
+            game.render(1.0)
+            PROFILER.begin("flip")
+            pygame.display.flip()
+            PROFILER.end("flip")
+            render_time += time.perf_counter() - render_start
+        PROFILER.end_frame()
+
+        if stop_on_end and game.game_state in (GAME_STATE_GAME_OVER, GAME_STATE_WIN):
+            break
+    wall_time = time.perf_counter() - start_time
+    game.close()
+    PROFILER.stop_export()
+
+    ran = len(step_times)
+    # Steps along the maze from where the player ended up to the exit
+    exit_steps = None
+    if game.topology is not None:
+        exit_steps = game.topology.exit_distance[game.topology.cell_at(*game.player.get_center_pos())]
+    return {
+        'ticks': ran,
+        'seed': game.rng.seed,
+        'sim_seconds': ran / SIM_HZ,
+        'wall_seconds': wall_time,
+        'ticks_per_second': ran / wall_time if wall_time > 0 else 0,
+        'mean_step_ms': sum(step_times) * 1000 / ran if ran else 0,
+        'max_step_ms': max(step_times) * 1000 if ran else 0,
+        'mean_render_ms': render_time * 1000 / ran if render and ran else 0,
+        'state': STATE_NAMES[game.game_state],
+        'player_health': game.player.health,
+        'enemies_alive': len(game.enemies),
+        'enemies_killed': game.enemies_killed,
+        'spawn_interval': game.current_spawn_interval,
+        'max_enemies': game.current_max_enemies,
+        'detection_range': game.current_detection_range,
+        'exit_steps': exit_steps,
+        'spawns_dropped': game.spawns_dropped,
+        'ai_updated': game.enemies.ai_totals['updated'],
+        'ai_skipped': game.enemies.ai_totals['skipped'],
+        'ai_deferred': game.enemies.ai_totals['deferred'],
+    }
+
+def main_headless(argv=None):
+    parser = argparse.ArgumentParser(description="Run VisionCurse without a window or audio device")
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument("--ticks", type=int, help="number of simulation steps to run")
+    length.add_argument("--seconds", type=float, help="simulated seconds to run")
+    parser.add_argument("--render", action="store_true", help="draw every step into the offscreen screen")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the maze, spawns, weapon spread and bot")
+    parser.add_argument("--record", metavar="PATH", help="record the run's input to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play back a recorded run instead of using the bot")
+    parser.add_argument("--profile", metavar="PATH", help="write per-step section timings to PATH (.csv or .json)")
+    parser.add_argument("--chunked", action="store_true", default=CHUNKED_WORLD, help="run in the streamed, effectively unbounded maze")
+    parser.add_argument("--level", metavar="PATH", default=MAZE_LEVEL_PATH, help="run on a maze file written by maze_file.py")
+    parser.add_argument("--keep-going", action="store_true", help="keep ticking after death or victory")
+    args = parser.parse_args(argv)
+
+    stats = run_headless(args.ticks, args.seconds, args.render, None, not args.keep_going, args.seed, args.record, args.replay, args.profile, args.chunked, args.level)
+    for key, value in stats.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    pygame.quit()
+    # Every spawn must survive its first step; anything else means the spawn band
+    # and the despawn radius disagree
+    if stats['spawns_dropped']:
+        print(f"Spawn check FAILED: {stats['spawns_dropped']} enemies were despawned on the step they spawned")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_headless()
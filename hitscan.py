@@ -0,0 +1,54 @@
+import math
+from raycast import ray_box_entry
+from constants import *
+
+def resolve_pellet_hits(pellet_lines, targets=None, penetration=SHOTGUN_PELLET_PENETRATION, index=None):
+    # Each pellet hits the nearest target along its line, plus up to `penetration`
+    # more behind it. Targets are either a fixed list or, with `index`, whatever the
+    # spatial index files along each pellet; either way every pellet is resolved in
+    # one pass over its candidates that keeps only the nearest entries.
+    # Returns {target: pellets_hit}.
+    if not pellet_lines or (index is None and not targets):
+        return {}
+
+    boxes = {}
+    keep = penetration + 1
+    hits = {}
+    for start, end in pellet_lines:
+        sx, sy = start
+        dx = end[0] - sx
+        dy = end[1] - sy
+        length = math.hypot(dx, dy)
+        if length == 0:
+            continue
+        dir_x = dx / length
+        dir_y = dy / length
+
+        # Bounding box of the pellet line for a cheap rejection before the slab test
+        min_x, max_x = (sx, end[0]) if dx >= 0 else (end[0], sx)
+        min_y, max_y = (sy, end[1]) if dy >= 0 else (end[1], sy)
+
+        # The `keep` nearest (t, target) so far, nearest first
+        nearest = []
+        for target in (index.query_segment(start, end) if index is not None else targets):
+            box = boxes.get(target)
+            if box is None:
+                rect = target.get_rect()
+                box = boxes[target] = (rect.left, rect.top, rect.right, rect.bottom)
+            left, top, right, bottom = box
+            if right < min_x or left > max_x or bottom < min_y or top > max_y:
+                continue
+            t = ray_box_entry(sx, sy, dir_x, dir_y, left, top, right, bottom, 0, length)
+            if t is None or (len(nearest) == keep and t >= nearest[-1][0]):
+                continue
+            if len(nearest) == keep:
+                nearest.pop()
+            k = len(nearest)
+            while k and nearest[k - 1][0] > t:
+                k -= 1
+            nearest.insert(k, (t, target))
+
+        for _, target in nearest:
+            hits[target] = hits.get(target, 0) + 1
+
+    return hits
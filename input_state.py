@@ -0,0 +1,20 @@
+class InputState:
+    # Everything the simulation reads from the player. Held directions and stick
+    # positions are read on every step; one-shot actions ("shoot", "swap",
+    # ("upgrade", "fov"), ...) queue up between steps and are applied by the next one.
+    # The window fills this from pygame events, the headless runner from a bot.
+    def __init__(self):
+        self.move = {"Up": False, "Down": False, "Left": False, "Right": False , "Joystick_Up" : False , "Joystick_Down" : False , "Joystick_Left":False , "Joystick_Right":False}
+        self.move_axis = [0, 0] # left stick
+        self.aim_axis = [0, 0] # right stick, overrides the mouse when pushed
+        self.mouse_pos = (0, 0)
+        self.actions = []
+
+    def press(self, action):
+        self.actions.append(action)
+
+    def take_actions(self):
+        actions = self.actions
+        self.actions = []
+        return actions
+
@@ -0,0 +1,106 @@
+import pygame
+from constants import *
+
+def gradient_color(base_c, max_c, scale):
+    r = max_c[0] - (max_c[0] - base_c[0]) * scale
+    g = max_c[1] - (max_c[1] - base_c[1]) * scale
+    b = max_c[2] - (max_c[2] - base_c[2]) * scale
+    return (int(r), int(g), int(b))
+
+def draw_flashlight_steps(light_surface, vision_polygon_screen, center, base_c, max_c, steps=FLASHLIGHT_GRADIENT_STEPS):
+    # Original look: the polygon is filled `steps` times, shrunk towards the player each time
+    cx, cy = center
+    vectors = [(p[0] - cx, p[1] - cy) for p in vision_polygon_screen[1:]]
+    for i in range(steps, 0, -1):
+        scale = i / steps
+        color = gradient_color(base_c, max_c, scale)
+        scaled_polygon = [center]
+        scaled_polygon += [(cx + vx * scale, cy + vy * scale) for vx, vy in vectors]
+        pygame.draw.polygon(light_surface, color, scaled_polygon)
+
+class FlashlightTexture:
+    # Single-pass flashlight: the vision polygon is filled once as a white mask and
+    # multiplied by a cached radial gradient with the colours of draw_flashlight_steps.
+    # The bands are circles, so they only match the steps look along rays that reach
+    # full range; a wall closer than that is lit by the band at its distance where the
+    # steps look would squeeze every band in front of it. The cone's angle comes from
+    # the mask, so the texture is keyed by the brightness pair and the light's range
+    # and only brightness upgrades (or a range change) rebuild it.
+    def __init__(self, radius=RAY_LENGTH + WALL_THICKNESS, steps=FLASHLIGHT_GRADIENT_STEPS):
+        self.radius = radius
+        self.steps = steps
+        self.key = None
+        self.texture = None
+        self.mask = None
+
+    def _rebuild(self, base_c, max_c, radius):
+        self.radius = radius
+        size = self.radius * 2 + 2
+        center = (size // 2, size // 2)
+        self.texture = pygame.Surface((size, size)).convert()
+        self.texture.fill(BLACK)
+        for i in range(self.steps, 0, -1):
+            color = gradient_color(base_c, max_c, i / self.steps)
+            pygame.draw.circle(self.texture, color, center, self.radius * i / self.steps)
+        self.mask = pygame.Surface((size, size)).convert()
+        self.key = (base_c, max_c, radius)
+
+    def draw(self, light_surface, vision_polygon_screen, center, base_c, max_c, radius=None):
+        radius = self.radius if radius is None else radius
+        if self.key != (base_c, max_c, radius):
+            self._rebuild(base_c, max_c, radius)
+
+        half = self.mask.get_width() // 2
+        left = int(center[0]) - half
+        top = int(center[1]) - half
+        local_polygon = [(x - left, y - top) for x, y in vision_polygon_screen]
+
+        # Only the polygon's bounding box is touched, which for a narrow cone is a
+        # small part of the texture
+        xs = [p[0] for p in local_polygon]
+        ys = [p[1] for p in local_polygon]
+        area = pygame.Rect(int(min(xs)), int(min(ys)), int(max(xs)) - int(min(xs)) + 2, int(max(ys)) - int(min(ys)) + 2)
+        area = area.clip(self.mask.get_rect())
+
+        self.mask.fill(BLACK, area)
+        pygame.draw.polygon(self.mask, WHITE, local_polygon)
+        self.mask.blit(self.texture, area, area, special_flags=pygame.BLEND_RGB_MULT)
+        light_surface.blit(self.mask, (left + area.x, top + area.y), area, special_flags=pygame.BLEND_RGB_ADD)
+
+class LightMap:
+    # Lighting is soft, so it can be drawn into a surface `scale` times the window
+    # size and stretched up just before the multiply composite onto the screen.
+    # A full-window smoothscale costs several times the full-resolution composite,
+    # so the smooth path only smoothscales up to half the window and doubles the
+    # rest with nearest neighbour; 2x2 blocks don't show in soft light. At scale
+    # 0.5 the map is already that size and both paths are the same.
+    def __init__(self, scale=LIGHT_MAP_SCALE, smooth=LIGHT_MAP_SMOOTH):
+        self.scale = scale
+        self.smooth = smooth
+        self.size = (max(1, int(WIN_WIDTH * scale)), max(1, int(WIN_HEIGHT * scale)))
+        self.surface = pygame.Surface(self.size).convert()
+        self.upscaled = pygame.Surface((WIN_WIDTH, WIN_HEIGHT)).convert() if self.size != (WIN_WIDTH, WIN_HEIGHT) else None
+        half = (WIN_WIDTH // 2, WIN_HEIGHT // 2)
+        self.intermediate = None
+        if smooth and self.size[0] < half[0] and self.size[1] < half[1]:
+            self.intermediate = pygame.Surface(half).convert()
+
+    def clear(self):
+        self.surface.fill(BLACK)
+
+    def to_light(self, point):
+        return (point[0] * self.scale, point[1] * self.scale)
+
+    def scaled_radius(self, radius):
+        return max(1, int(radius * self.scale))
+
+    def composite(self, screen):
+        if self.upscaled is None:
+            screen.blit(self.surface, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+            return
+        source = self.surface
+        if self.intermediate is not None:
+            pygame.transform.smoothscale(source, self.intermediate.get_size(), self.intermediate)
+            source = self.intermediate
+        pygame.transform.scale(source, (WIN_WIDTH, WIN_HEIGHT), self.upscaled)
+        screen.blit(self.upscaled, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
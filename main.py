@@ -1,10 +1,28 @@
 import pygame
-import random
 import sys
+import zlib
+import argparse
 from maze import *
 from player import *
 from enemy import *
 from boss import * # <-- Import the new Boss class
+from assets import ASSETS
+from hitscan import resolve_pellet_hits
+from lighting import FlashlightTexture, LightMap, draw_flashlight_steps
+from visibility import VisibilityPolygon
+from maze_layer import MazeLayer
+from chunked_world import ChunkedWallGrid
+from maze_file import load_maze
+from spatial_hash import SpatialHash
+from enemy_manager import EnemyManager
+from spawner import SpawnRings
+from topology import topology_for
+from flow_field import FlowField
+from timestep import SIM_CLOCK, FixedTimestep, interpolate
+from input_state import InputState
+from rng import RngStreams
+from replay import InputRecorder, InputReplay
+from profiler import PROFILER
 
 # --- Game States ---
 GAME_STATE_MENU = 0
@@ -93,131 +111,162 @@ def draw_arena_walls(screen, camera_offset):
             
         pygame.draw.rect(screen, WHITE, (screen_x, screen_y, rect.width, rect.height))
 
-# --- Main Game Function ---
-def main():
-    pygame.init()
-    pygame.joystick.init()
-    pygame.mixer.init()
-    pygame.mixer.set_num_channels(16)
-
-    screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-    pygame.display.set_caption('VisionCurse - The Cave')
-    clock = pygame.time.Clock()
-
-    # --- Fonts ---
-    ui_font = pygame.font.SysFont('Arial', 30)
-    upgrade_font = pygame.font.SysFont('Arial', 22)
-    game_over_font = pygame.font.SysFont('Arial', 100)
-    menu_title_font = pygame.font.SysFont('Arial', 120)
-    menu_button_font = pygame.font.SysFont('Arial', 40)
-
-    try:
-        floor_tile_img = pygame.image.load(TILE2_PATH).convert()
-        floor_tile_img = pygame.transform.scale(floor_tile_img, (CELL_SIZE, CELL_SIZE))
-    except pygame.error as e:
-        print(f"Error loading floor tile: {e}")
-        floor_tile_img = pygame.Surface((CELL_SIZE, CELL_SIZE))
-        floor_tile_img.fill(PURPLE)
-
-    # --- Load Sounds ---
-    try:
-        sounds = {
-            'shotgun_fire': pygame.mixer.Sound(SOUND_SHOTGUN_FIRE),
-            'shotgun_reload': pygame.mixer.Sound(SOUND_SHOTGUN_RELOAD),
-            'swap_item': pygame.mixer.Sound(SOUND_SWAP_ITEM),
-            'footsteps': pygame.mixer.Sound(SOUND_PLAYER_MOVE),
-            'enemy_attack': pygame.mixer.Sound(SOUND_ENEMY_ATTACK),
-            'skill_upgrade': pygame.mixer.Sound(SOUND_SKILL_UPGRADE),
-            'skill_gain': pygame.mixer.Sound(SOUND_SKILL_GAIN),
-            'enemy_alert': pygame.mixer.Sound(SOUND_ENEMY_ALERT),
-            'boss_hit': pygame.mixer.Sound(SOUND_BOSS_HIT),
-            'boss_death': pygame.mixer.Sound(SOUND_BOSS_DEATH),
-            'boss_attack': pygame.mixer.Sound(SOUND_BOSS_ATTACK),
-            'win_game': pygame.mixer.Sound(SOUND_WIN_GAME)
-        }
+# --- Game ---
+class Game:
+    # One run of the game, from the menu to death or victory. Input arrives through
+    # self.input, step() advances the simulation by one fixed step and render() only
+    # draws, so the same object runs in the window (main) or without one (headless.py).
+    # Every random draw comes from self.rng, so a seed plus the recorded input
+    # reproduces a run exactly.
+    def __init__(self, screen, start_playing=False, seed=None, record_path=None, replay_path=None, chunked=CHUNKED_WORLD, grid=None):
+        # grid: a prebuilt maze (e.g. from maze_file.load_maze) used instead of generating one
+        self.screen = screen
+        level_crc = zlib.crc32(grid.masks) if grid is not None else 0
+
+        self.replay = InputReplay(replay_path) if replay_path else None
+        if self.replay is not None:
+            seed = self.replay.seed
+            start_playing = self.replay.start_playing
+            chunked = self.replay.chunked
+            if self.replay.level_crc != level_crc:
+                print("Warning: replay was recorded on a different level; it will not play back the same")
+        self.rng = RngStreams(seed)
+        print(f"Seed: {self.rng.seed}")
+        self.recorder = InputRecorder(record_path, self.rng.seed, start_playing, chunked, level_crc) if record_path else None
+
+        # --- Fonts ---
+        self.ui_font = pygame.font.SysFont('Arial', 30)
+        self.upgrade_font = pygame.font.SysFont('Arial', 22)
+        self.game_over_font = pygame.font.SysFont('Arial', 100)
+        self.menu_title_font = pygame.font.SysFont('Arial', 120)
+        self.menu_button_font = pygame.font.SysFont('Arial', 40)
+
+        try:
+            self.floor_tile_img = ASSETS.load_image(TILE2_PATH, (CELL_SIZE, CELL_SIZE), alpha=False)
+        except pygame.error as e:
+            print(f"Error loading floor tile: {e}")
+            self.floor_tile_img = pygame.Surface((CELL_SIZE, CELL_SIZE))
+            self.floor_tile_img.fill(PURPLE)
+
+        try:
+            floor_tile_alt_img = ASSETS.load_image(TILE1_PATH, (CELL_SIZE, CELL_SIZE), alpha=False)
+        except pygame.error as e:
+            print(f"Error loading floor tile: {e}")
+            floor_tile_alt_img = self.floor_tile_img
+
+        # --- Load Sounds ---
+        try:
+            self.sounds = {
+                'shotgun_fire': ASSETS.load_sound(SOUND_SHOTGUN_FIRE, 0.7),
+                'shotgun_reload': ASSETS.load_sound(SOUND_SHOTGUN_RELOAD),
+                'swap_item': ASSETS.load_sound(SOUND_SWAP_ITEM, 0.7),
+                'footsteps': ASSETS.load_sound(SOUND_PLAYER_MOVE, 0.4),
+                'enemy_attack': ASSETS.load_sound(SOUND_ENEMY_ATTACK),
+                'skill_upgrade': ASSETS.load_sound(SOUND_SKILL_UPGRADE),
+                'skill_gain': ASSETS.load_sound(SOUND_SKILL_GAIN),
+                'enemy_alert': ASSETS.load_sound(SOUND_ENEMY_ALERT),
+                'boss_hit': ASSETS.load_sound(SOUND_BOSS_HIT),
+                'boss_death': ASSETS.load_sound(SOUND_BOSS_DEATH),
+                'boss_attack': ASSETS.load_sound(SOUND_BOSS_ATTACK),
+                'win_game': ASSETS.load_sound(SOUND_WIN_GAME)
+            }
+            
+            pygame.mixer.music.load(MUSIC_BACKGROUND)
+            pygame.mixer.music.set_volume(0.3)
+            pygame.mixer.music.play(-1)
+
+        except pygame.error as e:
+            print(f"Error loading sound: {e}")
+            # Create dummy sounds
+            self.sounds = {k: pygame.mixer.Sound(buffer=b"") for k in [
+                'shotgun_fire', 'shotgun_reload', 'swap_item', 'footsteps',
+                'enemy_attack', 'skill_upgrade', 'skill_gain', 'enemy_alert',
+                'boss_hit', 'boss_death', 'boss_attack', 'win_game'
+            ]}
+            pass
+
+        footprint = ASSETS.memory_footprint()
+        print(f"Assets loaded: {footprint['image_count']} images ({footprint['images'] // 1024} KB), {footprint['sound_count']} sounds ({footprint['sounds'] // 1024} KB)")
+            
+        self.footstep_channel = pygame.mixer.Channel(1)
+
+        # --- Game Variables ---
+        SIM_CLOCK.reset()
+        self.timestep = FixedTimestep()
+        self.current_time = SIM_CLOCK.get_ticks()
+        # The streamed world generates its chunks on demand from a seed of its own
+        if grid is not None:
+            self.grid = grid
+        else:
+            self.grid = ChunkedWallGrid(self.rng.maze.getrandbits(64)) if chunked else gen_maze(self.rng.maze)
+        self.chunked = chunked
+        self.visibility = VisibilityPolygon(self.grid)
+        self.maze_layer = MazeLayer(self.grid, [self.floor_tile_img, floor_tile_alt_img])
+        self.flow_field = FlowField(self.grid)
+        self.topology = topology_for(self.grid)
+        self.spawn_rings = SpawnRings(self.grid, self.topology)
+        start_x = (self.grid.start_cell[0] + 0.5) * CELL_SIZE - (PLAYER_SIZE / 2)
+        start_y = (self.grid.start_cell[1] + 0.5) * CELL_SIZE - (PLAYER_SIZE / 2)
+        self.player = Player([start_x, start_y], PLAYER_SIZE)
+        self.enemy_index = SpatialHash()
+        # The AI frame budget depends on wall-clock time, so it is off while recording or replaying
+        deterministic = self.recorder is not None or self.replay is not None
+        self.enemies = EnemyManager(self.enemy_index, topology=self.topology, budget_ms=None if deterministic else AI_FRAME_BUDGET_MS)
+        self.boss = None # Boss variable
         
-        sounds['footsteps'].set_volume(0.4)
-        sounds['shotgun_fire'].set_volume(0.7)
-        sounds['swap_item'].set_volume(0.7)
+        self.light_map = LightMap()
+        self.flashlight_engine = FLASHLIGHT_ENGINE
+        self.lighting_mode = FLASHLIGHT_LIGHTING_MODE
+        self.flashlight_texture = FlashlightTexture(self.light_map.scaled_radius(RAY_LENGTH + WALL_THICKNESS))
         
-        pygame.mixer.music.load(MUSIC_BACKGROUND)
-        pygame.mixer.music.set_volume(0.3)
-        pygame.mixer.music.play(-1)
-
-    except pygame.error as e:
-        print(f"Error loading sound: {e}")
-        # Create dummy sounds
-        sounds = {k: pygame.mixer.Sound(buffer=b"") for k in [
-            'shotgun_fire', 'shotgun_reload', 'swap_item', 'footsteps',
-            'enemy_attack', 'skill_upgrade', 'skill_gain', 'enemy_alert',
-            'boss_hit', 'boss_death', 'boss_attack', 'win_game'
-        ]}
-        pass
+        # --- MODIFICATION: Create both auras ---
+        self.light_aura_sprite_normal = create_light_aura(self.light_map.scaled_radius(LIGHT_AURA_RADIUS))
+        self.light_aura_sprite_boss = create_light_aura(self.light_map.scaled_radius(BOSS_LIGHT_AURA_RADIUS))
+        # --- END MODIFICATION ---
         
-    footstep_channel = pygame.mixer.Channel(1)
-
-    # --- Game Variables ---
-    grid = gen_maze()
-    start_x = (CELL_SIZE / 2) - (PLAYER_SIZE / 2)
-    start_y = (CELL_SIZE / 2) - (PLAYER_SIZE / 2)
-    player = Player([start_x, start_y], PLAYER_SIZE)
-    enemies = []
-    boss = None # Boss variable
-    
-    light_surface = pygame.Surface((WIN_WIDTH , WIN_HEIGHT))
-    
-    # --- MODIFICATION: Create both auras ---
-    light_aura_sprite_normal = create_light_aura(LIGHT_AURA_RADIUS)
-    light_aura_sprite_boss = create_light_aura(BOSS_LIGHT_AURA_RADIUS)
-    # --- END MODIFICATION ---
-    
-    pellet_lines = []
-    pellet_draw_start_time = 0
-    is_shaking = False
-    shake_start_time = 0 
-    last_enemy_spawn_time = pygame.time.get_ticks()
-    
-    current_spawn_interval = ENEMY_SPAWN_INTERVAL
-    current_max_enemies = ENEMY_MAX_COUNT
-    current_detection_range = ENEMY_DETECTION_RANGE
-
-    camera_offset = [0, 0]
-    move = {"Up": False, "Down": False, "Left": False, "Right": False , "Joystick_Up" : False , "Joystick_Down" : False , "Joystick_Left":False , "Joystick_Right":False}
-    
-    # --- State Management ---
-    game_state = GAME_STATE_MENU # Start at menu
-    play_button_rect = None
-    quit_button_rect = None
-    
-    # --- Fade Transition Variables ---
-    fade_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
-    fade_surface.fill(BLACK)
-    fade_alpha = 0
-    fading_to_state = -1 # State to go to after fading
-
-    flashlight_max_trade_off = FLASHLIGHT_TRADE_OFF_MAX_ENEMIES_INCREASE
+        self.pellet_lines = []
+        self.pellet_draw_start_time = 0
+        self.is_shaking = False
+        self.shake_start_time = 0 
+        self.last_enemy_spawn_time = SIM_CLOCK.get_ticks()
+        self.enemies_killed = 0
+        self.spawns_dropped = 0 # enemies despawned on the step they spawned
+        
+        self.current_spawn_interval = ENEMY_SPAWN_INTERVAL
+        self.current_max_enemies = ENEMY_MAX_COUNT
+        self.current_detection_range = ENEMY_DETECTION_RANGE
 
-    joysticks = []
-    joystick_shoot = False
-    swap_cooldown = 30
-    shoot_cooldown = 30
+        self.camera_offset = [0, 0]
+        self.prev_camera_offset = [0, 0]
+        self.input = InputState()
+        
+        # --- State Management ---
+        self.game_state = GAME_STATE_PLAYING if start_playing else GAME_STATE_MENU
+        self.running = True
+        self.restart_requested = False
+        self.play_button_rect = None
+        self.quit_button_rect = None
+        self.is_controller_connected = False
+        
+        # --- Fade Transition Variables ---
+        self.fade_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
+        self.fade_surface.fill(BLACK)
+        self.fade_alpha = 0
+        self.fading_to_state = -1 # State to go to after fading
 
-    skill_upgrade_cooldown = 4
+        self.flashlight_max_trade_off = FLASHLIGHT_TRADE_OFF_MAX_ENEMIES_INCREASE
 
-    # Main game loop
-    running = True
-    while running:
-        current_time = pygame.time.get_ticks()
-        dx, dy = 0, 0 # Reset movement deltas each frame
-        horizontal_aiming_component = 0
-        vertical_aiming_component = 0
+        self.joysticks = []
+        self.last_swap_time = -SWAP_COOLDOWN
+        self.last_shot_time = -SHOOT_COOLDOWN
+        self.last_skill_upgrade_time = -SKILL_UPGRADE_COOLDOWN
 
-        if pygame.joystick.get_count():
-            is_controller_connected = True
-        else:
-            is_controller_connected = False
+    def poll_joysticks(self):
+        self.is_controller_connected = bool(pygame.joystick.get_count())
+        move = self.input.move
+        current_time = SIM_CLOCK.get_ticks()
 
-        for joystick in joysticks:
+        for joystick in self.joysticks:
             if joystick.get_axis(0) > 0.001:
                 move["Joystick_Right"] = True
             elif joystick.get_axis(0) < -0.001:
@@ -235,314 +284,334 @@ def main():
             print("Joystick Up : " , move["Joystick_Up"])
             print("Joystick Down : " , move["Joystick_Down"])
             
+            self.input.move_axis = [0, 0]
             if joystick.get_axis(0) > 0.001 or joystick.get_axis(0) < -0.001:
-                dx = joystick.get_axis(0)
+                self.input.move_axis[0] = joystick.get_axis(0)
             if joystick.get_axis(1) > 0.001 or joystick.get_axis(1) < -0.001:
-                dy = joystick.get_axis(1)
+                self.input.move_axis[1] = joystick.get_axis(1)
 
+            self.input.aim_axis = [0, 0]
             if abs(joystick.get_axis(4)) > 0.001:
-                vertical_aiming_component = joystick.get_axis(4)
+                self.input.aim_axis[1] = joystick.get_axis(4)
             if abs(joystick.get_axis(3)) > 0.001:
-                horizontal_aiming_component = joystick.get_axis(3)
+                self.input.aim_axis[0] = joystick.get_axis(3)
 
             if(joystick.get_axis(5) > 0.99):
-                joystick_shoot = True
+                self.input.press("shoot")
             
             if joystick.get_button(4):
-                if swap_cooldown == 30:
-                    player.swap_item(sounds["swap_item"])
-                    swap_cooldown = 0
+                if current_time - self.last_swap_time >= SWAP_COOLDOWN:
+                    self.input.press("swap")
+                    self.last_swap_time = current_time
             
-            if game_state == GAME_STATE_MENU and joystick.get_button(2):
-                game_state = GAME_STATE_PLAYING
-            if game_state == GAME_STATE_MENU and joystick.get_button(1):
-                running = False
+            if self.game_state == GAME_STATE_MENU and joystick.get_button(2):
+                self.input.press("play")
+            if self.game_state == GAME_STATE_MENU and joystick.get_button(1):
+                self.running = False
 
             print("hat : " , joystick.get_hat(0))
 
-            if game_state == GAME_STATE_PLAYING:
-                if skill_upgrade_cooldown == 4:
+            if self.game_state == GAME_STATE_PLAYING:
+                if current_time - self.last_skill_upgrade_time >= SKILL_UPGRADE_COOLDOWN:
                     if joystick.get_hat(0)[1] == 1:
-                        sounds['skill_upgrade'].play()
-                        player.upgrade('health')
+                        self.input.press(("upgrade", "health"))
                     elif joystick.get_hat(0)[1] == -1:
-                        sounds['skill_upgrade'].play()
-                        player.upgrade('ammo')
+                        self.input.press(("upgrade", "ammo"))
                     elif joystick.get_hat(0)[0] == -1:
-                        sounds['skill_upgrade'].play()
-                        player.upgrade('reload')
+                        self.input.press(("upgrade", "reload"))
                     elif joystick.get_hat(0)[0] == 1:
-                        sounds['skill_upgrade'].play()
-                        if player.upgrade('fov'):
-                            current_spawn_interval = max(500, current_spawn_interval - FLASHLIGHT_TRADE_OFF_SPAWN_INTERVAL_REDUCTION)
-                            current_max_enemies += flashlight_max_trade_off
-                            flashlight_max_trade_off *= 2
-                            current_detection_range += FLASHLIGHT_TRADE_OFF_DETECTION_RANGE_INCREASE
-                            print(f"WARNING: Difficulty increased! Spawn Rate: {current_spawn_interval}ms, Max Enemies: {current_max_enemies}, Detect Range: {current_detection_range}")
+                        self.input.press(("upgrade", "fov"))
                     elif joystick.get_button(2):
-                        sounds['skill_upgrade'].play()
-                        if player.upgrade('brightness'):
-                            current_spawn_interval = max(500, current_spawn_interval - FLASHLIGHT_TRADE_OFF_SPAWN_INTERVAL_REDUCTION)
-                            current_max_enemies += flashlight_max_trade_off
-                            flashlight_max_trade_off *= 2
-                            current_detection_range += FLASHLIGHT_TRADE_OFF_DETECTION_RANGE_INCREASE
-                            print(f"WARNING: Difficulty increased! Spawn Rate: {current_spawn_interval}ms, Max Enemies: {current_max_enemies}, Detect Range: {current_detection_range}")
+                        self.input.press(("upgrade", "brightness"))
                     elif joystick.get_button(3):
-                        sounds['skill_upgrade'].play()
-                        player.upgrade('pellet_count')
-                    skill_upgrade_cooldown = 0
+                        self.input.press(("upgrade", "pellet_count"))
+                    self.last_skill_upgrade_time = current_time
 
-
-            if swap_cooldown < 30:
-                swap_cooldown+=1
-            
             print("1: " , joystick.get_axis(2))
             print("2: " , joystick.get_axis(5))
             print("button : " , joystick.get_button(4))
-            
-            # print("horizontal : " , horizontal_aiming_component)
-            # print("vertical : " , vertical_aiming_component)
 
-        if shoot_cooldown < 30:
-            shoot_cooldown += 1
-        if skill_upgrade_cooldown < 4:
-            skill_upgrade_cooldown += 1
+    def handle_event(self, event):
+        move = self.input.move
+        if event.type == pygame.QUIT:
+            self.running = False    
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False    
-            
-            if event.type == pygame.JOYDEVICEADDED:
-                joy = pygame.joystick.Joystick(event.device_index)
-                joysticks.append(joy)
-            
-            if game_state == GAME_STATE_MENU:
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:
-                        if play_button_rect and play_button_rect.collidepoint(event.pos):
-                            game_state = GAME_STATE_PLAYING
-                        if quit_button_rect and quit_button_rect.collidepoint(event.pos):
-                            running = False
-
-            elif game_state == GAME_STATE_PLAYING or game_state == GAME_STATE_BOSS_FIGHT:
-                # --- Events for both Play and Boss states ---
-                if ((event.type == pygame.MOUSEBUTTONDOWN and  event.button == 1) or joystick_shoot == True) and player.health > 0:
-                    if horizontal_aiming_component or vertical_aiming_component:
-                        mouse_x , mouse_y = horizontal_aiming_component , vertical_aiming_component
-                        target_angle = math.atan2(mouse_y , mouse_x)
-                    else:
-                        mouse_x, mouse_y = pygame.mouse.get_pos()
-                        player_screen_center = (player.pos[0] - camera_offset[0] , player.pos[1] - camera_offset[1])
-                        target_angle = math.atan2(mouse_y - player_screen_center[1], 
-                                              mouse_x - player_screen_center[0])
-                    if shoot_cooldown == 30:
-                        is_boss = (game_state == GAME_STATE_BOSS_FIGHT)
-                        hits = player.shoot(target_angle, grid, sounds['shotgun_fire'], sounds['shotgun_reload'], is_boss)
-                        joystick_shoot = False
-                        shoot_cooldown = 0
-                    
-                        if hits:
-                            pellet_lines = hits
-                            pellet_draw_start_time = current_time
-                            is_shaking = True
-                            shake_start_time = current_time
-                    
-                if event.type == pygame.KEYDOWN:
-                    if player.health > 0:
-                        if event.key == pygame.K_ESCAPE:
-                            running = False
-                        if event.key == pygame.K_s:
-                            move["Down"] = True
-                        if event.key == pygame.K_w:
-                            move["Up"] = True
-                        if event.key == pygame.K_d:
-                            move["Right"] = True
-                        if event.key == pygame.K_a:
-                            move["Left"] = True
-
-                        if event.key == SWAP_KEY:
-                            player.swap_item(sounds['swap_item'])
-                        if event.key == RELOAD_KEY:
-                            player.reload(sounds['shotgun_reload'])
-                        
-                        if game_state == GAME_STATE_PLAYING:
-                            if event.key == UPGRADE_KEY_HEALTH:
-                                sounds['skill_upgrade'].play()
-                                player.upgrade('health')
-                            elif event.key == UPGRADE_KEY_AMMO:
-                                sounds['skill_upgrade'].play()
-                                player.upgrade('ammo')
-                            elif event.key == UPGRADE_KEY_RELOAD:
-                                sounds['skill_upgrade'].play()
-                                player.upgrade('reload')
-                            elif event.key == UPGRADE_KEY_FOV:
-                                sounds['skill_upgrade'].play()
-                                if player.upgrade('fov'):
-                                    current_spawn_interval = max(500, current_spawn_interval - FLASHLIGHT_TRADE_OFF_SPAWN_INTERVAL_REDUCTION)
-                                    current_max_enemies += flashlight_max_trade_off
-                                    flashlight_max_trade_off *= 2
-                                    current_detection_range += FLASHLIGHT_TRADE_OFF_DETECTION_RANGE_INCREASE
-                                    print(f"WARNING: Difficulty increased! Spawn Rate: {current_spawn_interval}ms, Max Enemies: {current_max_enemies}, Detect Range: {current_detection_range}")
-                            elif event.key == UPGRADE_KEY_BRIGHTNESS:
-                                sounds['skill_upgrade'].play()
-                                if player.upgrade('brightness'):
-                                    current_spawn_interval = max(500, current_spawn_interval - FLASHLIGHT_TRADE_OFF_SPAWN_INTERVAL_REDUCTION)
-                                    current_max_enemies += flashlight_max_trade_off
-                                    flashlight_max_trade_off *= 2
-                                    current_detection_range += FLASHLIGHT_TRADE_OFF_DETECTION_RANGE_INCREASE
-                                    print(f"WARNING: Difficulty increased! Spawn Rate: {current_spawn_interval}ms, Max Enemies: {current_max_enemies}, Detect Range: {current_detection_range}")
-                            elif event.key == UPGRADE_PELLET_COUNT:
-                                sounds['skill_upgrade'].play()
-                                player.upgrade('pellet_count')
-
-                if event.type == pygame.KEYUP:
+        if event.type == pygame.KEYDOWN and event.key == PROFILER_TOGGLE_KEY:
+            PROFILER.toggle_overlay()
+
+        if self.replay is not None:
+            # Input comes from the log; only quitting is still up to the user
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.running = False
+            return
+        
+        if event.type == pygame.JOYDEVICEADDED:
+            joy = pygame.joystick.Joystick(event.device_index)
+            self.joysticks.append(joy)
+        
+        if self.game_state == GAME_STATE_MENU:
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:
+                    if self.play_button_rect and self.play_button_rect.collidepoint(event.pos):
+                        self.input.press("play")
+                    if self.quit_button_rect and self.quit_button_rect.collidepoint(event.pos):
+                        self.running = False
+
+        elif self.game_state == GAME_STATE_PLAYING or self.game_state == GAME_STATE_BOSS_FIGHT:
+            # --- Events for both Play and Boss states ---
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.player.health > 0:
+                self.input.press("shoot")
+                
+            if event.type == pygame.KEYDOWN:
+                if self.player.health > 0:
+                    if event.key == pygame.K_ESCAPE:
+                        self.running = False
                     if event.key == pygame.K_s:
-                        move["Down"] = False
+                        move["Down"] = True
                     if event.key == pygame.K_w:
-                        move["Up"] = False
+                        move["Up"] = True
                     if event.key == pygame.K_d:
-                        move["Right"] = False
+                        move["Right"] = True
                     if event.key == pygame.K_a:
-                        move["Left"] = False
-            
-            elif game_state == GAME_STATE_GAME_OVER or game_state == GAME_STATE_WIN:
-                 if event.type == pygame.KEYDOWN or event.type == pygame.MOUSEBUTTONDOWN:
-                    # Reset game
-                    main()
-                    return
+                        move["Left"] = True
 
+                    if event.key == SWAP_KEY:
+                        self.input.press("swap")
+                    if event.key == RELOAD_KEY:
+                        self.input.press("reload")
+                    
+                    if self.game_state == GAME_STATE_PLAYING:
+                        if event.key == UPGRADE_KEY_HEALTH:
+                            self.input.press(("upgrade", "health"))
+                        elif event.key == UPGRADE_KEY_AMMO:
+                            self.input.press(("upgrade", "ammo"))
+                        elif event.key == UPGRADE_KEY_RELOAD:
+                            self.input.press(("upgrade", "reload"))
+                        elif event.key == UPGRADE_KEY_FOV:
+                            self.input.press(("upgrade", "fov"))
+                        elif event.key == UPGRADE_KEY_BRIGHTNESS:
+                            self.input.press(("upgrade", "brightness"))
+                        elif event.key == UPGRADE_PELLET_COUNT:
+                            self.input.press(("upgrade", "pellet_count"))
+
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_s:
+                    move["Down"] = False
+                if event.key == pygame.K_w:
+                    move["Up"] = False
+                if event.key == pygame.K_d:
+                    move["Right"] = False
+                if event.key == pygame.K_a:
+                    move["Left"] = False
         
-        if game_state == GAME_STATE_PLAYING:
+        elif self.game_state == GAME_STATE_GAME_OVER or self.game_state == GAME_STATE_WIN:
+             if event.type == pygame.KEYDOWN or event.type == pygame.MOUSEBUTTONDOWN:
+                # Reset game
+                self.restart_requested = True
+
+    def upgrade(self, upgrade_type):
+        self.sounds['skill_upgrade'].play()
+        # Better flashlight upgrades make the maze more dangerous
+        if self.player.upgrade(upgrade_type) and upgrade_type in ('fov', 'brightness'):
+            self.current_spawn_interval = max(500, self.current_spawn_interval - FLASHLIGHT_TRADE_OFF_SPAWN_INTERVAL_REDUCTION)
+            self.current_max_enemies += self.flashlight_max_trade_off
+            self.flashlight_max_trade_off *= 2
+            self.current_detection_range += FLASHLIGHT_TRADE_OFF_DETECTION_RANGE_INCREASE
+            print(f"WARNING: Difficulty increased! Spawn Rate: {self.current_spawn_interval}ms, Max Enemies: {self.current_max_enemies}, Detect Range: {self.current_detection_range}")
+
+    def shoot(self):
+        player = self.player
+        aim_x, aim_y = self.input.aim_axis
+        if aim_x or aim_y:
+            target_angle = math.atan2(aim_y , aim_x)
+        else:
+            mouse_x, mouse_y = self.input.mouse_pos
+            player_screen_center = (player.pos[0] - self.camera_offset[0] , player.pos[1] - self.camera_offset[1])
+            target_angle = math.atan2(mouse_y - player_screen_center[1], 
+                                      mouse_x - player_screen_center[0])
+        if self.current_time - self.last_shot_time >= SHOOT_COOLDOWN:
+            is_boss = (self.game_state == GAME_STATE_BOSS_FIGHT)
+            hits = player.shoot(target_angle, self.grid, self.sounds['shotgun_fire'], self.sounds['shotgun_reload'], is_boss, self.rng.pellets)
+            self.last_shot_time = self.current_time
+        
+            if hits:
+                self.pellet_lines = hits
+                self.pellet_draw_start_time = self.current_time
+                self.is_shaking = True
+                self.shake_start_time = self.current_time
+
+    def apply_action(self, action):
+        player = self.player
+        in_play = self.game_state == GAME_STATE_PLAYING or self.game_state == GAME_STATE_BOSS_FIGHT
+        if action == "play":
+            if self.game_state == GAME_STATE_MENU:
+                self.game_state = GAME_STATE_PLAYING
+        elif not in_play or player.health <= 0:
+            return
+        elif action == "shoot":
+            self.shoot()
+        elif action == "swap":
+            player.swap_item(self.sounds['swap_item'])
+        elif action == "reload":
+            player.reload(self.sounds['shotgun_reload'])
+        elif action[0] == "upgrade" and self.game_state == GAME_STATE_PLAYING:
+            self.upgrade(action[1])
+
+    def get_move_direction(self):
+        move = self.input.move
+        dx, dy = self.input.move_axis
+        if move["Up"]: dy = -1
+        if move["Down"]: dy = 1
+        if move["Left"]: dx = -1
+        if move["Right"]: dx = 1
+        return dx, dy
+
+    def update_footsteps(self, dx, dy):
+        if (dx != 0 or dy != 0) and not self.footstep_channel.get_busy():
+            self.footstep_channel.play(self.sounds['footsteps'], -1)
+        elif (dx == 0 and dy == 0) and self.footstep_channel.get_busy():
+            self.footstep_channel.stop()
+
+    def step(self):
+        # --- One fixed simulation step ---
+        self.current_time = current_time = SIM_CLOCK.get_ticks()
+        player = self.player
+        grid = self.grid
+        sounds = self.sounds
+        aim_x, aim_y = self.input.aim_axis
+
+        player.prev_pos[:] = player.pos
+        self.enemies.snapshot_positions()
+        if self.boss:
+            self.boss.prev_pos[:] = self.boss.pos
+        self.prev_camera_offset[:] = self.camera_offset
+
+        if self.replay is not None:
+            if not self.replay.apply(self.input):
+                return
+            if self.replay.finished:
+                self.running = False
+        actions = self.input.take_actions()
+        if self.recorder is not None:
+            self.recorder.record(self.input, actions)
+        for action in actions:
+            self.apply_action(action)
+
+        if self.game_state == GAME_STATE_PLAYING:
             if player.health > 0:
-                if move["Up"]: dy = -1
-                if move["Down"]: dy = 1
-                if move["Left"]: dx = -1
-                if move["Right"]: dx = 1
-                
-                if (dx != 0 or dy != 0) and not footstep_channel.get_busy():
-                    footstep_channel.play(sounds['footsteps'], -1)
-                elif (dx == 0 and dy == 0) and footstep_channel.get_busy():
-                    footstep_channel.stop()
+                PROFILER.begin("player")
+                dx, dy = self.get_move_direction()
+                self.update_footsteps(dx, dy)
                 
                 player.move_player(grid, dx, dy)
-                player.update(move , camera_offset , horizontal_aiming_component , vertical_aiming_component) 
+                player.update(self.input.move , self.camera_offset , aim_x , aim_y , self.input.mouse_pos) 
+                PROFILER.end("player")
 
                 # --- Enemy Spawning ---
-                if current_time - last_enemy_spawn_time > current_spawn_interval:
-                    if len(enemies) < current_max_enemies:
+                PROFILER.begin("enemies")
+                spawned = None
+                if current_time - self.last_enemy_spawn_time > self.current_spawn_interval:
+                    if len(self.enemies) < self.current_max_enemies:
                         player_col = int(player.get_center_pos()[0] // CELL_SIZE)
                         player_row = int(player.get_center_pos()[1] // CELL_SIZE)
-                        spawn_col, spawn_row = player_col, player_row
-                        dist = 0
-                        while dist < 5 or dist > 7:
-                            spawn_col = random.randint(0, COLS - 1)
-                            spawn_row = random.randint(0, ROWS - 1)
-                            dist = math.dist((player_col, player_row), (spawn_col, spawn_row))
-                        spawn_x = spawn_col * CELL_SIZE + (CELL_SIZE / 2) - (ENEMY_SIZE / 2)
-                        spawn_y = spawn_row * CELL_SIZE + (CELL_SIZE / 2) - (ENEMY_SIZE / 2)
-                        enemies.append(Enemy([spawn_x, spawn_y], [ENEMY_SIZE, ENEMY_SIZE]))
-                        last_enemy_spawn_time = current_time
+                        spawn_cell = self.spawn_rings.pick(self.rng.spawn, player_col, player_row)
+                        if spawn_cell is not None:
+                            spawn_x = spawn_cell[0] * CELL_SIZE + (CELL_SIZE / 2) - (ENEMY_SIZE / 2)
+                            spawn_y = spawn_cell[1] * CELL_SIZE + (CELL_SIZE / 2) - (ENEMY_SIZE / 2)
+                            spawned = self.enemies.spawn([spawn_x, spawn_y], [ENEMY_SIZE, ENEMY_SIZE])
+                            self.last_enemy_spawn_time = current_time
                 
-                for enemy in enemies:
-                    enemy.update(player, grid , current_detection_range, sounds['enemy_attack'], sounds['enemy_alert'])
-                    if enemy.is_far:
-                        enemies.remove(enemy)
-
-                if pellet_lines:
+                # Only recomputed when the player has moved into another cell
+                self.flow_field.update(int(player.get_center_pos()[0] // CELL_SIZE), int(player.get_center_pos()[1] // CELL_SIZE))
+
+                view_rect = None if self.enemies.packed else pygame.Rect(self.camera_offset[0], self.camera_offset[1], WIN_WIDTH, WIN_HEIGHT)
+                self.enemies.update(player, grid, self.current_detection_range, sounds['enemy_attack'], sounds['enemy_alert'],
+                                    self.flow_field, view_rect)
+                for enemy in self.enemies.far_enemies():
+                    # The spawn band lies inside the despawn radius, so this should never count anything
+                    if enemy is spawned:
+                        self.spawns_dropped += 1
+                    self.enemies.remove(enemy)
+                PROFILER.end("enemies")
+
+                PROFILER.begin("pellets")
+                if self.pellet_lines:
                     dead_enemies = []
-                    for enemy in enemies:
-                        enemy_rect = enemy.get_rect()
-                        pellets_hit = 0
-                        for start, end in pellet_lines:
-                            if enemy_rect.clipline(start, end):
-                                pellets_hit += 1
-                        if pellets_hit > 0:
-                            is_dead = enemy.take_damage(pellets_hit * SHOTGUN_PELLET_DAMAGE)
-                            if is_dead:
-                                dead_enemies.append(enemy)
+                    for enemy, pellets_hit in resolve_pellet_hits(self.pellet_lines, index=self.enemy_index).items():
+                        is_dead = enemy.take_damage(pellets_hit * SHOTGUN_PELLET_DAMAGE)
+                        if is_dead:
+                            dead_enemies.append(enemy)
                     
                     for enemy in dead_enemies:
-                        enemies.remove(enemy) 
+                        self.enemies.remove(enemy) 
+                        self.enemies_killed += 1
                         player.add_skill_points(ENEMY_KILL_REWARD, sounds['skill_gain'])
+                PROFILER.end("pellets")
             
             if player.health <= 0:
-                game_state = GAME_STATE_GAME_OVER
-                footstep_channel.stop()
+                self.game_state = GAME_STATE_GAME_OVER
+                self.footstep_channel.stop()
                 pygame.mixer.music.stop()
 
             # --- Check for Boss Trigger ---
             player_col = int(player.get_center_pos()[0] // CELL_SIZE)
             player_row = int(player.get_center_pos()[1] // CELL_SIZE)
-            if player_col == COLS - 1 and player_row == ROWS - 1:
-                game_state = GAME_STATE_FADING
-                fading_to_state = GAME_STATE_BOSS_FIGHT
-                fade_alpha = 0 
-                footstep_channel.stop()
+            if (player_col, player_row) == grid.exit_cell:
+                self.game_state = GAME_STATE_FADING
+                self.fading_to_state = GAME_STATE_BOSS_FIGHT
+                self.fade_alpha = 0 
+                self.footstep_channel.stop()
                 pygame.mixer.music.fadeout(1000)
             
             # --- Camera Update (Maze) ---
-            player_center_x = player.pos[0] + PLAYER_SIZE / 2
-            player_center_y = player.pos[1] + PLAYER_SIZE / 2
-            camera_offset[0] = player_center_x - (WIN_WIDTH / 2)
-            camera_offset[1] = player_center_y - (WIN_HEIGHT / 2)
-            camera_offset[0] = max(0, min(camera_offset[0], WORLD_WIDTH - WIN_WIDTH))
-            camera_offset[1] = max(0, min(camera_offset[1], WORLD_HEIGHT - WIN_HEIGHT))
+            self.update_camera(grid.cols * CELL_SIZE, grid.rows * CELL_SIZE)
 
-        elif game_state == GAME_STATE_BOSS_FIGHT:
+        elif self.game_state == GAME_STATE_BOSS_FIGHT:
             if player.health > 0:
-                if move["Up"]: dy = -1
-                if move["Down"]: dy = 1
-                if move["Left"]: dx = -1
-                if move["Right"]: dx = 1
-                
-                if (dx != 0 or dy != 0) and not footstep_channel.get_busy():
-                    footstep_channel.play(sounds['footsteps'], -1)
-                elif (dx == 0 and dy == 0) and footstep_channel.get_busy():
-                    footstep_channel.stop()
+                PROFILER.begin("player")
+                dx, dy = self.get_move_direction()
+                self.update_footsteps(dx, dy)
                 
                 player.move_player_arena(dx, dy)
-                player.update(move , camera_offset , horizontal_aiming_component , vertical_aiming_component) 
+                player.update(self.input.move , self.camera_offset , aim_x , aim_y , self.input.mouse_pos) 
+                PROFILER.end("player")
 
+                PROFILER.begin("enemies")
+                boss = self.boss
                 if boss:
                     boss.update(player, sounds['boss_attack'])
+                PROFILER.end("enemies")
                 
-                if pellet_lines and boss:
-                    pellets_hit = 0
-                    boss_rect = boss.get_rect()
-                    for start, end in pellet_lines:
-                        if boss_rect.clipline(start, end):
-                            pellets_hit += 1
+                PROFILER.begin("pellets")
+                if self.pellet_lines and boss:
+                    pellets_hit = resolve_pellet_hits(self.pellet_lines, [boss]).get(boss, 0)
                     
                     if pellets_hit > 0:
                         is_dead = boss.take_damage(pellets_hit * SHOTGUN_PELLET_DAMAGE, sounds['boss_hit'])
                         if is_dead:
                             sounds['boss_death'].play()
-                            game_state = GAME_STATE_WIN
-                            footstep_channel.stop()
+                            self.game_state = GAME_STATE_WIN
+                            self.footstep_channel.stop()
                             pygame.mixer.music.fadeout(1000)
                             sounds['win_game'].play()
+                PROFILER.end("pellets")
 
             if player.health <= 0:
-                game_state = GAME_STATE_GAME_OVER
-                footstep_channel.stop()
+                self.game_state = GAME_STATE_GAME_OVER
+                self.footstep_channel.stop()
                 pygame.mixer.music.stop()
             
             # --- Camera Update (Arena) ---
-            player_center_x = player.pos[0] + PLAYER_SIZE / 2
-            player_center_y = player.pos[1] + PLAYER_SIZE / 2
-            camera_offset[0] = player_center_x - (WIN_WIDTH / 2)
-            camera_offset[1] = player_center_y - (WIN_HEIGHT / 2)
-            camera_offset[0] = max(0, min(camera_offset[0], ARENA_WIDTH - WIN_WIDTH))
-            camera_offset[1] = max(0, min(camera_offset[1], ARENA_HEIGHT - WIN_HEIGHT))
+            self.update_camera(ARENA_WIDTH, ARENA_HEIGHT)
         
-        elif game_state == GAME_STATE_FADING:
-            if fade_alpha < 255 and fading_to_state != -1: # Fading IN (to black)
-                fade_alpha = min(255, fade_alpha + 5)
-                if fade_alpha == 255: # Reached black
-                    if fading_to_state == GAME_STATE_BOSS_FIGHT:
-                        enemies.clear() # Clear maze enemies
+        elif self.game_state == GAME_STATE_FADING:
+            if self.fade_alpha < 255 and self.fading_to_state != -1: # Fading IN (to black)
+                self.fade_alpha = min(255, self.fade_alpha + 5)
+                if self.fade_alpha == 255: # Reached black
+                    if self.fading_to_state == GAME_STATE_BOSS_FIGHT:
+                        self.enemies.clear() # Clear maze enemies
                         player.pos = [ARENA_WIDTH / 2, ARENA_HEIGHT - (PLAYER_SIZE * 4)]
-                        boss = Boss(
+                        self.boss = Boss(
                             [ARENA_WIDTH / 2 - BOSS_SIZE / 2, ARENA_HEIGHT / 4],
                             [BOSS_SIZE, BOSS_SIZE],
                             BOSS_HEALTH
@@ -551,100 +620,139 @@ def main():
                         pygame.mixer.music.set_volume(0.4)
                         pygame.mixer.music.play(-1)
                     
-                    fading_to_state = -1
+                    self.fading_to_state = -1
             
-            elif fade_alpha > 0 and fading_to_state == -1: # Fading OUT (from black)
-                fade_alpha = max(0, fade_alpha - 5)
-                if fade_alpha == 0:
-                    game_state = GAME_STATE_BOSS_FIGHT # Finished fading
-
-        if is_shaking and current_time - shake_start_time < IMPACT_SHAKE_DURATION:
-            camera_offset[0] += random.randint(-IMPACT_SHAKE_STRENGTH, IMPACT_SHAKE_STRENGTH)
-            camera_offset[1] += random.randint(-IMPACT_SHAKE_STRENGTH, IMPACT_SHAKE_STRENGTH)
+            elif self.fade_alpha > 0 and self.fading_to_state == -1: # Fading OUT (from black)
+                self.fade_alpha = max(0, self.fade_alpha - 5)
+                if self.fade_alpha == 0:
+                    self.game_state = GAME_STATE_BOSS_FIGHT # Finished fading
+
+        # Pellets hurt on every step while they are visible
+        if self.pellet_lines and current_time - self.pellet_draw_start_time >= SHOTGUN_PELLET_LIFETIME:
+            self.pellet_lines.clear()
+
+    def state_digest(self):
+        # Checksum of the simulation state, compared at the end of a replay
+        player = self.player
+        state = (self.game_state, tuple(player.pos), player.health, player.shotgun_ammo,
+                 player.skill_points, player.equipped_item, self.enemies_killed,
+                 tuple(((float(enemy.pos[0]), float(enemy.pos[1])), enemy.health) for enemy in self.enemies),
+                 (tuple(self.boss.pos), self.boss.health) if self.boss else None)
+        return zlib.crc32(repr(state).encode())
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close(self.state_digest())
+            self.recorder = None
+        if self.replay is not None:
+            self.replay.check(self.state_digest())
+            self.replay = None
+
+    def update_camera(self, world_width, world_height):
+        player_center_x = self.player.pos[0] + PLAYER_SIZE / 2
+        player_center_y = self.player.pos[1] + PLAYER_SIZE / 2
+        self.camera_offset[0] = player_center_x - (WIN_WIDTH / 2)
+        self.camera_offset[1] = player_center_y - (WIN_HEIGHT / 2)
+        self.camera_offset[0] = max(0, min(self.camera_offset[0], world_width - WIN_WIDTH))
+        self.camera_offset[1] = max(0, min(self.camera_offset[1], world_height - WIN_HEIGHT))
+
+    def render_lighting(self, view_offset, alpha):
+        # Flashlight cone and aura into the light map, then multiplied onto the screen
+        screen = self.screen
+        player = self.player
+        game_state = self.game_state
+        light_map = self.light_map
+        horizontal_aiming_component, vertical_aiming_component = self.input.aim_axis
+
+        light_map.clear()
+        player_light_center = light_map.to_light(player.get_aura_center(view_offset, alpha))
+        if player.equipped_item == "flashlight":
+            is_boss = (game_state == GAME_STATE_BOSS_FIGHT)
+            # Only cast rays in maze
+            if not is_boss: 
+                if self.flashlight_engine == "visibility":
+                    aim_angle = get_aim_angle(player, view_offset, horizontal_aiming_component, vertical_aiming_component, self.input.mouse_pos)
+                    vision_polygon_world = self.visibility.compute(player.get_render_center(alpha), aim_angle, player.fov_angle)
+                else:
+                    vision_polygon_world = cast_rays(player, self.grid , player.fov_angle , view_offset , horizontal_aiming_component , vertical_aiming_component , origin=player.get_render_center(alpha) , mouse_pos=self.input.mouse_pos)
+                vision_polygon_light = []
+                for world_pos in vision_polygon_world:
+                    screen_x = world_pos[0] - view_offset[0]
+                    screen_y = world_pos[1] - view_offset[1]
+                    vision_polygon_light.append(light_map.to_light((screen_x, screen_y)))
+
+                if len(vision_polygon_light) > 2:
+                    base_c = player.flashlight_base_brightness
+                    max_c = player.flashlight_brightness
+                    if self.lighting_mode == "texture":
+                        self.flashlight_texture.draw(light_map.surface, vision_polygon_light, player_light_center, base_c, max_c,
+                                                     light_map.scaled_radius(RAY_LENGTH + WALL_THICKNESS))
+                    else:
+                        draw_flashlight_steps(light_map.surface, vision_polygon_light, player_light_center, base_c, max_c)
+        
+        if game_state == GAME_STATE_BOSS_FIGHT:
+            current_aura_sprite = self.light_aura_sprite_boss
+        else:
+            current_aura_sprite = self.light_aura_sprite_normal
+
+        aura_rect = current_aura_sprite.get_rect(center=player_light_center)
+        light_map.surface.blit(current_aura_sprite, aura_rect, special_flags=pygame.BLEND_RGB_ADD)
+
+        light_map.composite(screen)
+
+    def render(self, alpha):
+        # --- Render: entities and camera drawn part way to the next simulation step ---
+        screen = self.screen
+        player = self.player
+        game_state = self.game_state
+
+        view_offset = interpolate(self.prev_camera_offset, self.camera_offset, alpha)
+        if self.is_shaking and self.current_time - self.shake_start_time < IMPACT_SHAKE_DURATION:
+            view_offset[0] += self.rng.shake.randint(-IMPACT_SHAKE_STRENGTH, IMPACT_SHAKE_STRENGTH)
+            view_offset[1] += self.rng.shake.randint(-IMPACT_SHAKE_STRENGTH, IMPACT_SHAKE_STRENGTH)
         else:
-            is_shaking = False
+            self.is_shaking = False
 
-        draw_tiled_floor(screen , floor_tile_img , camera_offset)
+        PROFILER.begin("floor")
+        if game_state == GAME_STATE_PLAYING:
+            # Floor, walls and start/exit markers come pre-rendered
+            self.maze_layer.draw(screen, view_offset)
+        else:
+            draw_tiled_floor(screen , self.floor_tile_img , view_offset)
+        PROFILER.end("floor")
+
+        PROFILER.begin("sprites")
 
         if game_state == GAME_STATE_MENU:
-            play_button_rect, quit_button_rect = draw_menu(screen, menu_title_font, menu_button_font , is_controller_connected)
+            self.play_button_rect, self.quit_button_rect = draw_menu(screen, self.menu_title_font, self.menu_button_font , self.is_controller_connected)
 
         elif game_state == GAME_STATE_PLAYING:
-            for c in range(COLS):
-                for r in range(ROWS):
-                    grid[c][r].draw(screen, camera_offset)
-            
-            start_screen_x = 0 - camera_offset[0]
-            start_screen_y = 0 - camera_offset[1]
-            pygame.draw.rect(screen, START_BLUE, (start_screen_x, start_screen_y, CELL_SIZE, CELL_SIZE))
-            end_screen_x = ((COLS - 1) * CELL_SIZE) - camera_offset[0]
-            end_screen_y = ((ROWS - 1) * CELL_SIZE) - camera_offset[1]
-            pygame.draw.rect(screen, RED, (end_screen_x, end_screen_y, CELL_SIZE, CELL_SIZE))
-
-            for enemy in enemies:
-                enemy.render(screen, camera_offset)
-            player.render(screen, camera_offset)
+            for enemy in self.enemies:
+                enemy.render(screen, view_offset, alpha)
+            player.render(screen, view_offset, alpha)
 
         elif game_state == GAME_STATE_BOSS_FIGHT:
-            draw_arena_walls(screen, camera_offset)
-            if boss:
-                boss.render(screen, camera_offset)
-            player.render(screen, camera_offset)
+            draw_arena_walls(screen, view_offset)
+            if self.boss:
+                self.boss.render(screen, view_offset, alpha)
+            player.render(screen, view_offset, alpha)
+        PROFILER.end("sprites")
 
         # --- Draw lighting (Common to Play and Boss) ---
         if game_state == GAME_STATE_PLAYING or game_state == GAME_STATE_BOSS_FIGHT:
-            if pellet_lines and current_time - pellet_draw_start_time < SHOTGUN_PELLET_LIFETIME:
-                for start_world, end_world in pellet_lines:
-                    start_screen = (start_world[0] - camera_offset[0], start_world[1] - camera_offset[1])
-                    end_screen = (end_world[0] - camera_offset[0], end_world[1] - camera_offset[1])
-                    pygame.draw.line(screen, SHOTGUN_PELLET_COLOR, start_screen, end_screen, SHOTGUN_PELLET_THICKNESS)
-            else:
-                pellet_lines.clear()
-
-            light_surface.fill(BLACK)
-            player_screen_center = player.get_aura_center(camera_offset)
-            if player.equipped_item == "flashlight":
-                is_boss = (game_state == GAME_STATE_BOSS_FIGHT)
-                # Only cast rays in maze
-                if not is_boss: 
-                    vision_polygon_world = cast_rays(player, grid , player.fov_angle , camera_offset , horizontal_aiming_component , vertical_aiming_component)
-                    vision_polygon_screen = []
-                    for world_pos in vision_polygon_world:
-                        screen_x = world_pos[0] - camera_offset[0]
-                        screen_y = world_pos[1] - camera_offset[1]
-                        vision_polygon_screen.append((screen_x, screen_y))
-
-                    if len(vision_polygon_screen) > 2:
-                        base_c = player.flashlight_base_brightness
-                        max_c = player.flashlight_brightness
-                        steps = FLASHLIGHT_GRADIENT_STEPS
-                        ray_end_points = vision_polygon_screen[1:]
-                        for i in range(steps, 0, -1):
-                            scale = i / steps
-                            r = max_c[0] - (max_c[0] - base_c[0]) * scale
-                            g = max_c[1] - (max_c[1] - base_c[1]) * scale
-                            b = max_c[2] - (max_c[2] - base_c[2]) * scale
-                            color = (int(r), int(g), int(b))
-                            scaled_polygon = [player_screen_center]
-                            for p in ray_end_points:
-                                vec_x = p[0] - player_screen_center[0]
-                                vec_y = p[1] - player_screen_center[1]
-                                scaled_x = player_screen_center[0] + vec_x * scale
-                                scaled_y = player_screen_center[1] + vec_y * scale
-                                scaled_polygon.append((scaled_x, scaled_y))
-                            pygame.draw.polygon(light_surface, color, scaled_polygon)
-            
-            if game_state == GAME_STATE_BOSS_FIGHT:
-                current_aura_sprite = light_aura_sprite_boss
-            else:
-                current_aura_sprite = light_aura_sprite_normal
-
-            aura_rect = current_aura_sprite.get_rect(center=player_screen_center)
-            light_surface.blit(current_aura_sprite, aura_rect, special_flags=pygame.BLEND_RGB_ADD)
+            for start_world, end_world in self.pellet_lines:
+                start_screen = (start_world[0] - view_offset[0], start_world[1] - view_offset[1])
+                end_screen = (end_world[0] - view_offset[0], end_world[1] - view_offset[1])
+                pygame.draw.line(screen, SHOTGUN_PELLET_COLOR, start_screen, end_screen, SHOTGUN_PELLET_THICKNESS)
 
-            screen.blit(light_surface, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+            PROFILER.begin("lighting")
+            self.render_lighting(view_offset, alpha)
+            PROFILER.end("lighting")
 
             # --- Draw UI ---
+            PROFILER.begin("ui")
+            ui_font = self.ui_font
+            upgrade_font = self.upgrade_font
             health_percent = player.health / player.max_health
             bg_rect = pygame.Rect(10, 10, 300, 30)
             fg_rect = pygame.Rect(10, 10, int(300 * health_percent), 30)
@@ -688,46 +796,104 @@ def main():
                         text_surf = upgrade_font.render(text, True, WHITE)
                         screen.blit(text_surf, (sp_rect.left, y_offset))
                         y_offset += 25
+            PROFILER.end("ui")
 
         elif game_state == GAME_STATE_GAME_OVER:
-            text = game_over_font.render("YOU DIED", True, (150, 0, 0))
+            text = self.game_over_font.render("YOU DIED", True, (150, 0, 0))
             text_rect = text.get_rect(center=(WIN_WIDTH / 2, WIN_HEIGHT / 2))
             s = pygame.Surface((WIN_WIDTH, WIN_HEIGHT), pygame.SRCALPHA)
             s.fill((0,0,0,150)) 
             screen.blit(s, (0,0))
             screen.blit(text, text_rect)
-            prompt_text = ui_font.render("Click anywhere to restart", True, WHITE)
+            prompt_text = self.ui_font.render("Click anywhere to restart", True, WHITE)
             prompt_rect = prompt_text.get_rect(center=(WIN_WIDTH / 2, WIN_HEIGHT / 2 + 100))
             screen.blit(prompt_text, prompt_rect)
 
         elif game_state == GAME_STATE_WIN:
-            text = game_over_font.render("YOU WON", True, (0, 255, 0))
+            text = self.game_over_font.render("YOU WON", True, (0, 255, 0))
             text_rect = text.get_rect(center=(WIN_WIDTH / 2, WIN_HEIGHT / 2))
             s = pygame.Surface((WIN_WIDTH, WIN_HEIGHT), pygame.SRCALPHA)
             s.fill((0,0,0,150)) 
             screen.blit(s, (0,0))
             screen.blit(text, text_rect)
-            prompt_text = ui_font.render("Click anywhere to return to menu", True, WHITE)
+            prompt_text = self.ui_font.render("Click anywhere to return to menu", True, WHITE)
             prompt_rect = prompt_text.get_rect(center=(WIN_WIDTH / 2, WIN_HEIGHT / 2 + 100))
             screen.blit(prompt_text, prompt_rect)
 
         # --- Draw Fade (On top of everything) ---
         if game_state == GAME_STATE_FADING:
-            fade_surface.set_alpha(fade_alpha)
-            screen.blit(fade_surface, (0, 0))
+            self.fade_surface.set_alpha(self.fade_alpha)
+            screen.blit(self.fade_surface, (0, 0))
 
         font = pygame.font.SysFont("Futura" , 30)
         if pygame.joystick.get_count():
             img = font.render("Controller Connected !" , True , "green")
             screen.blit(img , (WIN_WIDTH - img.get_width() , WIN_HEIGHT - img.get_height()))
-        
-            
+
+def init_pygame():
+    pygame.init()
+    pygame.joystick.init()
+    pygame.mixer.init()
+    pygame.mixer.set_num_channels(16)
+
+    screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption('VisionCurse - The Cave')
+    return screen
+
+# --- Main Game Function ---
+def main(seed=None, record_path=None, replay_path=None, profile_path=None, chunked=CHUNKED_WORLD, level_path=MAZE_LEVEL_PATH):
+    screen = init_pygame()
+    # A loaded level is only read, so every restart can share the one mapping
+    level = load_maze(level_path) if level_path else None
+    if profile_path:
+        PROFILER.start_export(profile_path)
+    clock = pygame.time.Clock()
+    game = Game(screen, seed=seed, record_path=record_path, replay_path=replay_path, chunked=chunked, grid=level)
+    frame_ms = 0
+
+    # Main game loop
+    while game.running:
+        PROFILER.begin("input")
+        game.poll_joysticks()
+        PROFILER.end("input")
+        PROFILER.begin("events")
+        for event in pygame.event.get():
+            game.handle_event(event)
+        game.input.mouse_pos = pygame.mouse.get_pos()
+        PROFILER.end("events")
+
+        if game.restart_requested:
+            game.close()
+            game = Game(screen, chunked=chunked, grid=level)
+            frame_ms = 0
+            continue
+
+        # --- Simulation: fixed steps for however much time the last frame took ---
+        game.timestep.add_frame_time(frame_ms)
+        for _ in game.timestep.steps():
+            game.step()
+
+        game.render(game.timestep.alpha)
+        PROFILER.draw_overlay(screen)
+        PROFILER.begin("flip")
         pygame.display.flip()
+        PROFILER.end("flip")
+        PROFILER.end_frame()
         
-        clock.tick(60)
+        frame_ms = clock.tick(RENDER_FPS)
 
+    game.close()
+    PROFILER.stop_export()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="VisionCurse")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the maze, spawns and weapon spread")
+    parser.add_argument("--record", metavar="PATH", help="record the session's input to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play back input recorded with --record")
+    parser.add_argument("--profile", metavar="PATH", help="write per-frame section timings to PATH (.csv or .json)")
+    parser.add_argument("--chunked", action="store_true", default=CHUNKED_WORLD, help="play in the streamed, effectively unbounded maze")
+    parser.add_argument("--level", metavar="PATH", default=MAZE_LEVEL_PATH, help="play a maze file written by maze_file.py instead of a generated maze")
+    args = parser.parse_args()
+    main(args.seed, args.record, args.replay, args.profile, args.chunked, args.level)
@@ -0,0 +1,120 @@
+import os
+import mmap
+import time
+import struct
+import argparse
+from array import array
+from walls import WallGrid
+from topology import MazeTopology
+from maze_gen import generate_maze, MAZE_ALGORITHMS
+from constants import *
+
+# File layout (little endian), every section starting on an 8 byte boundary:
+#   header      "VCMZ", version u16, flags u16, cols u32, rows u32, seed u64,
+#               start col/row u32, exit col/row u32, algorithm 16s, table count u16
+#   directory   per table: name 16s, array typecode 1s, offset u64, item count u64
+#   masks       cols * rows wall bitmask bytes, column-major like WallGrid
+#   tables      per-cell (or any) arrays, e.g. BFS distances, stored raw
+# Nothing needs parsing past the header and directory, so loading maps the file and
+# hands out memoryviews into it.
+MAZE_FILE_MAGIC = b"VCMZ"
+MAZE_FILE_VERSION = 1
+HEADER = struct.Struct("<4sHHIIQIIII16sH")
+TABLE_ENTRY = struct.Struct("<16s1sQQ")
+ALIGN = 8
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def save_maze(path, grid, seed=0, algorithm="", tables=None):
+    # tables: {name: array.array}; names up to 16 bytes
+    tables = tables or {}
+    directory_end = HEADER.size + TABLE_ENTRY.size * len(tables)
+    masks_offset = _aligned(directory_end)
+    offset = _aligned(masks_offset + grid.cols * grid.rows)
+    entries = []
+    for name, values in tables.items():
+        entries.append((name, values, offset))
+        offset = _aligned(offset + values.itemsize * len(values))
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAZE_FILE_MAGIC, MAZE_FILE_VERSION, 0, grid.cols, grid.rows, seed,
+                            grid.start_cell[0], grid.start_cell[1], grid.exit_cell[0], grid.exit_cell[1],
+                            algorithm.encode(), len(tables)))
+        for name, values, table_offset in entries:
+            f.write(TABLE_ENTRY.pack(name.encode(), values.typecode.encode(), table_offset, len(values)))
+        f.write(bytes(masks_offset - f.tell()))
+        f.write(bytes(grid.masks))
+        for name, values, table_offset in entries:
+            f.write(bytes(table_offset - f.tell()))
+            f.write(values.tobytes())
+
+def load_maze(path, writable=False):
+    # Maps the file instead of reading it, so opening costs the same for any size and
+    # processes loading the same level share its pages. The grid's masks and tables
+    # are views into the mapping; with writable=True edits stay private to this
+    # process (copy-on-write) and never reach the file.
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    (magic, version, flags, cols, rows, seed, start_col, start_row, exit_col, exit_row,
+     algorithm, table_count) = HEADER.unpack_from(view, 0)
+    if magic != MAZE_FILE_MAGIC or version != MAZE_FILE_VERSION:
+        raise ValueError(f"{path} is not a version {MAZE_FILE_VERSION} maze file")
+
+    tables = {}
+    for i in range(table_count):
+        name, typecode, offset, count = TABLE_ENTRY.unpack_from(view, HEADER.size + i * TABLE_ENTRY.size)
+        typecode = typecode.decode()
+        size = array(typecode).itemsize
+        tables[name.rstrip(b"\0").decode()] = view[offset:offset + count * size].cast(typecode)
+
+    masks_offset = _aligned(HEADER.size + TABLE_ENTRY.size * table_count)
+    grid = WallGrid(cols, rows, view[masks_offset:masks_offset + cols * rows])
+    grid.start_cell = (start_col, start_row)
+    grid.exit_cell = (exit_col, exit_row)
+    grid.seed = seed
+    grid.algorithm = algorithm.rstrip(b"\0").decode()
+    grid.tables = tables
+    grid.build_tables()
+    return grid
+
+def bfs_distances(grid, cell):
+    # Steps from `cell` to every cell through open walls, -1 where unreachable
+    return MazeTopology(grid).distances_from(cell)
+
+def main_maze_file(argv=None):
+    parser = argparse.ArgumentParser(description="Write and inspect VisionCurse maze files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    make = commands.add_parser("generate", help="generate a maze and save it")
+    make.add_argument("output")
+    make.add_argument("--size", type=int, nargs=2, metavar=("COLS", "ROWS"), default=(COLS, ROWS))
+    make.add_argument("--seed", type=int, default=0)
+    make.add_argument("--algorithm", choices=sorted(MAZE_ALGORITHMS), default=MAZE_ALGORITHM)
+    make.add_argument("--distances", action="store_true", help="also store BFS distances from the start and to the exit")
+    info = commands.add_parser("info", help="print a maze file's header and tables")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        cols, rows = args.size
+        start = time.perf_counter()
+        grid = generate_maze(cols, rows, args.seed, args.algorithm)
+        tables = {}
+        if args.distances:
+            topology = MazeTopology(grid)
+            tables['start_distance'] = topology.start_distance
+            tables['exit_distance'] = topology.exit_distance
+        save_maze(args.output, grid, args.seed, args.algorithm, tables)
+        print(f"Wrote {cols}x{rows} {args.algorithm} maze to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB) in {time.perf_counter() - start:.2f} s")
+    else:
+        start = time.perf_counter()
+        grid = load_maze(args.path)
+        elapsed = time.perf_counter() - start
+        print(f"{args.path}: {grid.cols}x{grid.rows} {grid.algorithm or 'unknown'} maze, seed {grid.seed}, opened in {elapsed * 1000:.2f} ms")
+        print(f"start {grid.start_cell}, exit {grid.exit_cell}")
+        for name, values in grid.tables.items():
+            print(f"table {name}: {len(values)} x '{values.format}'")
+
+if __name__ == "__main__":
+    main_maze_file()
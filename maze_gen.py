@@ -0,0 +1,286 @@
+import time
+import random
+import argparse
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from walls import WallGrid, NEIGHBOR_OFFSETS
+from constants import *
+
+# The generators work on a copy of the grid padded with a one-cell border, so a
+# neighbour is always `index + step` and "off the grid" is just a marked border
+# cell. Directions are indices into NEIGHBOR_OFFSETS (top, right, bottom, left).
+OPEN_HERE = tuple(~bit & WALL_ALL for bit, _, _, _ in NEIGHBOR_OFFSETS)
+OPEN_THERE = tuple(~opposite & WALL_ALL for _, opposite, _, _ in NEIGHBOR_OFFSETS)
+WALL_BITS = tuple(bit for bit, _, _, _ in NEIGHBOR_OFFSETS)
+DEAD_END = tuple(bin(mask).count("1") == 3 for mask in range(16))
+
+def _padded(cols, rows):
+    # (step per direction, masks, border flags) for a cols x rows grid
+    stride = rows + 2
+    size = (cols + 2) * stride
+    steps = tuple(dc * stride + dr for _, _, dc, dr in NEIGHBOR_OFFSETS)
+    masks = bytearray([WALL_ALL]) * size
+    border = bytearray(size)
+    border[:stride] = b"\1" * stride
+    border[-stride:] = b"\1" * stride
+    border[::stride] = b"\1" * (cols + 2)
+    border[stride - 1::stride] = b"\1" * (cols + 2)
+    return steps, masks, border
+
+def _unpad(masks, cols, rows):
+    stride = rows + 2
+    out = array('B')
+    for col in range(cols):
+        start = (col + 1) * stride + 1
+        out.frombytes(masks[start:start + rows])
+    return out
+
+def backtracker(rng, cols, rows):
+    # Depth-first search from the top-left cell. Makes long winding corridors with
+    # few junctions. Consumes the RNG exactly like the original gen_maze, so a seed
+    # gives the same maze it always has.
+    steps, masks, visited = _padded(cols, rows)
+    up, right, down, left = steps
+    choice = rng.choice
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    here = rows + 3
+    visited[here] = 1
+    while True:
+        options = []
+        if not visited[here + up]:
+            options.append(0)
+        if not visited[here + right]:
+            options.append(1)
+        if not visited[here + down]:
+            options.append(2)
+        if not visited[here + left]:
+            options.append(3)
+
+        if options:
+            d = choice(options)
+            there = here + steps[d]
+            masks[here] &= OPEN_HERE[d]
+            masks[there] &= OPEN_THERE[d]
+            visited[there] = 1
+            push(here)
+            here = there
+        elif stack:
+            here = pop()
+        else:
+            return masks
+
+def kruskal(rng, cols, rows):
+    # Joins neighbour pairs in random order whenever they're not yet connected. Many
+    # short dead ends, uniform texture. With NumPy the same maze is built by
+    # Boruvka's algorithm, which joins every component to its first edge in the
+    # random order at once and needs only a logarithmic number of array passes. Both
+    # paths shuffle the same edge list with rng.shuffle, so a seed gives the same
+    # maze and leaves the RNG in the same state either way.
+    steps, masks, border = _padded(cols, rows)
+    stride = rows + 2
+    order = _kruskal_edges(cols, rows, border)
+    rng.shuffle(order)
+    if np is not None:
+        _kruskal_arrays(order, cols, rows, masks)
+        return masks
+
+    # Union-find with path halving
+    parent = list(range(len(masks)))
+    joins_left = cols * rows - 1
+    for edge in order:
+        a = here = edge >> 1
+        d = 2 if edge & 1 else 1
+        b = there = here + steps[d]
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a == b:
+            continue
+        parent[a] = b
+        masks[here] &= OPEN_HERE[d]
+        masks[there] &= OPEN_THERE[d]
+        joins_left -= 1
+        if not joins_left:
+            break
+    return masks
+
+def _kruskal_edges(cols, rows, border):
+    # Edge e joins cell e >> 1 with its right (e & 1 == 0) or bottom (e & 1 == 1)
+    # neighbour; column by column, right before bottom
+    stride = rows + 2
+    if np is not None:
+        cells = (np.arange(1, cols + 1)[:, None] * stride + np.arange(1, rows + 1)).ravel()
+        edges = np.stack((cells << 1, cells << 1 | 1), axis=1)
+        inside = np.stack((cells // stride < cols, cells % stride < rows), axis=1)
+        return edges[inside].tolist()
+    return [cell << 1 | kind
+            for col in range(1, cols + 1)
+            for cell in range(col * stride + 1, col * stride + rows + 1)
+            for kind in (0, 1)
+            if not border[cell + (stride if kind == 0 else 1)]]
+
+def _merge_labels(count, a, b):
+    # Connected components of the graph on 0..count-1 with edges a[i]-b[i]: hook the
+    # larger root under the smaller, then pointer-jump until every node points at its root
+    parent = np.arange(count)
+    while True:
+        root_a = parent[a]
+        root_b = parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            return parent
+        np.minimum.at(parent, np.maximum(root_a, root_b)[differ], np.minimum(root_a, root_b)[differ])
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+def _kruskal_arrays(order, cols, rows, masks):
+    count = cols * rows
+    # The shuffled padded edges as (cell, neighbour) pairs of unpadded indices
+    order = np.array(order, dtype=np.intp)
+    padded = order >> 1
+    first = padded // (rows + 2) * rows + padded % (rows + 2) - rows - 1
+    second = first + np.where(order & 1, 1, rows)
+    # An edge's index is now its rank in the random order
+
+    label = np.arange(count)
+    live = np.arange(len(first))
+    chosen = []
+    none = len(first)
+    while True:
+        label_a = label[first[live]]
+        label_b = label[second[live]]
+        crossing = label_a != label_b
+        live = live[crossing]
+        if len(live) == 0:
+            break
+        label_a = label_a[crossing]
+        label_b = label_b[crossing]
+        # Every component takes its lowest-ranked edge leading out of it
+        best = np.full(count, none)
+        np.minimum.at(best, label_a, live)
+        np.minimum.at(best, label_b, live)
+        flags = np.zeros(none + 1, dtype=bool)
+        flags[best] = True
+        picked = np.flatnonzero(flags[:none])
+        chosen.append(picked)
+        merged = _merge_labels(count, label[first[picked]], label[second[picked]])
+        label = merged[label]
+
+    chosen = np.concatenate(chosen) if chosen else np.empty(0, dtype=np.intp)
+    a = first[chosen]
+    b = second[chosen]
+    # Padded index of each end; b is either one column right (stride) or one row down (1)
+    padded_a = (a // rows + 1) * (rows + 2) + a % rows + 1
+    padded_b = (b // rows + 1) * (rows + 2) + b % rows + 1
+    view = np.frombuffer(masks, dtype=np.uint8)
+    right = b - a == rows
+    # Each cell has at most one edge per direction, so the fancy-indexed updates don't collide
+    view[padded_a[right]] &= OPEN_HERE[1]
+    view[padded_b[right]] &= OPEN_THERE[1]
+    view[padded_a[~right]] &= OPEN_HERE[2]
+    view[padded_b[~right]] &= OPEN_THERE[2]
+
+def wilson(rng, cols, rows):
+    # Loop-erased random walks from every cell not yet in the maze until they hit it.
+    # Picks uniformly among all possible mazes (no directional bias), but the first
+    # walks wander for a long time on big grids, so it's the slowest of the four.
+    steps, masks, border = _padded(cols, rows)
+    stride = rows + 2
+    in_maze = bytearray(border)
+    heading = bytearray(len(masks))
+    getrandbits = rng.getrandbits
+    cells = [cell for col in range(1, cols + 1) for cell in range(col * stride + 1, col * stride + rows + 1)]
+    in_maze[cells[rng.randrange(len(cells))]] = 2
+
+    for start in cells:
+        if in_maze[start]:
+            continue
+        # Walk, remembering only the last way out of each cell; that erases the loops
+        here = start
+        while in_maze[here] != 2:
+            d = getrandbits(2)
+            there = here + steps[d]
+            if border[there]:
+                continue
+            heading[here] = d
+            here = there
+        # Carve the loop-free path
+        here = start
+        while in_maze[here] != 2:
+            d = heading[here]
+            there = here + steps[d]
+            masks[here] &= OPEN_HERE[d]
+            masks[there] &= OPEN_THERE[d]
+            in_maze[here] = 2
+            here = there
+    return masks
+
+def braid(rng, cols, rows, fraction=MAZE_BRAID_FRACTION):
+    # A backtracker maze with `fraction` of its dead ends knocked through to a
+    # neighbour (another dead end where possible), giving loops to run around
+    masks = backtracker(rng, cols, rows)
+    steps, _, border = _padded(cols, rows)
+    stride = rows + 2
+    for col in range(1, cols + 1):
+        for here in range(col * stride + 1, col * stride + rows + 1):
+            mask = masks[here]
+            if not DEAD_END[mask] or rng.random() >= fraction:
+                continue
+            walled = [d for d in range(4) if mask & WALL_BITS[d] and not border[here + steps[d]]]
+            if not walled:
+                continue
+            preferred = [d for d in walled if DEAD_END[masks[here + steps[d]]]]
+            d = rng.choice(preferred or walled)
+            masks[here] &= OPEN_HERE[d]
+            masks[here + steps[d]] &= OPEN_THERE[d]
+    return masks
+
+MAZE_ALGORITHMS = {
+    'backtracker': backtracker,
+    'kruskal': kruskal,
+    'wilson': wilson,
+    'braid': braid,
+}
+
+def generate_masks(rng, cols, rows, algorithm=MAZE_ALGORITHM):
+    # Column-major wall masks, the layout WallGrid stores
+    return _unpad(MAZE_ALGORITHMS[algorithm](rng, cols, rows), cols, rows)
+
+def generate_maze(cols=COLS, rows=ROWS, seed=None, algorithm=MAZE_ALGORITHM, rng=None):
+    # Returns a WallGrid with the entrance (top of the first cell) and exit (bottom of
+    # the last) open. Pass either a seed or an existing random.Random.
+    if rng is None:
+        rng = random.Random(seed)
+    grid = WallGrid(cols, rows, generate_masks(rng, cols, rows, algorithm))
+    grid.set_wall(0, 0, WALL_TOP, False)
+    grid.set_wall(cols - 1, rows - 1, WALL_BOTTOM, False)
+    grid.build_tables()
+    return grid
+
+def main_maze_gen(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a maze and report how long it took")
+    parser.add_argument("--size", type=int, nargs=2, metavar=("COLS", "ROWS"), default=(COLS, ROWS))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--algorithm", choices=sorted(MAZE_ALGORITHMS), default=MAZE_ALGORITHM)
+    args = parser.parse_args(argv)
+
+    cols, rows = args.size
+    start = time.perf_counter()
+    grid = generate_maze(cols, rows, args.seed, args.algorithm)
+    elapsed = time.perf_counter() - start
+    dead_ends = sum(DEAD_END[mask] for mask in grid.masks)
+    print(f"{args.algorithm} {cols}x{rows}: {elapsed:.2f} s, {grid.memory_usage() / 1e6:.1f} MB of walls, {dead_ends} dead ends")
+
+if __name__ == "__main__":
+    main_maze_gen()
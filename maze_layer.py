@@ -0,0 +1,78 @@
+import pygame
+from collections import OrderedDict
+from constants import *
+
+def _tile_variant(col, row):
+    # Cheap integer hash so each floor tile keeps the same look every time its chunk is rebuilt
+    h = (col * 73856093) ^ (row * 19349663)
+    h = (h ^ (h >> 13)) * 1274126177
+    return (h >> 16) & 1
+
+class MazeLayer:
+    # The maze never changes after generation, so floor, walls and the start/exit
+    # markers are rendered once into chunk surfaces and only blitted afterwards.
+    # Chunks are built on first sight and the least recently used ones are dropped.
+    def __init__(self, grid, floor_tiles, chunk_size=MAZE_LAYER_CHUNK_SIZE, max_chunks=MAZE_LAYER_MAX_CHUNKS):
+        self.grid = grid
+        self.floor_tiles = floor_tiles
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+
+    def _build_chunk(self, chunk_x, chunk_y):
+        size = self.chunk_size
+        origin_x = chunk_x * size
+        origin_y = chunk_y * size
+        surface = pygame.Surface((size, size)).convert()
+
+        # Floor covers the whole chunk, including the area outside the maze
+        first_col = int(origin_x // CELL_SIZE)
+        first_row = int(origin_y // CELL_SIZE)
+        last_col = int((origin_x + size) // CELL_SIZE)
+        last_row = int((origin_y + size) // CELL_SIZE)
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                tile = self.floor_tiles[_tile_variant(col, row) % len(self.floor_tiles)]
+                surface.blit(tile, (col * CELL_SIZE - origin_x, row * CELL_SIZE - origin_y))
+
+        # Walls are drawn centred on the cell edges, so neighbours just outside the chunk can reach into it
+        for col in range(max(0, first_col - 1), min(self.grid.cols, last_col + 2)):
+            for row in range(max(0, first_row - 1), min(self.grid.rows, last_row + 2)):
+                screen_x = col * CELL_SIZE - origin_x
+                screen_y = row * CELL_SIZE - origin_y
+                for start, end in self.grid.cell_segments(col, row):
+                    pygame.draw.line(surface, WHITE, (screen_x + start[0], screen_y + start[1]), (screen_x + end[0], screen_y + end[1]), WALL_THICKNESS)
+
+        start_x = self.grid.start_cell[0] * CELL_SIZE - origin_x
+        start_y = self.grid.start_cell[1] * CELL_SIZE - origin_y
+        pygame.draw.rect(surface, START_BLUE, (start_x, start_y, CELL_SIZE, CELL_SIZE))
+        end_x = self.grid.exit_cell[0] * CELL_SIZE - origin_x
+        end_y = self.grid.exit_cell[1] * CELL_SIZE - origin_y
+        pygame.draw.rect(surface, RED, (end_x, end_y, CELL_SIZE, CELL_SIZE))
+
+        return surface
+
+    def get_chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        surface = self.chunks.get(key)
+        if surface is None:
+            surface = self._build_chunk(chunk_x, chunk_y)
+            self.chunks[key] = surface
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        return surface
+
+    def draw(self, screen, camera_offset):
+        size = self.chunk_size
+        first_x = int(camera_offset[0] // size)
+        first_y = int(camera_offset[1] // size)
+        last_x = int((camera_offset[0] + WIN_WIDTH) // size)
+        last_y = int((camera_offset[1] + WIN_HEIGHT) // size)
+        for chunk_x in range(first_x, last_x + 1):
+            for chunk_y in range(first_y, last_y + 1):
+                screen.blit(self.get_chunk(chunk_x, chunk_y), (chunk_x * size - camera_offset[0], chunk_y * size - camera_offset[1]))
+
+    def memory_usage(self):
+        return sum(surface.get_bytesize() * surface.get_width() * surface.get_height() for surface in self.chunks.values())
@@ -1,11 +1,18 @@
 import pygame
 import math
 import random
+from assets import ASSETS
+from raycast import cast_ray, cast_ray_arena
+from rotation_cache import ROTATION_CACHE
+from timestep import SIM_CLOCK, interpolate
+from profiler import PROFILER
+from collision import colliders_for
 from constants import *
 
 class Player:
     def __init__(self, pos, size):
         self.pos = [pos[0], pos[1]]
+        self.prev_pos = [pos[0], pos[1]] # position one simulation step ago, for render interpolation
         self.size = [size, size]
         self.health = 100
         self.speed = PLAYER_SPEED
@@ -30,41 +37,19 @@ class Player:
         self.reload_start_time = 0
 
         try:
-            self.idle_image_right = pygame.image.load('images/improved_images/player_idle.png').convert_alpha()
-            self.idle_image_left = pygame.transform.flip(self.idle_image_right, True, False)
-
-            self.walk_right_frames = [
-                pygame.image.load('images/improved_images/player_right1.png').convert_alpha(),
-                pygame.image.load('images/improved_images/player_right2.png').convert_alpha(),
-                pygame.image.load('images/improved_images/player_right3.png').convert_alpha(),
-                pygame.image.load('images/improved_images/player_right4.png').convert_alpha()
-            ]
-            self.walk_left_frames = [
-                pygame.image.load('images/improved_images/player_left1.png').convert_alpha(),
-                pygame.image.load('images/improved_images/player_left2.png').convert_alpha(),
-                pygame.image.load('images/improved_images/player_left3.png').convert_alpha(),
-                pygame.image.load('images/improved_images/player_left4.png').convert_alpha()
-            ]
-
-            self.shotgun_original_image = pygame.image.load(SHOTGUN_SPRITE_PATH).convert_alpha()
-            self.flashlight_original_image = pygame.image.load(FLASHLIGHT_SPRITE_PATH).convert_alpha()
-            
-            self.idle_image_right = pygame.transform.scale(self.idle_image_right, (self.size[0], self.size[1]))
-            self.idle_image_left = pygame.transform.scale(self.idle_image_left, (self.size[0], self.size[1]))
-            
-            self.walk_right_frames = [pygame.transform.scale(img, (self.size[0], self.size[1])) for img in self.walk_right_frames]
-            self.walk_left_frames = [pygame.transform.scale(img, (self.size[0], self.size[1])) for img in self.walk_left_frames]
-
+            self.idle_image_right = ASSETS.load_image('images/improved_images/player_idle.png', self.size)
+            self.idle_image_left = ASSETS.load_image('images/improved_images/player_idle.png', self.size, flip_x=True)
 
+            self.walk_right_frames = [ASSETS.load_image(f'images/improved_images/player_right{i}.png', self.size) for i in range(1, 5)]
+            self.walk_left_frames = [ASSETS.load_image(f'images/improved_images/player_left{i}.png', self.size) for i in range(1, 5)]
 
             shotgun_size = (int(self.size[0] * 1.5), int(self.size[1] * 1.6))
-            self.shotgun_original_image = pygame.transform.scale(self.shotgun_original_image, shotgun_size)
-            self.shotgun_original_left = pygame.transform.flip(self.shotgun_original_image, False, True)
-
+            self.shotgun_original_image = ASSETS.load_image(SHOTGUN_SPRITE_PATH, shotgun_size)
+            self.shotgun_original_left = ASSETS.load_image(SHOTGUN_SPRITE_PATH, shotgun_size, flip_y=True)
 
             flashlight_size = (int(self.size[0] * 1.2), int(self.size[1] * 0.6))
-            self.flashlight_original_image = pygame.transform.scale(self.flashlight_original_image, flashlight_size)
-            self.flashlight_original_left = pygame.transform.flip(self.flashlight_original_image, False, True)
+            self.flashlight_original_image = ASSETS.load_image(FLASHLIGHT_SPRITE_PATH, flashlight_size)
+            self.flashlight_original_left = ASSETS.load_image(FLASHLIGHT_SPRITE_PATH, flashlight_size, flip_y=True)
             
         except pygame.error as e:
             print(f"Error loading player images: {e}")
@@ -86,12 +71,15 @@ class Player:
 
         self.shotgun_image = self.shotgun_original_image
         self.flashlight_image = self.flashlight_original_image
+        self.shotgun_sprite_key = (SHOTGUN_SPRITE_PATH, self.shotgun_original_image.get_size())
+        self.flashlight_sprite_key = (FLASHLIGHT_SPRITE_PATH, self.flashlight_original_image.get_size())
         self.weapon_angle = 0 
         self.weapon_pivot_offset = [5, 3]
 
-    def render(self, screen, camera_offset):
-        screen_x = self.pos[0] - camera_offset[0]
-        screen_y = self.pos[1] - camera_offset[1]
+    def render(self, screen, camera_offset, alpha=1.0):
+        render_pos = interpolate(self.prev_pos, self.pos, alpha)
+        screen_x = render_pos[0] - camera_offset[0]
+        screen_y = render_pos[1] - camera_offset[1]
         
         screen.blit(self.image, (screen_x, screen_y))
         player_rect = pygame.Rect(screen_x, screen_y, self.size[0], self.size[1])
@@ -102,7 +90,7 @@ class Player:
                                 player_rect.centery - item_size / 2, 
                                 item_size, item_size)
 
-        player_screen_center = self.get_aura_center(camera_offset)
+        player_screen_center = self.get_aura_center(camera_offset, alpha)
         
         # Adjust pivot based on facing direction
         pivot = (player_screen_center[0] - self.weapon_pivot_offset[0], player_screen_center[1] + self.weapon_pivot_offset[1])
@@ -116,13 +104,19 @@ class Player:
             screen.blit(self.flashlight_image, flashlight_screen_rect)
 
     def get_rect(self):
+        PROFILER.count("rects_allocated")
         return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
     
     def get_center_pos(self):
         return [self.pos[0] + self.size[0] / 2, self.pos[1] + self.size[1] / 2]
     
-    def get_aura_center(self , camera_offset):
-        return [self.pos[0] - camera_offset[0] + self.size[0] / 2 , self.pos[1] - camera_offset[1] + self.size[1]/2]
+    def get_render_center(self, alpha=1.0):
+        pos = interpolate(self.prev_pos, self.pos, alpha)
+        return [pos[0] + self.size[0] / 2, pos[1] + self.size[1] / 2]
+
+    def get_aura_center(self , camera_offset , alpha=1.0):
+        center = self.get_render_center(alpha)
+        return [center[0] - camera_offset[0] , center[1] - camera_offset[1]]
 
     def take_damage(self, amount):
         self.health -= amount
@@ -130,15 +124,15 @@ class Player:
             self.health = 0
         print(f"Player took {amount} damage, health is now {self.health}")
 
-    def update(self, move_dict, camera_offset , joystick_horizontal_aim , joystick_vertical_aim):
+    def update(self, move_dict, camera_offset , joystick_horizontal_aim , joystick_vertical_aim , mouse_pos=None):
         if self.is_reloading:
-            current_time = pygame.time.get_ticks()
+            current_time = SIM_CLOCK.get_ticks()
             if current_time - self.reload_start_time >= self.shotgun_reload_time:
                 self.shotgun_ammo = self.shotgun_ammo_capacity
                 self.is_reloading = False
                 print("Reload complete.")
         
-        current_time = pygame.time.get_ticks()
+        current_time = SIM_CLOCK.get_ticks()
         is_moving = False
 
         if current_time - self.last_anim_update > self.anim_speed_ms:
@@ -174,18 +168,21 @@ class Player:
             mouse_x , mouse_y = joystick_horizontal_aim , joystick_vertical_aim
             self.weapon_angle = math.degrees(math.atan2(-joystick_vertical_aim , joystick_horizontal_aim))
         else:
-            mouse_x, mouse_y = pygame.mouse.get_pos()
+            mouse_x, mouse_y = mouse_pos if mouse_pos is not None else pygame.mouse.get_pos()
             player_screen_center = self.get_aura_center(camera_offset)
             dx = mouse_x - player_screen_center[0]
             dy = mouse_y - player_screen_center[1]
             self.weapon_angle = math.degrees(math.atan2(-dy, dx)) # -dy because pygame's y is inverted
 
 
-        base_shotgun_img = self.shotgun_original_image
-        self.shotgun_image = pygame.transform.rotate(base_shotgun_img, self.weapon_angle)
+        self.rotate_held_item()
 
-        base_flash_img = self.flashlight_original_image
-        self.flashlight_image = pygame.transform.rotate(base_flash_img, self.weapon_angle)
+    def rotate_held_item(self):
+        # Only the held item is visible, so only it needs rotating
+        if self.equipped_item == "shotgun":
+            self.shotgun_image = ROTATION_CACHE.get(self.shotgun_sprite_key, self.shotgun_original_image, self.weapon_angle)
+        else:
+            self.flashlight_image = ROTATION_CACHE.get(self.flashlight_sprite_key, self.flashlight_original_image, self.weapon_angle)
     
     def swap_item(self , swap_sound):
         if self.is_reloading: # Don't swap while reloading
@@ -195,10 +192,12 @@ class Player:
             self.equipped_item = "shotgun"
         else:
             self.equipped_item = "flashlight"
+        # The item just taken out was last rotated whenever it was put away
+        self.rotate_held_item()
         swap_sound.play()
         print(f"Equipped: {self.equipped_item}")
 
-    def shoot(self, target_angle, grid , fire_sound , reload_sound , is_boss_fight=False):
+    def shoot(self, target_angle, grid , fire_sound , reload_sound , is_boss_fight=False , rng=random):
         if self.equipped_item != "shotgun" or self.is_reloading:
             return None
         
@@ -213,42 +212,13 @@ class Player:
         player_center_world = self.get_center_pos()
 
         for _ in range(self.shotgun_pellet_count):
-            angle = target_angle + math.radians(random.uniform(-SHOTGUN_SPREAD_ANGLE / 2, SHOTGUN_SPREAD_ANGLE / 2))
-            
-            step_x = math.cos(angle)
-            step_y = math.sin(angle)
-            
-            ray_x, ray_y = player_center_world
-            current_dist = 0
-            hit_wall = False
+            angle = target_angle + math.radians(rng.uniform(-SHOTGUN_SPREAD_ANGLE / 2, SHOTGUN_SPREAD_ANGLE / 2))
             
-            # Cast ray
-            while not hit_wall and current_dist < SHOTGUN_RANGE:
-                current_dist += 1
-                ray_x = player_center_world[0] + step_x * current_dist
-                ray_y = player_center_world[1] + step_y * current_dist
-
-                if is_boss_fight:
-                    # In boss fight, only check arena boundaries
-                    if (ray_x < ARENA_WALL_THICKNESS or ray_x > ARENA_WIDTH - ARENA_WALL_THICKNESS or
-                        ray_y < ARENA_WALL_THICKNESS or ray_y > ARENA_HEIGHT - ARENA_WALL_THICKNESS):
-                        hit_wall = True
-                else:
-                    # In maze, check grid
-                    col = int(ray_x // CELL_SIZE)
-                    row = int(ray_y // CELL_SIZE)
-                    if not (0 <= col < COLS and 0 <= row < ROWS):
-                        hit_wall = True
-                        break
-                        
-                    cell = grid[col][row]
-                    for wall in cell.get_wall_rects():
-                        if wall.collidepoint(ray_x, ray_y):
-                            hit_wall = True
-                            break
-                
-                if hit_wall:
-                    break
+            if is_boss_fight:
+                # In boss fight, only check arena boundaries
+                ray_x, ray_y, _, _ = cast_ray_arena(player_center_world, angle, SHOTGUN_RANGE)
+            else:
+                ray_x, ray_y, _, _ = cast_ray(grid, player_center_world, angle, SHOTGUN_RANGE)
             
             # Add the line to be drawn
             pellet_lines.append((player_center_world, (ray_x, ray_y)))
@@ -259,39 +229,17 @@ class Player:
         if self.equipped_item == "shotgun" and not self.is_reloading and self.shotgun_ammo < SHOTGUN_AMMO_CAPACITY:
             print("Reloading...")
             self.is_reloading = True
-            self.reload_start_time = pygame.time.get_ticks()
+            self.reload_start_time = SIM_CLOCK.get_ticks()
             reload_sound.play()
 
     def move_player(self, grid, dx, dy):
-        new_x = self.pos[0] + dx * self.speed
-        new_y = self.pos[1] + dy * self.speed
-
-        new_x = max(0 , new_x)
-        new_y = max(0 , new_y)
-
-        new_rect_x = pygame.Rect(new_x, self.pos[1], self.size[0], self.size[1])
-        new_rect_y = pygame.Rect(self.pos[0], new_y, self.size[0], self.size[1])
-
-        can_move_x = True
-        can_move_y = True
-
-        current_col = int((self.pos[0] + self.size[0] / 2) // CELL_SIZE)
-        current_row = int((self.pos[1] + self.size[1] / 2) // CELL_SIZE)
-
-        for c in range(max(0, current_col - 1), min(COLS, current_col + 2)):
-            for r in range(max(0, current_row - 1), min(ROWS, current_row + 2)):
-                cell = grid[c][r]
-                
-                for wall in cell.get_wall_rects():
-                    if new_rect_x.colliderect(wall):
-                        can_move_x = False
-                    if new_rect_y.colliderect(wall):
-                        can_move_y = False
+        new_x = max(0 , self.pos[0] + dx * self.speed)
+        new_y = max(0 , self.pos[1] + dy * self.speed)
 
-        if can_move_x:
-            self.pos[0] = new_x
-        if can_move_y:
-            self.pos[1] = new_y
+        # Slides along walls and stops flush against them
+        dx, dy, _ = colliders_for(grid).sweep(self.pos[0], self.pos[1], self.size[0], self.size[1], new_x - self.pos[0], new_y - self.pos[1])
+        self.pos[0] += dx
+        self.pos[1] += dy
     
     def move_player_arena(self, dx, dy):
         new_x = self.pos[0] + dx * self.speed
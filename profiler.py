@@ -0,0 +1,163 @@
+import csv
+import json
+import time
+from collections import deque
+import pygame
+from constants import *
+
+class FrameProfiler:
+    # Times named sections of each frame and counts hot-path events (ray steps,
+    # Rects made, sprites rotated). Every call checks `enabled` first, so with the
+    # profiler off a begin/end/count costs one attribute test. Frames are kept for
+    # the overlay's rolling stats and, while exporting, written out one row each.
+    def __init__(self, history=PROFILER_HISTORY_FRAMES):
+        self.enabled = False
+        self.show_overlay = False
+        self.history = history
+        self.frame_times = deque(maxlen=history)
+        self.section_times = {}
+        self.counter_values = {}
+        self.frame_sections = {}
+        self.frame_counters = {}
+        self.open_sections = {}
+        self.frame_start = None
+        self.frame_index = 0
+        self.export_path = None
+        self.export_rows = []
+        self.font = None
+
+    def _update_enabled(self):
+        was_enabled = self.enabled
+        self.enabled = self.show_overlay or self.export_path is not None
+        if self.enabled and not was_enabled:
+            self.frame_start = None
+            self.open_sections.clear()
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        self._update_enabled()
+
+    def begin(self, name):
+        if self.enabled:
+            self.open_sections[name] = time.perf_counter()
+
+    def end(self, name):
+        if self.enabled:
+            start = self.open_sections.pop(name, None)
+            if start is not None:
+                # A section can run several times a frame (one per simulation step); the times add up
+                self.frame_sections[name] = self.frame_sections.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.frame_counters[name] = self.frame_counters.get(name, 0) + amount
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        frame_ms = (now - self.frame_start) * 1000 if self.frame_start is not None else 0
+        self.frame_start = now
+        self.frame_times.append(frame_ms)
+
+        for name in self.frame_sections:
+            if name not in self.section_times:
+                self.section_times[name] = deque(maxlen=self.history)
+        for name, times in self.section_times.items():
+            times.append(self.frame_sections.get(name, 0))
+        for name in self.frame_counters:
+            if name not in self.counter_values:
+                self.counter_values[name] = deque(maxlen=self.history)
+        for name, values in self.counter_values.items():
+            values.append(self.frame_counters.get(name, 0))
+
+        if self.export_path is not None:
+            row = {'frame': self.frame_index, 'frame_ms': frame_ms}
+            row.update(self.frame_sections)
+            row.update(self.frame_counters)
+            self.export_rows.append(row)
+
+        self.frame_index += 1
+        self.frame_sections = {}
+        self.frame_counters = {}
+
+    def summary(self, values):
+        # (mean, p99) of a deque of per-frame values
+        if not values:
+            return 0, 0
+        ordered = sorted(values)
+        return sum(ordered) / len(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    # --- Export ---
+    def start_export(self, path):
+        self.export_path = path
+        self.export_rows = []
+        self._update_enabled()
+
+    def stop_export(self):
+        # Writes CSV for a .csv path and JSON otherwise
+        if self.export_path is None:
+            return
+        path = self.export_path
+        columns = []
+        for row in self.export_rows:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+                writer.writeheader()
+                writer.writerows(self.export_rows)
+        else:
+            with open(path, "w") as f:
+                json.dump({'columns': columns, 'frames': self.export_rows}, f)
+        print(f"Wrote {len(self.export_rows)} profiled frames to {path}")
+        self.export_path = None
+        self.export_rows = []
+        self._update_enabled()
+
+    # --- Overlay ---
+    def draw_overlay(self, screen):
+        if not self.show_overlay:
+            return
+        if self.font is None:
+            self.font = pygame.font.SysFont('Arial', 18)
+        font = self.font
+        line_height = font.get_linesize()
+
+        lines = []
+        mean, p99 = self.summary(self.frame_times)
+        lines.append(f"frame {mean:6.2f} ms   p99 {p99:6.2f} ms")
+        for name, times in self.section_times.items():
+            mean, p99 = self.summary(times)
+            lines.append(f"{name:<10} {mean:6.2f} ms   p99 {p99:6.2f} ms")
+        for name, values in self.counter_values.items():
+            mean, _ = self.summary(values)
+            lines.append(f"{name:<18} {mean:9.0f}/frame")
+
+        graph_height = PROFILER_GRAPH_HEIGHT
+        width = max(PROFILER_OVERLAY_WIDTH, self.history * 2 + 20)
+        height = len(lines) * line_height + graph_height + 30
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+
+        y = 10
+        for text in lines:
+            panel.blit(font.render(text, True, WHITE), (10, y))
+            y += line_height
+
+        # Frame time graph, one bar per frame, with the render target as a line
+        graph_top = y + 10
+        target_ms = 1000 / (RENDER_FPS or SIM_HZ)
+        scale = graph_height / (2 * target_ms)
+        for i, frame_ms in enumerate(self.frame_times):
+            bar = min(graph_height, frame_ms * scale)
+            color = (0, 200, 0) if bar < graph_height / 2 else (230, 60, 60)
+            pygame.draw.line(panel, color, (10 + i * 2, graph_top + graph_height), (10 + i * 2, graph_top + graph_height - bar), 2)
+        target_y = graph_top + graph_height / 2
+        pygame.draw.line(panel, (255, 255, 0), (10, target_y), (width - 10, target_y), 1)
+
+        screen.blit(panel, (10, 50))
+
+PROFILER = FrameProfiler()
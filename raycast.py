@@ -0,0 +1,186 @@
+import math
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from profiler import PROFILER
+from constants import *
+
+def ray_box_entry(ox, oy, dir_x, dir_y, x0, y0, x1, y1, t_min, t_max):
+    # Slab test, returns the distance at which the ray enters the box or None
+    if dir_x == 0:
+        if ox < x0 or ox >= x1:
+            return None
+        t_lo_x, t_hi_x = -math.inf, math.inf
+    else:
+        t1 = (x0 - ox) / dir_x
+        t2 = (x1 - ox) / dir_x
+        t_lo_x, t_hi_x = (t1, t2) if t1 < t2 else (t2, t1)
+
+    if dir_y == 0:
+        if oy < y0 or oy >= y1:
+            return None
+        t_lo_y, t_hi_y = -math.inf, math.inf
+    else:
+        t1 = (y0 - oy) / dir_y
+        t2 = (y1 - oy) / dir_y
+        t_lo_y, t_hi_y = (t1, t2) if t1 < t2 else (t2, t1)
+
+    t_near = max(t_lo_x, t_lo_y, t_min)
+    t_far = min(t_hi_x, t_hi_y, t_max)
+    if t_near <= t_far:
+        return t_near
+    return None
+
+def _cell_hit(grid, col, row, ox, oy, dir_x, dir_y, t_min, t_max):
+    # Ray origin is shifted into the cell's local space so the boxes need no offset
+    local_x = ox - col * CELL_SIZE
+    local_y = oy - row * CELL_SIZE
+    nearest = None
+    for x0, y0, x1, y1 in grid.cell_boxes(col, row):
+        t = ray_box_entry(local_x, local_y, dir_x, dir_y, x0, y0, x1, y1, t_min, t_max)
+        if t is not None and (nearest is None or t < nearest):
+            nearest = t
+    return nearest
+
+def cast_ray(grid, origin, angle, max_dist):
+    # Amanatides-Woo traversal: visit only the cells the ray crosses and test
+    # their walls analytically. Returns (x, y, distance, hit_wall).
+    ox, oy = origin
+    dir_x = math.cos(angle)
+    dir_y = math.sin(angle)
+
+    col = int(ox // CELL_SIZE)
+    row = int(oy // CELL_SIZE)
+
+    if dir_x > 0:
+        step_col = 1
+        t_max_x = ((col + 1) * CELL_SIZE - ox) / dir_x
+        t_delta_x = CELL_SIZE / dir_x
+    elif dir_x < 0:
+        step_col = -1
+        t_max_x = (col * CELL_SIZE - ox) / dir_x
+        t_delta_x = -CELL_SIZE / dir_x
+    else:
+        step_col = 0
+        t_max_x = t_delta_x = math.inf
+
+    if dir_y > 0:
+        step_row = 1
+        t_max_y = ((row + 1) * CELL_SIZE - oy) / dir_y
+        t_delta_y = CELL_SIZE / dir_y
+    elif dir_y < 0:
+        step_row = -1
+        t_max_y = (row * CELL_SIZE - oy) / dir_y
+        t_delta_y = -CELL_SIZE / dir_y
+    else:
+        step_row = 0
+        t_max_y = t_delta_y = math.inf
+
+    if PROFILER.enabled:
+        PROFILER.count("rays")
+    t_enter = 0
+    while t_enter <= max_dist:
+        if PROFILER.enabled:
+            PROFILER.count("ray_steps")
+        if not (0 <= col < grid.cols and 0 <= row < grid.rows):
+            return (ox + dir_x * t_enter, oy + dir_y * t_enter, t_enter, True)
+
+        t_exit = min(t_max_x, t_max_y)
+        t_hit = _cell_hit(grid, col, row, ox, oy, dir_x, dir_y, t_enter, min(t_exit, max_dist))
+        if t_hit is not None:
+            return (ox + dir_x * t_hit, oy + dir_y * t_hit, t_hit, True)
+
+        if t_max_x < t_max_y:
+            col += step_col
+            t_max_x += t_delta_x
+        else:
+            row += step_row
+            t_max_y += t_delta_y
+        t_enter = t_exit
+
+    return (ox + dir_x * max_dist, oy + dir_y * max_dist, max_dist, False)
+
+def cast_ray_arena(origin, angle, max_dist):
+    # The arena is a single box, so the hit is wherever the ray leaves its inner bounds
+    ox, oy = origin
+    dir_x = math.cos(angle)
+    dir_y = math.sin(angle)
+
+    t_exit = max_dist
+    if dir_x > 0:
+        t_exit = min(t_exit, (ARENA_WIDTH - ARENA_WALL_THICKNESS - ox) / dir_x)
+    elif dir_x < 0:
+        t_exit = min(t_exit, (ARENA_WALL_THICKNESS - ox) / dir_x)
+    if dir_y > 0:
+        t_exit = min(t_exit, (ARENA_HEIGHT - ARENA_WALL_THICKNESS - oy) / dir_y)
+    elif dir_y < 0:
+        t_exit = min(t_exit, (ARENA_WALL_THICKNESS - oy) / dir_y)
+    t_exit = max(0, t_exit)
+
+    return (ox + dir_x * t_exit, oy + dir_y * t_exit, t_exit, t_exit < max_dist)
+
+def _bounds_exit(ox, oy, dir_x, dir_y, x0, y0, x1, y1):
+    # Distance at which rays starting inside the box leave it, for arrays of directions
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_x = np.where(dir_x > 0, (x1 - ox) / dir_x, np.where(dir_x < 0, (x0 - ox) / dir_x, np.inf))
+        t_y = np.where(dir_y > 0, (y1 - oy) / dir_y, np.where(dir_y < 0, (y0 - oy) / dir_y, np.inf))
+    return np.maximum(0, np.minimum(t_x, t_y))
+
+def _slab_range(origin, direction, lo, hi):
+    # Per (ray, box) interval of t spent between lo and hi on one axis
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (lo[None, :] - origin) / direction[:, None]
+        t2 = (hi[None, :] - origin) / direction[:, None]
+    t_lo = np.minimum(t1, t2)
+    t_hi = np.maximum(t1, t2)
+    # Rays parallel to the slab are either always inside it or never
+    parallel = direction[:, None] == 0
+    inside = (lo[None, :] <= origin) & (origin < hi[None, :])
+    t_lo = np.where(parallel, np.where(inside, -np.inf, np.inf), t_lo)
+    t_hi = np.where(parallel, np.where(inside, np.inf, -np.inf), t_hi)
+    return t_lo, t_hi
+
+def cast_rays_batch(grid, origin, angles, max_dist, is_boss_fight=False, boxes=None):
+    # Casts every ray in one go. Returns (xs, ys, distances, hits) as arrays, or as
+    # lists from the per-ray caster when NumPy is not installed. Callers that already
+    # hold the nearby wall boxes can pass them to skip the region lookup.
+    if np is None:
+        if is_boss_fight:
+            results = [cast_ray_arena(origin, angle, max_dist) for angle in angles]
+        else:
+            results = [cast_ray(grid, origin, angle, max_dist) for angle in angles]
+        return tuple(list(column) for column in zip(*results)) if results else ([], [], [], [])
+
+    ox, oy = origin
+    angles = np.asarray(angles, dtype=float)
+    dir_x = np.cos(angles)
+    dir_y = np.sin(angles)
+
+    if is_boss_fight:
+        t_bounds = _bounds_exit(ox, oy, dir_x, dir_y, ARENA_WALL_THICKNESS, ARENA_WALL_THICKNESS,
+                                ARENA_WIDTH - ARENA_WALL_THICKNESS, ARENA_HEIGHT - ARENA_WALL_THICKNESS)
+        t_walls = np.full(len(angles), np.inf)
+    else:
+        t_bounds = _bounds_exit(ox, oy, dir_x, dir_y, 0, 0, grid.cols * CELL_SIZE, grid.rows * CELL_SIZE)
+
+        # Only walls of cells the rays can reach are tested
+        if boxes is None:
+            boxes = grid.boxes_in_region(int((ox - max_dist) // CELL_SIZE), int((oy - max_dist) // CELL_SIZE),
+                                         int((ox + max_dist) // CELL_SIZE), int((oy + max_dist) // CELL_SIZE))
+        if PROFILER.enabled:
+            PROFILER.count("rays", len(angles))
+            PROFILER.count("ray_box_tests", len(angles) * len(boxes))
+        if len(boxes):
+            t_lo_x, t_hi_x = _slab_range(ox, dir_x, boxes[:, 0], boxes[:, 2])
+            t_lo_y, t_hi_y = _slab_range(oy, dir_y, boxes[:, 1], boxes[:, 3])
+            t_near = np.maximum(np.maximum(t_lo_x, t_lo_y), 0)
+            t_far = np.minimum(t_hi_x, t_hi_y)
+            t_walls = np.where(t_near <= t_far, t_near, np.inf).min(axis=1)
+        else:
+            t_walls = np.full(len(angles), np.inf)
+
+    t_hit = np.minimum(t_walls, t_bounds)
+    hits = t_hit <= max_dist
+    distances = np.where(hits, t_hit, max_dist)
+    return ox + dir_x * distances, oy + dir_y * distances, distances, hits
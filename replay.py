@@ -0,0 +1,174 @@
+import struct
+from constants import *
+
+# Log layout (little endian):
+#   header  "VCRP", version u16, seed u64, sim_hz u16, start_playing u8, chunked u8,
+#           level crc32 u32 (0 when the maze was generated from the seed)
+#   per simulation step: a change mask byte, then only the fields that changed
+#   since the previous step, in mask bit order
+#   trailer END_MARKER, step count u32, final state digest u32
+REPLAY_MAGIC = b"VCRP"
+REPLAY_VERSION = 3
+HEADER = struct.Struct("<4sHQHBBI")
+AXIS = struct.Struct("<ff")
+MOUSE = struct.Struct("<hh")
+TRAILER = struct.Struct("<II")
+
+CHANGED_MOVE = 1
+CHANGED_MOVE_AXIS = 2
+CHANGED_AIM_AXIS = 4
+CHANGED_MOUSE = 8
+HAS_ACTIONS = 16
+END_MARKER = 0xFF
+
+MOVE_KEYS = ("Up", "Down", "Left", "Right", "Joystick_Up", "Joystick_Down", "Joystick_Left", "Joystick_Right")
+ACTIONS = ("shoot", "swap", "reload", "play",
+           ("upgrade", "health"), ("upgrade", "ammo"), ("upgrade", "reload"),
+           ("upgrade", "fov"), ("upgrade", "brightness"), ("upgrade", "pellet_count"))
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+def pack_move(move):
+    bits = 0
+    for i, key in enumerate(MOVE_KEYS):
+        if move[key]:
+            bits |= 1 << i
+    return bits
+
+class InputRecorder:
+    # Writes the input the simulation consumed on every step. Only fields that
+    # changed since the previous step are stored, so an idle step costs one byte.
+    def __init__(self, path, seed, start_playing, chunked=False, level_crc=0):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, SIM_HZ, int(start_playing), int(chunked), level_crc))
+        self.ticks = 0
+        self.last_move = 0
+        self.last_move_axis = (0.0, 0.0)
+        self.last_aim_axis = (0.0, 0.0)
+        self.last_mouse = (0, 0)
+
+    def record(self, input_state, actions):
+        move = pack_move(input_state.move)
+        # Stored at the precision the log keeps, so recording and replay see identical values
+        move_axis = AXIS.unpack(AXIS.pack(*input_state.move_axis))
+        aim_axis = AXIS.unpack(AXIS.pack(*input_state.aim_axis))
+        mouse = (int(input_state.mouse_pos[0]), int(input_state.mouse_pos[1]))
+        input_state.move_axis = list(move_axis)
+        input_state.aim_axis = list(aim_axis)
+
+        mask = 0
+        body = bytearray()
+        if move != self.last_move:
+            mask |= CHANGED_MOVE
+            body.append(move)
+        if move_axis != self.last_move_axis:
+            mask |= CHANGED_MOVE_AXIS
+            body += AXIS.pack(*move_axis)
+        if aim_axis != self.last_aim_axis:
+            mask |= CHANGED_AIM_AXIS
+            body += AXIS.pack(*aim_axis)
+        if mouse != self.last_mouse:
+            mask |= CHANGED_MOUSE
+            body += MOUSE.pack(*mouse)
+        if actions:
+            mask |= HAS_ACTIONS
+            body.append(len(actions))
+            body += bytes(ACTION_CODES[action] for action in actions)
+
+        self.file.write(bytes([mask]) + body)
+        self.last_move = move
+        self.last_move_axis = move_axis
+        self.last_aim_axis = aim_axis
+        self.last_mouse = mouse
+        self.ticks += 1
+
+    def close(self, digest):
+        if self.file is None:
+            return
+        self.file.write(bytes([END_MARKER]) + TRAILER.pack(self.ticks, digest))
+        self.file.close()
+        self.file = None
+        print(f"Recorded {self.ticks} steps to {self.path}")
+
+class InputReplay:
+    # Feeds a recorded log back into an InputState one simulation step at a time
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version = struct.unpack_from("<4sH", self.data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+        _, _, self.seed, sim_hz, start_playing, chunked, self.level_crc = HEADER.unpack_from(self.data, 0)
+        if sim_hz != SIM_HZ:
+            print(f"Warning: replay was recorded at {sim_hz} Hz, simulating at {SIM_HZ} Hz")
+        self.start_playing = bool(start_playing)
+        self.chunked = bool(chunked)
+        self.offset = HEADER.size
+        self.ticks = 0
+        self.finished = False
+        self.expected_ticks = None
+        self.expected_digest = None
+        self.move = 0
+        self.move_axis = (0.0, 0.0)
+        self.aim_axis = (0.0, 0.0)
+        self.mouse = (0, 0)
+
+    def _read_trailer(self):
+        if self.offset >= len(self.data):
+            self.finished = True
+        elif self.data[self.offset] == END_MARKER:
+            self.expected_ticks, self.expected_digest = TRAILER.unpack_from(self.data, self.offset + 1)
+            self.offset = len(self.data)
+            self.finished = True
+
+    def apply(self, input_state):
+        # Returns False if the log had already run out; `finished` turns True as
+        # soon as the last recorded step has been handed out
+        self._read_trailer()
+        if self.finished:
+            return False
+        mask = self.data[self.offset]
+        self.offset += 1
+
+        if mask & CHANGED_MOVE:
+            self.move = self.data[self.offset]
+            self.offset += 1
+        if mask & CHANGED_MOVE_AXIS:
+            self.move_axis = AXIS.unpack_from(self.data, self.offset)
+            self.offset += AXIS.size
+        if mask & CHANGED_AIM_AXIS:
+            self.aim_axis = AXIS.unpack_from(self.data, self.offset)
+            self.offset += AXIS.size
+        if mask & CHANGED_MOUSE:
+            self.mouse = MOUSE.unpack_from(self.data, self.offset)
+            self.offset += MOUSE.size
+        actions = []
+        if mask & HAS_ACTIONS:
+            count = self.data[self.offset]
+            codes = self.data[self.offset + 1:self.offset + 1 + count]
+            self.offset += 1 + count
+            actions = [ACTIONS[code] for code in codes]
+
+        for i, key in enumerate(MOVE_KEYS):
+            input_state.move[key] = bool(self.move & (1 << i))
+        input_state.move_axis = list(self.move_axis)
+        input_state.aim_axis = list(self.aim_axis)
+        input_state.mouse_pos = self.mouse
+        input_state.actions = actions
+        self.ticks += 1
+        self._read_trailer()
+        return True
+
+    def check(self, digest):
+        if not self.finished:
+            print(f"Replay stopped after {self.ticks} steps, before the end of the log")
+            return None
+        if self.expected_digest is None:
+            print(f"Replay ended after {self.ticks} steps (log has no trailer to verify against)")
+            return None
+        matched = self.ticks == self.expected_ticks and digest == self.expected_digest
+        if matched:
+            print(f"Replay matched the recording after {self.ticks} steps")
+        else:
+            print(f"Replay DIVERGED: {self.ticks} steps, digest {digest:08x}; recording had {self.expected_ticks} steps, digest {self.expected_digest:08x}")
+        return matched
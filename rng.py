@@ -0,0 +1,12 @@
+import random
+
+RNG_STREAM_NAMES = ('maze', 'spawn', 'pellets', 'shake', 'bot')
+
+class RngStreams:
+    # One random.Random per subsystem, each seeded from the run seed and its own
+    # name. Drawing more or fewer numbers in one stream (say, a longer camera shake)
+    # leaves every other stream's sequence untouched.
+    def __init__(self, seed=None):
+        self.seed = seed if seed is not None else random.randrange(2 ** 63)
+        for name in RNG_STREAM_NAMES:
+            setattr(self, name, random.Random(f"{self.seed}:{name}"))
@@ -0,0 +1,56 @@
+import pygame
+from collections import OrderedDict
+from profiler import PROFILER
+from constants import *
+
+class RotationCache:
+    # Rotated copies of sprites, keyed by a sprite key shared by every instance that
+    # draws the same image and by the angle rounded to `step_degrees`. Least recently
+    # used rotations are evicted once the pixel data exceeds `max_bytes`.
+    def __init__(self, step_degrees=ROTATION_CACHE_STEP_DEGREES, max_bytes=ROTATION_CACHE_MAX_BYTES):
+        self.step_degrees = step_degrees
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _bucket(self, angle, step):
+        buckets = max(1, round(360 / step))
+        return round(angle / (360 / buckets)) % buckets, 360 / buckets
+
+    def get(self, key, image, angle, step_degrees=None):
+        bucket, step = self._bucket(angle, step_degrees or self.step_degrees)
+        cache_key = (key, step, bucket)
+        rotated = self.entries.get(cache_key)
+        if rotated is not None:
+            self.hits += 1
+            PROFILER.count("rotation_cache_hits")
+            self.entries.move_to_end(cache_key)
+            return rotated
+
+        self.misses += 1
+        PROFILER.count("sprites_rotated")
+        rotated = pygame.transform.rotate(image, bucket * step)
+        self.entries[cache_key] = rotated
+        self.bytes_used += self._surface_bytes(rotated)
+        while self.bytes_used > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= self._surface_bytes(evicted)
+        return rotated
+
+    def prefill(self, key, image, step_degrees=None):
+        # Optional warm-up so the first frames of a fight don't pay for rotations
+        step = step_degrees or self.step_degrees
+        buckets = max(1, round(360 / step))
+        for bucket in range(buckets):
+            self.get(key, image, bucket * 360 / buckets, step)
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes_used = 0
+
+    def _surface_bytes(self, surface):
+        return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+ROTATION_CACHE = RotationCache()
@@ -0,0 +1,126 @@
+import math
+from constants import *
+
+class SpatialHash:
+    # Uniform grid of buckets aligned to the maze cells. Entities are filed under the
+    # cell holding their center; queries look one ring of buckets further out so
+    # entities smaller than a cell that poke over a bucket edge are still found.
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        # Buckets are dicts used as ordered sets so query results come back in a stable order
+        self.buckets = {}
+        self.keys = {}
+
+    def _key_for(self, obj):
+        center = obj.get_center_pos()
+        return (int(center[0] // self.cell_size), int(center[1] // self.cell_size))
+
+    def insert(self, obj):
+        key = self._key_for(obj)
+        self.keys[obj] = key
+        self.buckets.setdefault(key, {})[obj] = None
+
+    def remove(self, obj):
+        key = self.keys.pop(obj, None)
+        if key is None:
+            return
+        bucket = self.buckets[key]
+        del bucket[obj]
+        if not bucket:
+            del self.buckets[key]
+
+    def update(self, obj):
+        # Called after every move; only touches the buckets when the entity changed cell
+        old_key = self.keys.get(obj)
+        if old_key is None:
+            return
+        key = self._key_for(obj)
+        if key != old_key:
+            self.remove(obj)
+            self.keys[obj] = key
+            self.buckets.setdefault(key, {})[obj] = None
+
+    def clear(self):
+        self.buckets.clear()
+        self.keys.clear()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, obj):
+        return obj in self.keys
+
+    def _collect(self, col0, row0, col1, row1, found):
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                bucket = self.buckets.get((col, row))
+                if bucket:
+                    found.update(bucket)
+
+    def query_rect(self, rect):
+        size = self.cell_size
+        found = {}
+        self._collect(int(rect.left // size) - 1, int(rect.top // size) - 1,
+                      int(rect.right // size) + 1, int(rect.bottom // size) + 1, found)
+        return [obj for obj in found if obj.get_rect().colliderect(rect)]
+
+    def query_radius(self, center, radius):
+        size = self.cell_size
+        found = {}
+        self._collect(int((center[0] - radius) // size), int((center[1] - radius) // size),
+                      int((center[0] + radius) // size), int((center[1] + radius) // size), found)
+        radius_sq = radius * radius
+        result = []
+        for obj in found:
+            obj_center = obj.get_center_pos()
+            dx = obj_center[0] - center[0]
+            dy = obj_center[1] - center[1]
+            if dx * dx + dy * dy <= radius_sq:
+                result.append(obj)
+        return result
+
+    def query_segment(self, start, end):
+        # Walks the buckets the segment crosses (plus their neighbours) and returns
+        # every entity filed there; callers do the exact intersection test
+        size = self.cell_size
+        col = int(start[0] // size)
+        row = int(start[1] // size)
+        end_col = int(end[0] // size)
+        end_row = int(end[1] // size)
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+
+        step_col = 1 if dx > 0 else -1
+        step_row = 1 if dy > 0 else -1
+        if dx != 0:
+            next_x = (col + (dx > 0)) * size
+            t_max_x = (next_x - start[0]) / dx
+            t_delta_x = size / abs(dx)
+        else:
+            t_max_x = t_delta_x = math.inf
+        if dy != 0:
+            next_y = (row + (dy > 0)) * size
+            t_max_y = (next_y - start[1]) / dy
+            t_delta_y = size / abs(dy)
+        else:
+            t_max_y = t_delta_y = math.inf
+
+        found = {}
+        visited = set()
+        while True:
+            for c in range(col - 1, col + 2):
+                for r in range(row - 1, row + 2):
+                    if (c, r) not in visited:
+                        visited.add((c, r))
+                        bucket = self.buckets.get((c, r))
+                        if bucket:
+                            found.update(bucket)
+            if (col, row) == (end_col, end_row) or min(t_max_x, t_max_y) > 1:
+                break
+            if t_max_x < t_max_y:
+                col += step_col
+                t_max_x += t_delta_x
+            else:
+                row += step_row
+                t_max_y += t_delta_y
+        return list(found)
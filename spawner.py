@@ -0,0 +1,68 @@
+import math
+from collections import OrderedDict
+from constants import *
+
+def ring_offsets(min_distance, max_distance):
+    # (dcol, drow) of every cell whose distance from the origin cell is within the band
+    reach = int(max_distance)
+    return tuple((dc, dr)
+                 for dc in range(-reach, reach + 1)
+                 for dr in range(-reach, reach + 1)
+                 if min_distance <= math.hypot(dc, dr) <= max_distance)
+
+def despawn_cells(detection_range):
+    # Despawn radius in cells: steps along the maze given a topology, straight-line
+    # cells otherwise. It is the old detection_range * 3 in whole cells, but always
+    # ENEMY_DESPAWN_MARGIN_STEPS beyond the far edge of the spawn band, so a fresh
+    # spawn is never dropped and an enemy has to wander that far off before it is.
+    return max(ENEMY_SPAWN_MAX_CELLS + ENEMY_DESPAWN_MARGIN_STEPS, math.ceil(detection_range * 3 / CELL_SIZE))
+
+class SpawnRings:
+    # Where an enemy may spawn around the player: every cell between min_distance
+    # and max_distance cells away that lies on the grid. The list for a player cell
+    # is built the first time the player stands there and kept in an LRU, so
+    # streamed worlds cost no more than fixed ones; picking from it is one draw.
+    # Cells near the edges just have shorter lists, and a grid too small to have any
+    # cell in the band gives an empty one instead of an endless search. Given a
+    # MazeTopology the band is measured in steps along the maze rather than straight
+    # across the walls, so enemies always have that far to walk to the player, and
+    # cells closer than `clearance` in a straight line (just behind a wall, inside
+    # detection range) are left out.
+    def __init__(self, grid, topology=None, min_distance=ENEMY_SPAWN_MIN_CELLS, max_distance=ENEMY_SPAWN_MAX_CELLS,
+                 clearance=ENEMY_SPAWN_CLEARANCE_CELLS, max_cached=SPAWN_RING_CACHE_CELLS):
+        self.grid = grid
+        self.topology = topology
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.clearance = clearance
+        self.offsets = ring_offsets(min_distance, max_distance)
+        self.max_cached = max_cached
+        self.rings = OrderedDict()
+
+    def candidates(self, col, row):
+        key = (col, row)
+        ring = self.rings.get(key)
+        if ring is None:
+            cols, rows = self.grid.cols, self.grid.rows
+            if self.topology is not None and not self.grid.in_bounds(col, row):
+                ring = ()
+            elif self.topology is not None:
+                reach = self.topology.within(key, int(self.max_distance))
+                cells = [self.topology.cell(i) for i, steps in reach.items() if steps >= self.min_distance]
+                ring = tuple(sorted(cell for cell in cells if math.dist(cell, key) >= self.clearance))
+            else:
+                ring = tuple((col + dc, row + dr) for dc, dr in self.offsets
+                             if 0 <= col + dc < cols and 0 <= row + dr < rows)
+            self.rings[key] = ring
+            while len(self.rings) > self.max_cached:
+                self.rings.popitem(last=False)
+        else:
+            self.rings.move_to_end(key)
+        return ring
+
+    def pick(self, rng, col, row):
+        # A random candidate cell around (col, row), or None if there is none
+        ring = self.candidates(col, row)
+        if not ring:
+            return None
+        return ring[rng.randrange(len(ring))]
@@ -0,0 +1,47 @@
+from constants import *
+
+class SimClock:
+    # Milliseconds of simulated time. Gameplay timers (cooldowns, reloads, spawns,
+    # animations) read this instead of pygame.time.get_ticks() so they run at the
+    # simulation's pace, not the wall clock's.
+    def __init__(self):
+        self.time = 0.0
+
+    def get_ticks(self):
+        return int(self.time)
+
+    def advance(self, ms):
+        self.time += ms
+
+    def reset(self):
+        self.time = 0.0
+
+SIM_CLOCK = SimClock()
+
+class FixedTimestep:
+    # Accumulates real frame time and hands it out as whole simulation steps of
+    # 1000 / sim_hz ms. What is left over becomes `alpha`, how far the renderer is
+    # between the last two simulation states.
+    def __init__(self, sim_hz=SIM_HZ, max_frame_ms=MAX_FRAME_TIME_MS, clock=SIM_CLOCK):
+        self.step_ms = 1000 / sim_hz
+        self.max_frame_ms = max_frame_ms
+        self.clock = clock
+        self.accumulator = 0.0
+
+    def add_frame_time(self, frame_ms):
+        # A long stall is cut short so the game skips ahead instead of trying to
+        # catch up with more and more steps per frame
+        self.accumulator += min(frame_ms, self.max_frame_ms)
+
+    def steps(self):
+        while self.accumulator >= self.step_ms:
+            self.accumulator -= self.step_ms
+            self.clock.advance(self.step_ms)
+            yield
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_ms
+
+def interpolate(prev_pos, pos, alpha):
+    return [prev_pos[0] + (pos[0] - prev_pos[0]) * alpha, prev_pos[1] + (pos[1] - prev_pos[1]) * alpha]
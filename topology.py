@@ -0,0 +1,301 @@
+import time
+import argparse
+from array import array
+from collections import OrderedDict, deque
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from walls import NEIGHBOR_OFFSETS
+from constants import *
+
+class MazeTopology:
+    # The maze as a graph, built once per WallGrid. Cells are numbered like the
+    # grid's masks (col * rows + row); the neighbours reachable from cell i are
+    # neighbors[offsets[i]:offsets[i + 1]] (compressed sparse rows). On top of that:
+    #   - steps to the start and to the exit for every cell, taken from the level
+    #     file's tables when it has them and otherwise searched the first time
+    #     they're needed
+    #   - steps from any other cell, searched on first use and kept in an LRU
+    #   - bounded searches ("every cell within k steps"), also kept in an LRU, and
+    #     with NumPy the same as a boolean mask over all cells
+    #   - the corridor graph: junctions and dead ends joined by corridors, with
+    #     their lengths, built on first use
+    # Streamed worlds have no end to search to, so they get no index (see topology_for).
+    def __init__(self, grid, max_sources=TOPOLOGY_MAX_SOURCES, max_reaches=TOPOLOGY_MAX_REACHES):
+        self.grid = grid
+        self.cols = grid.cols
+        self.rows = grid.rows
+        self.offsets, self.neighbors = self._build_csr(grid)
+        self.start = grid.index(*grid.start_cell)
+        self.exit = grid.index(*grid.exit_cell)
+        tables = getattr(grid, 'tables', {})
+        count = self.cols * self.rows
+        self._start_distance = tables.get('start_distance')
+        self._exit_distance = tables.get('exit_distance')
+        if self._start_distance is not None and len(self._start_distance) != count:
+            self._start_distance = None
+        if self._exit_distance is not None and len(self._exit_distance) != count:
+            self._exit_distance = None
+        self.max_sources = max_sources
+        self.max_reaches = max_reaches
+        self.sources = OrderedDict()
+        self.reaches = OrderedDict()
+        self.reach_masks = OrderedDict()
+        self._corridors = None
+
+    # --- Building ---
+    def _build_csr(self, grid):
+        cols, rows = self.cols, self.rows
+        if np is not None:
+            masks = np.frombuffer(grid.masks, dtype=np.uint8).reshape(cols, rows)
+            cells = np.arange(cols * rows).reshape(cols, rows)
+            # One column per direction, -1 where there is a wall or the grid ends
+            targets = np.full((cols, rows, 4), -1)
+            for d, (bit, _, dc, dr) in enumerate(NEIGHBOR_OFFSETS):
+                c0, c1 = max(0, -dc), cols - max(0, dc)
+                r0, r1 = max(0, -dr), rows - max(0, dr)
+                region = targets[c0:c1, r0:r1, d]
+                there = cells[c0 + dc:c1 + dc, r0 + dr:r1 + dr]
+                np.copyto(region, there, where=(masks[c0:c1, r0:r1] & bit) == 0)
+            targets = targets.reshape(-1, 4)
+            open_ = targets >= 0
+            offsets = np.zeros(cols * rows + 1, dtype=np.int32)
+            np.cumsum(open_.sum(axis=1), out=offsets[1:])
+            return array('i', offsets.tobytes()), array('i', targets[open_].astype(np.int32).tobytes())
+
+        offsets = array('i', [0])
+        neighbors = array('i')
+        masks = grid.masks
+        for col in range(cols):
+            for row in range(rows):
+                mask = masks[col * rows + row]
+                for bit, _, dc, dr in NEIGHBOR_OFFSETS:
+                    if not mask & bit and 0 <= col + dc < cols and 0 <= row + dr < rows:
+                        neighbors.append((col + dc) * rows + row + dr)
+                offsets.append(len(neighbors))
+        return offsets, neighbors
+
+    def _search(self, source, limit=None):
+        # Breadth-first steps from cell `source`: a full array (-1 = unreachable), or
+        # with a limit a {cell: steps} dict of just the cells within it
+        offsets = self.offsets
+        neighbors = self.neighbors
+        if limit is None:
+            steps = array('i', [-1]) * (self.cols * self.rows)
+            seen = None
+        else:
+            steps = seen = {}
+        steps[source] = 0
+        queue = deque([source])
+        while queue:
+            i = queue.popleft()
+            next_steps = steps[i] + 1
+            if seen is not None and next_steps > limit:
+                continue
+            for k in range(offsets[i], offsets[i + 1]):
+                j = neighbors[k]
+                if seen is not None:
+                    if j in seen:
+                        continue
+                elif steps[j] >= 0:
+                    continue
+                steps[j] = next_steps
+                queue.append(j)
+        return steps
+
+    # --- Cells ---
+    def index(self, cell):
+        return cell[0] * self.rows + cell[1]
+
+    def cell(self, i):
+        return divmod(i, self.rows)
+
+    def cell_at(self, x, y):
+        # Cell index under a world position, clamped onto the grid
+        col = min(self.cols - 1, max(0, int(x // CELL_SIZE)))
+        row = min(self.rows - 1, max(0, int(y // CELL_SIZE)))
+        return col * self.rows + row
+
+    def neighbors_of(self, i):
+        return self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+    # --- Distances ---
+    @property
+    def start_distance(self):
+        if self._start_distance is None:
+            self._start_distance = self._search(self.start)
+        return self._start_distance
+
+    @property
+    def exit_distance(self):
+        if self._exit_distance is None:
+            self._exit_distance = self._search(self.exit)
+        return self._exit_distance
+
+    def distances_from(self, cell):
+        # Steps from `cell` to every cell, -1 where unreachable
+        i = self.index(cell)
+        if i == self.start:
+            return self.start_distance
+        if i == self.exit:
+            return self.exit_distance
+        steps = self.sources.get(i)
+        if steps is None:
+            steps = self.sources[i] = self._search(i)
+            while len(self.sources) > self.max_sources:
+                self.sources.popitem(last=False)
+        else:
+            self.sources.move_to_end(i)
+        return steps
+
+    def distance(self, a, b):
+        # Steps along the maze between two cells, -1 if there is no way through. O(1)
+        # once either end has been searched from (the start and exit always are).
+        i = self.index(a)
+        j = self.index(b)
+        if j in (self.start, self.exit) or i not in self.sources and j in self.sources:
+            i, j = j, i
+        return self.distances_from(self.cell(i))[j]
+
+    def within(self, cell, k):
+        # {cell index: steps} for every cell at most k steps from `cell`
+        key = (self.index(cell), k)
+        reach = self.reaches.get(key)
+        if reach is None:
+            reach = self.reaches[key] = self._search(key[0], k)
+            while len(self.reaches) > self.max_reaches:
+                self.reaches.popitem(last=False)
+        else:
+            self.reaches.move_to_end(key)
+        return reach
+
+    def within_mask(self, cell, k):
+        # within() as a NumPy boolean array over all cell indices
+        key = (self.index(cell), k)
+        mask = self.reach_masks.get(key)
+        if mask is None:
+            mask = self.reach_masks[key] = np.zeros(self.cols * self.rows, dtype=bool)
+            mask[list(self.within(cell, k))] = True
+            while len(self.reach_masks) > self.max_reaches:
+                self.reach_masks.popitem(last=False)
+        else:
+            self.reach_masks.move_to_end(key)
+        return mask
+
+    def next_toward_exit(self, cell):
+        # The neighbouring cell one step closer to the exit, or None at the exit or
+        # when it can't be reached
+        return self.next_toward(cell, self.exit_distance)
+
+    def next_toward(self, cell, steps):
+        # Same for any distance array, e.g. one from distances_from()
+        i = self.index(cell)
+        here = steps[i]
+        if here <= 0:
+            return None
+        for j in self.neighbors_of(i):
+            if steps[j] == here - 1:
+                return self.cell(j)
+        return None
+
+    # --- Corridor graph ---
+    @property
+    def corridors(self):
+        if self._corridors is None:
+            self._corridors = CorridorGraph(self)
+        return self._corridors
+
+class CorridorGraph:
+    # Junctions, dead ends, the start and the exit become nodes; each run of
+    # two-way cells between two nodes becomes one edge with its length in steps.
+    # For a cell inside a corridor, `edge_of` gives the edge and `edge_offset` how
+    # many steps it is from the edge's first node.
+    def __init__(self, topology):
+        offsets = topology.offsets
+        neighbors = topology.neighbors
+        count = topology.cols * topology.rows
+        self.node_of = array('i', [-1]) * count
+        self.nodes = array('i')
+        for i in range(count):
+            if offsets[i + 1] - offsets[i] != 2 or i in (topology.start, topology.exit):
+                self.node_of[i] = len(self.nodes)
+                self.nodes.append(i)
+
+        self.edge_of = array('i', [-1]) * count
+        self.edge_offset = array('i', [0]) * count
+        self.edge_first = array('i')
+        self.edge_second = array('i')
+        self.edge_length = array('i')
+        node_edges = [[] for _ in self.nodes]
+        for node, start in enumerate(self.nodes):
+            for k in range(offsets[start], offsets[start + 1]):
+                edge = len(self.edge_length)
+                previous = start
+                here = neighbors[k]
+                length = 1
+                if self.node_of[here] < 0 and self.edge_of[here] >= 0:
+                    continue # walked already from the other end
+                if self.node_of[here] >= 0 and self.node_of[here] < node:
+                    continue # a direct link, recorded from the lower node
+                while self.node_of[here] < 0:
+                    self.edge_of[here] = edge
+                    self.edge_offset[here] = length
+                    a, b = neighbors[offsets[here]], neighbors[offsets[here] + 1]
+                    previous, here = here, b if a == previous else a
+                    length += 1
+                self.edge_first.append(node)
+                self.edge_second.append(self.node_of[here])
+                self.edge_length.append(length)
+                node_edges[node].append(edge)
+                if self.node_of[here] != node:
+                    node_edges[self.node_of[here]].append(edge)
+
+        # Edges of node n are node_edge_list[node_edge_offsets[n]:node_edge_offsets[n + 1]]
+        self.node_edge_offsets = array('i', [0])
+        self.node_edge_list = array('i')
+        for edges in node_edges:
+            self.node_edge_list.extend(edges)
+            self.node_edge_offsets.append(len(self.node_edge_list))
+
+    def __len__(self):
+        return len(self.edge_length)
+
+    def edges_of(self, node):
+        return self.node_edge_list[self.node_edge_offsets[node]:self.node_edge_offsets[node + 1]]
+
+def topology_for(grid):
+    # The grid's MazeTopology, created on first use; None for streamed worlds
+    if getattr(grid, 'masks', None) is None:
+        return None
+    topology = getattr(grid, 'topology', None)
+    if topology is None:
+        topology = grid.topology = MazeTopology(grid)
+    return topology
+
+def main_topology(argv=None):
+    from maze_gen import generate_maze, MAZE_ALGORITHMS
+    from maze_file import load_maze
+    parser = argparse.ArgumentParser(description="Build a maze's topology index and report on it")
+    parser.add_argument("--size", type=int, nargs=2, metavar=("COLS", "ROWS"), default=(COLS, ROWS))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--algorithm", choices=sorted(MAZE_ALGORITHMS), default=MAZE_ALGORITHM)
+    parser.add_argument("--level", metavar="PATH", help="index a maze file instead of generating one")
+    args = parser.parse_args(argv)
+
+    grid = load_maze(args.level) if args.level else generate_maze(args.size[0], args.size[1], args.seed, args.algorithm)
+    start = time.perf_counter()
+    topology = MazeTopology(grid)
+    built = time.perf_counter()
+    solution = topology.start_distance[topology.exit]
+    topology.exit_distance
+    searched = time.perf_counter()
+    corridors = topology.corridors
+    compressed = time.perf_counter()
+    print(f"{grid.cols}x{grid.rows}: adjacency in {(built - start) * 1000:.1f} ms, "
+          f"start/exit distances in {(searched - built) * 1000:.1f} ms, corridor graph in {(compressed - searched) * 1000:.1f} ms")
+    print(f"{len(topology.neighbors) // 2} passages, {len(corridors.nodes)} junctions and dead ends, "
+          f"{len(corridors)} corridors, start to exit {solution} steps")
+
+if __name__ == "__main__":
+    main_topology()
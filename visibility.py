@@ -0,0 +1,96 @@
+import math
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from raycast import cast_rays_batch
+from constants import *
+
+class VisibilityPolygon:
+    # Exact flashlight region: rays are cast only towards wall corners (just either
+    # side of each one) plus enough arc samples to round off the RAY_LENGTH edge,
+    # so shadow edges land exactly on the corners instead of between fixed rays.
+    def __init__(self, grid, radius=RAY_LENGTH):
+        self.grid = grid
+        self.radius = radius
+        self.cached_cell = None
+        self.boxes = None
+        self.corners = []
+
+    def _refresh(self, col, row):
+        # The wall set only depends on the player's cell, so it is rebuilt on cell changes only
+        if self.cached_cell == (col, row):
+            return
+        self.cached_cell = (col, row)
+
+        reach = int(self.radius // CELL_SIZE) + 1
+        boxes = []
+        for c in range(max(0, col - reach), min(self.grid.cols, col + reach + 1)):
+            for r in range(max(0, row - reach), min(self.grid.rows, row + reach + 1)):
+                x = c * CELL_SIZE
+                y = r * CELL_SIZE
+                for x0, y0, x1, y1 in self.grid.cell_boxes(c, r):
+                    boxes.append((x + x0, y + y0, x + x1, y + y1))
+
+        self.corners = sorted({corner for x0, y0, x1, y1 in boxes
+                               for corner in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))})
+        if np is not None:
+            self.boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+            self.corners = np.array(self.corners, dtype=float).reshape(-1, 2)
+
+    def _sweep_angles(self, origin, start_angle, fov):
+        # Angles are handled as offsets from the cone's start edge so that sorting
+        # them gives a polygon that winds without crossing itself
+        arc_steps = max(1, math.ceil(math.degrees(fov) / VISIBILITY_ARC_STEP_DEGREES))
+        offsets = [fov * i / arc_steps for i in range(arc_steps + 1)]
+
+        ox, oy = origin
+        eps = VISIBILITY_CORNER_EPSILON
+        full_turn = 2 * math.pi
+        if np is not None:
+            if len(self.corners):
+                dx = self.corners[:, 0] - ox
+                dy = self.corners[:, 1] - oy
+                near = dx * dx + dy * dy <= self.radius * self.radius
+                corner_offsets = np.mod(np.arctan2(dy[near], dx[near]) - start_angle, full_turn)
+                for side in (corner_offsets - eps, corner_offsets + eps):
+                    if fov >= full_turn:
+                        side = np.mod(side, full_turn)
+                    offsets.extend(side[(side >= 0) & (side <= fov)].tolist())
+        else:
+            for cx, cy in self.corners:
+                dx = cx - ox
+                dy = cy - oy
+                if dx * dx + dy * dy > self.radius * self.radius:
+                    continue
+                offset = (math.atan2(dy, dx) - start_angle) % full_turn
+                for side in (offset - eps, offset + eps):
+                    if fov >= full_turn:
+                        side %= full_turn
+                    if 0 <= side <= fov:
+                        offsets.append(side)
+
+        offsets.sort()
+        return [start_angle + offset for offset in offsets]
+
+    def compute(self, origin, center_angle, fov_angle):
+        # Enough fov upgrades take the cone past a full turn; the sweep covers at most
+        # one, with the polygon's start and end edges meeting behind the player (the
+        # corners just either side of that seam wrap round to the other end)
+        fov = min(math.radians(fov_angle), 2 * math.pi)
+        col = int(origin[0] // CELL_SIZE)
+        row = int(origin[1] // CELL_SIZE)
+        self._refresh(col, row)
+
+        start_angle = center_angle - fov / 2
+        angles = self._sweep_angles(origin, start_angle, fov)
+        ray_xs, ray_ys, _, hits = cast_rays_batch(self.grid, origin, angles, self.radius, boxes=self.boxes)
+
+        polygon = [origin]
+        for angle, ray_x, ray_y, hit in zip(angles, ray_xs, ray_ys, hits):
+            if hit:
+                # Same as cast_rays: push the end point into the wall so its face is lit
+                ray_x = max(0, min(ray_x + math.cos(angle) * WALL_THICKNESS, self.grid.cols * CELL_SIZE))
+                ray_y = max(0, min(ray_y + math.sin(angle) * WALL_THICKNESS, self.grid.rows * CELL_SIZE))
+            polygon.append((ray_x, ray_y))
+        return polygon
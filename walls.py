@@ -0,0 +1,121 @@
+import pygame
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from profiler import PROFILER
+from constants import *
+
+# Wall collision boxes (x0, y0, x1, y1) relative to the cell's top-left corner
+SIDE_BOXES = {
+    WALL_TOP: (0, 0, CELL_SIZE, WALL_THICKNESS),
+    WALL_RIGHT: (CELL_SIZE - WALL_THICKNESS, 0, CELL_SIZE, CELL_SIZE),
+    WALL_BOTTOM: (0, CELL_SIZE - WALL_THICKNESS, CELL_SIZE, CELL_SIZE),
+    WALL_LEFT: (0, 0, WALL_THICKNESS, CELL_SIZE),
+}
+
+# Wall center lines relative to the cell's top-left corner, as MazeLayer draws them
+SIDE_SEGMENTS = {
+    WALL_TOP: ((0, 0), (CELL_SIZE, 0)),
+    WALL_RIGHT: ((CELL_SIZE, 0), (CELL_SIZE, CELL_SIZE)),
+    WALL_BOTTOM: ((CELL_SIZE, CELL_SIZE), (0, CELL_SIZE)),
+    WALL_LEFT: ((0, CELL_SIZE), (0, 0)),
+}
+
+# Every cell with the same bitmask has the same walls, so the static tables are
+# indexed by mask (16 entries) instead of by cell
+MASK_BOXES = tuple(tuple(SIDE_BOXES[bit] for _, bit in WALL_SIDES if mask & bit) for mask in range(16))
+MASK_SEGMENTS = tuple(tuple(SIDE_SEGMENTS[bit] for _, bit in WALL_SIDES if mask & bit) for mask in range(16))
+
+# (bit, neighbour bit, dcol, drow) in the order the generator has always visited neighbours
+NEIGHBOR_OFFSETS = (
+    (WALL_TOP, WALL_BOTTOM, 0, -1),
+    (WALL_RIGHT, WALL_LEFT, 1, 0),
+    (WALL_BOTTOM, WALL_TOP, 0, 1),
+    (WALL_LEFT, WALL_RIGHT, -1, 0),
+)
+
+def make_cell_rects(col, row, mask):
+    x = col * CELL_SIZE
+    y = row * CELL_SIZE
+    rects = tuple(pygame.Rect(x + x0, y + y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in MASK_BOXES[mask])
+    PROFILER.count("rects_allocated", len(rects))
+    return rects
+
+def boxes_from_masks(masks, col0, row0):
+    # Absolute wall boxes for a 2D (cols, rows) block of masks whose first cell is (col0, row0)
+    boxes = []
+    for bit, box in SIDE_BOXES.items():
+        cols, rows = np.nonzero(masks & bit)
+        x = (cols + col0) * CELL_SIZE
+        y = (rows + row0) * CELL_SIZE
+        boxes.append(np.stack((x + box[0], y + box[1], x + box[2], y + box[3]), axis=1))
+    return np.concatenate(boxes)
+
+class WallGrid:
+    def __init__(self, cols=COLS, rows=ROWS, masks=None):
+        self.cols = cols
+        self.rows = rows
+        # One byte per cell, column-major to match grid[col][row]
+        self.masks = masks if masks is not None else array('B', [WALL_ALL]) * (cols * rows)
+        self.start_cell = (0, 0)
+        self.exit_cell = (cols - 1, rows - 1)
+        self._rects = None
+
+    def index(self, col, row):
+        return col * self.rows + row
+
+    def in_bounds(self, col, row):
+        return 0 <= col < self.cols and 0 <= row < self.rows
+
+    def get_mask(self, col, row):
+        return self.masks[col * self.rows + row]
+
+    def has_wall(self, col, row, bit):
+        return bool(self.masks[col * self.rows + row] & bit)
+
+    def set_wall(self, col, row, bit, present):
+        i = col * self.rows + row
+        if present:
+            self.masks[i] |= bit
+        else:
+            self.masks[i] &= ~bit & WALL_ALL
+        if self._rects is not None:
+            self._rects.pop(i, None)
+
+    def build_tables(self):
+        # Rects are created the first time a cell is queried and then reused,
+        # so large grids only pay for the cells entities actually touch (and a
+        # loaded maze file opens without allocating anything per cell)
+        self._rects = {}
+
+    def cell_boxes(self, col, row):
+        return MASK_BOXES[self.masks[col * self.rows + row]]
+
+    def cell_segments(self, col, row):
+        return MASK_SEGMENTS[self.masks[col * self.rows + row]]
+
+    def cell_rects(self, col, row):
+        i = col * self.rows + row
+        if self._rects is None:
+            self.build_tables()
+        rects = self._rects.get(i)
+        if rects is None:
+            rects = self._rects[i] = make_cell_rects(col, row, self.masks[i])
+        return rects
+
+    def boxes_in_region(self, col0, row0, col1, row1):
+        # Absolute wall boxes of every cell in the inclusive range as an (N, 4) array
+        col0 = max(0, col0)
+        row0 = max(0, row0)
+        col1 = min(self.cols - 1, col1)
+        row1 = min(self.rows - 1, row1)
+        if col0 > col1 or row0 > row1:
+            return np.empty((0, 4))
+
+        masks = np.frombuffer(self.masks, dtype=np.uint8).reshape(self.cols, self.rows)[col0:col1 + 1, row0:row1 + 1]
+        return boxes_from_masks(masks, col0, row0)
+
+    def memory_usage(self):
+        return self.masks.itemsize * len(self.masks)